@@ -40,12 +40,16 @@ public class OllamaServlet extends SlingAllMethodsServlet {
 
         @AttributeDefinition(name = "Python Gateway URL", description = "URL of the Python Intelligence Layer")
         String python_gateway_url() default "http://localhost:8000/api/v1/context";
+
+        @AttributeDefinition(name = "Context Timeout (ms)", description = "Deadline for the context call, also sent to the Python layer so it can shed the request early")
+        int context_timeout_ms() default 5000;
     }
 
     private static final Logger LOG = LoggerFactory.getLogger(OllamaServlet.class);
     private String ollamaUrl;
     private String modelName;
     private String pythonGatewayUrl;
+    private int contextTimeoutMs;
     
     private static final HttpClient client = HttpClient.newBuilder()
             .version(HttpClient.Version.HTTP_1_1)
@@ -53,13 +57,15 @@ public class OllamaServlet extends SlingAllMethodsServlet {
             .build();
 
     private static final String APPLICATION_JSON = "application/json";
+    private static final String DEADLINE_HEADER = "X-Request-Timeout-Ms";
 
     @Activate
     protected void activate(Config config) {
         this.ollamaUrl = config.ollama_url();
         this.modelName = config.model_name();
         this.pythonGatewayUrl = config.python_gateway_url();
-        LOG.info("OllamaServlet activated. URL: {}, Model: {}, Gateway: {}", ollamaUrl, modelName, pythonGatewayUrl);
+        this.contextTimeoutMs = config.context_timeout_ms();
+        LOG.info("OllamaServlet activated. URL: {}, Model: {}, Gateway: {}, Context timeout: {} ms", ollamaUrl, modelName, pythonGatewayUrl, contextTimeoutMs);
     }
 
     @Override
@@ -123,8 +129,9 @@ public class OllamaServlet extends SlingAllMethodsServlet {
 
                 HttpRequest contextRequest = HttpRequest.newBuilder()
                         .uri(URI.create(this.pythonGatewayUrl))
-                        .timeout(Duration.ofSeconds(30))
+                        .timeout(Duration.ofMillis(this.contextTimeoutMs))
                         .header("Content-Type", APPLICATION_JSON)
+                        .header(DEADLINE_HEADER, String.valueOf(this.contextTimeoutMs))
                         .POST(HttpRequest.BodyPublishers.ofString(contextPayload.toString(), StandardCharsets.UTF_8))
                         .build();
 
@@ -137,6 +144,9 @@ public class OllamaServlet extends SlingAllMethodsServlet {
                      if (responseJson.has("context")) {
                          retrievedContext = responseJson.get("context").getAsString();
                      }
+                } else {
+                    // 503 = shed by admission control, 504 = deadline exceeded
+                    LOG.warn("Context unavailable (HTTP {}), continuing without context", contextResponse.statusCode());
                 }
             } catch (InterruptedException e) {
                 Thread.currentThread().interrupt();
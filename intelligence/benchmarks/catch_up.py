@@ -0,0 +1,184 @@
+"""
+Catch-up benchmark: bringing an index up to date after a batch of author
+changes, by a full crawl vs. modification-date-driven discovery.
+
+A generated site is served over HTTP (with a per-page .model.json latency)
+and fully crawled into a throwaway collection. Then some pages are edited,
+some deleted and some moved in (with old dates), and the index is updated
+  - full crawl: list every page, fetch and split every page, embed the
+    chunks whose IDs are not stored yet, delete what is gone
+  - catch-up: plan_catch_up (one daterange query, one path-only listing),
+    then fetch and split only the modified and added pages
+Both end in the same set of chunk IDs, which is checked. Reported per
+method: Query Builder and .model.json requests, chunks embedded, and time
+spent listing, fetching and embedding.
+
+Usage:
+    python benchmarks/catch_up.py --pages 2000 --changed 0.01 --latency-ms 20 --hash-embeddings
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+import chromadb
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from benchmarks.end_to_end import HashingEmbedder
+from src.crawler import crawler
+from src.crawler.crawler import chunk_doc_id, crawl_pages, search_pages
+from src.crawler.discovery import plan_catch_up
+from src.utils.embeddings import compute_embeddings, get_embedding_model
+from tests.mock_server import SyntheticSite, serve_site
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Full crawl vs. modification-date-driven catch-up")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--changed", type=float, default=0.01, help="Share of pages edited")
+    parser.add_argument("--deleted", type=int, default=3, help="Leaf pages deleted")
+    parser.add_argument("--moved", type=int, default=3, help="Pages added with old modification dates")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of each .model.json request")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Feature-hashing embedder instead of the model")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def update_pages(collection, model, pages, records):
+    """
+    Writes the chunks of `pages` the way the service's sync does: embeds only
+    IDs not stored yet and deletes the page's IDs it no longer produces.
+    Returns (chunks embedded, seconds spent embedding).
+    """
+    stored = set()
+    for i in range(0, len(pages), 100):
+        stored.update(collection.get(where={"source": {"$in": pages[i:i + 100]}}, include=[])["ids"])
+    records = [r for page_records in records for r in page_records]
+    current = {chunk_doc_id(r) for r in records}
+    new = [r for r in records if chunk_doc_id(r) not in stored]
+    start = time.perf_counter()
+    for i in range(0, len(new), 500):
+        batch = new[i:i + 500]
+        docs = [r["text"] for r in batch]
+        collection.upsert(ids=[chunk_doc_id(r) for r in batch], documents=docs,
+                          embeddings=compute_embeddings(model, docs),
+                          metadatas=[{"source": r["source"], "chunk_id": r["chunk_id"]} for r in batch])
+    embed_s = time.perf_counter() - start
+    stale = sorted(stored - current)
+    if stale:
+        collection.delete(ids=stale)
+    return len(new), embed_s
+
+
+def delete_sources(collection, sources):
+    if sources:
+        collection.delete(where={"source": {"$in": sources}})
+
+
+async def full_crawl(client, collection, model, root, indexed):
+    start = time.perf_counter()
+    pages = await search_pages(client, root)
+    listed = time.perf_counter()
+    records = await crawl_pages(client, pages)
+    fetched = time.perf_counter()
+    embedded, embed_s = update_pages(collection, model, pages, records)
+    delete_sources(collection, sorted(indexed - set(pages)))
+    return {"queries": 1, "pages_fetched": len(pages), "chunks_embedded": embedded,
+            "list_seconds": listed - start, "fetch_seconds": fetched - listed, "embed_seconds": embed_s,
+            "total_seconds": time.perf_counter() - start}
+
+
+async def catch_up(client, collection, model, root, since):
+    start = time.perf_counter()
+    plan = await plan_catch_up(client, collection, root, since)
+    listed = time.perf_counter()
+    pages = plan["modified"] + plan["added"]
+    records = await crawl_pages(client, pages)
+    fetched = time.perf_counter()
+    embedded, embed_s = update_pages(collection, model, pages, records)
+    delete_sources(collection, plan["deleted"])
+    return {"queries": 2, "pages_fetched": len(pages), "chunks_embedded": embedded,
+            "list_seconds": listed - start, "fetch_seconds": fetched - listed, "embed_seconds": embed_s,
+            "total_seconds": time.perf_counter() - start, "deleted": len(plan["deleted"])}
+
+
+def clone(collection):
+    copy = chromadb.EphemeralClient().create_collection(f"catchup_{uuid.uuid4().hex[:8]}")
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    for i in range(0, len(data["ids"]), 5000):
+        copy.add(ids=data["ids"][i:i + 5000], embeddings=data["embeddings"][i:i + 5000],
+                 documents=data["documents"][i:i + 5000], metadatas=data["metadatas"][i:i + 5000])
+    return copy
+
+
+async def run(args, site, model):
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient() as client:
+        base = chromadb.EphemeralClient().create_collection(f"catchup_{uuid.uuid4().hex[:8]}")
+        initial = await full_crawl(client, base, model, site.root, set())
+        print(f"Initial crawl: {initial['pages_fetched']} pages, {initial['chunks_embedded']} chunks "
+              f"in {initial['total_seconds']:.1f}s")
+        indexed = set(site.page_paths)
+
+        # A batch of author changes after the last run
+        since = site.created + timedelta(days=1)
+        changed = rng.sample(site.page_paths[1:], max(1, int(len(site.page_paths) * args.changed)))
+        for i, page in enumerate(changed):
+            site.edit(page, component=rng.randrange(site.components), when=since + timedelta(minutes=i + 1))
+        leaves = [p for p in site.page_paths if p not in changed and not any(q.startswith(p + "/") for q in site.page_paths)]
+        for page in rng.sample(leaves, args.deleted):
+            site.delete(page)
+        for i in range(args.moved):
+            site.add_page(f"{site.root}/en/moved-{i}")
+
+        full_collection, catch_up_collection = clone(base), clone(base)
+        results = {
+            "pages": len(site.page_paths), "edited": len(changed), "deleted": args.deleted, "moved": args.moved,
+            "latency_ms": args.latency_ms,
+            "full_crawl": await full_crawl(client, full_collection, model, site.root, indexed),
+            "catch_up": await catch_up(client, catch_up_collection, model, site.root, since),
+        }
+        results["consistent"] = (set(full_collection.get(include=[])["ids"])
+                                 == set(catch_up_collection.get(include=[])["ids"]))
+    return results
+
+
+def main():
+    args = parse_args()
+    site = SyntheticSite(pages=args.pages, seed=args.seed)
+    server = serve_site(site, delay=args.latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    crawler.AEM_BASE_URL = base_url
+    crawler.QUERY_BUILDER_URL = f"{base_url}/bin/querybuilder.json"
+    model = HashingEmbedder() if args.hash_embeddings else get_embedding_model()
+    try:
+        results = asyncio.run(run(args, site, model))
+    finally:
+        server.shutdown()
+
+    print(f"\n{results['edited']} pages edited, {results['deleted']} deleted, {results['moved']} moved in; "
+          f"index consistent: {results['consistent']}")
+    print(f"\n{'method':<12} {'queries':>8} {'fetched':>8} {'embedded':>9} {'list_s':>7} {'fetch_s':>8} "
+          f"{'embed_s':>8} {'total_s':>8}")
+    for method in ("full_crawl", "catch_up"):
+        row = results[method]
+        print(f"{method:<12} {row['queries']:>8} {row['pages_fetched']:>8} {row['chunks_embedded']:>9} "
+              f"{row['list_seconds']:>7.2f} {row['fetch_seconds']:>8.2f} {row['embed_seconds']:>8.2f} "
+              f"{row['total_seconds']:>8.2f}")
+    print(f"\nCatch-up is {results['full_crawl']['total_seconds'] / results['catch_up']['total_seconds']:.0f}x faster")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
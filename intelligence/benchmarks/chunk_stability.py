@@ -0,0 +1,169 @@
+"""
+Chunk stability benchmark: chunks a live sync has to embed after typical
+page edits, with positional chunk IDs vs. component-anchored ones.
+
+Pages are generated with a realistic mix of component sizes (titles and
+buttons, teasers and text, long articles). Each page gets one edit of each
+kind (including about 100 characters added to its first component), and
+the sync embed volume is reported per kind of edit, in chunks and
+characters:
+  - positional, full: the page text concatenated and split, IDs by position;
+    sync re-embeds every chunk of the page (the previous behaviour)
+  - positional, diff: the same chunks, embedding only those whose text at
+    a position changed (the best a positional ID scheme can do)
+  - anchored: chunks packed and split per component (page_records), IDs
+    from component path and text; sync embeds only new IDs
+
+Usage:
+    python benchmarks/chunk_stability.py --pages 200 --output chunk_stability.json
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.crawler.crawler import chunk_doc_id, extract_text_from_component, page_records, splitter
+from tests.mock_server import SYNTHETIC_WORDS
+
+# Component text sizes in characters: (share of components, min, max)
+COMPONENT_SIZES = [(0.5, 20, 150), (0.35, 150, 600), (0.15, 600, 2500)]
+EDITS = ["word", "sentence", "lengthen first", "add component", "remove component", "title"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed volume of page edits: positional vs. component-anchored chunks")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--components", type=int, default=12, help="Text components per page")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def words(rng, size):
+    text = []
+    while sum(len(w) + 1 for w in text) < size:
+        text.append(rng.choice(SYNTHETIC_WORDS))
+    return " ".join(text).capitalize() + "."
+
+
+def component_text(rng):
+    share = rng.random()
+    for weight, low, high in COMPONENT_SIZES:
+        if share < weight:
+            return words(rng, rng.randint(low, high))
+        share -= weight
+    return words(rng, COMPONENT_SIZES[-1][2])
+
+
+def generate_page(rng, components):
+    """
+    A .model.json with `components` text components in two containers.
+    """
+    items = {f"text_{i}": {":type": "wknd/components/text", "text": component_text(rng)} for i in range(components)}
+    names = list(items)
+    half = len(names) // 2
+    return {"jcr:content": {
+        "jcr:title": words(rng, 20),
+        "root": {":items": {
+            "container": {":items": {name: items[name] for name in names[:half]}},
+            "container_2": {":items": {name: items[name] for name in names[half:]}},
+        }},
+    }}
+
+
+def text_components(data):
+    """
+    The text components' dicts, in page order.
+    """
+    return [item for container in data["jcr:content"]["root"][":items"].values()
+            for item in container[":items"].values()]
+
+
+def edit_page(rng, data, kind):
+    """
+    A copy of the page with one edit of the given kind.
+    """
+    data = copy.deepcopy(data)
+    components = text_components(data)
+    target = rng.choice(components)
+    if kind == "lengthen first":
+        # The worst case for packing by accumulated length: every later boundary could shift
+        components[0]["text"] += " " + words(rng, 100)
+    elif kind == "word":
+        tokens = target["text"].split(" ")
+        tokens[rng.randrange(len(tokens))] = rng.choice(SYNTHETIC_WORDS)
+        target["text"] = " ".join(tokens)
+    elif kind == "sentence":
+        target["text"] += " " + words(rng, 80)
+    elif kind == "title":
+        data["jcr:content"]["jcr:title"] = words(rng, 20)
+    else:
+        container = rng.choice(list(data["jcr:content"]["root"][":items"].values()))[":items"]
+        if kind == "add component":
+            container[f"text_new_{rng.randrange(1 << 30)}"] = {"text": words(rng, rng.randint(150, 600))}
+        elif len(container) > 1:
+            del container[rng.choice(list(container))]
+    return data
+
+
+def positional_chunks(data):
+    """
+    Chunks as process_page produced them before component anchoring.
+    """
+    texts = list(dict.fromkeys(extract_text_from_component(data["jcr:content"])))
+    return splitter.split_text("\n\n".join(texts))
+
+
+def embed_volume(before, after):
+    """
+    (chunks, chars) to embed per scheme when a page goes from `before` to `after`.
+    """
+    old, new = positional_chunks(before), positional_chunks(after)
+    diff = [text for i, text in enumerate(new) if i >= len(old) or old[i] != text]
+    stored = {chunk_doc_id(r) for r in page_records("/content/page", before)}
+    anchored = [r["text"] for r in page_records("/content/page", after) if chunk_doc_id(r) not in stored]
+    return {
+        "positional_full": (len(new), sum(map(len, new))),
+        "positional_diff": (len(diff), sum(map(len, diff))),
+        "anchored": (len(anchored), sum(map(len, anchored))),
+    }
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    pages = [generate_page(rng, args.components) for _ in range(args.pages)]
+
+    positional_sizes = [len(positional_chunks(page)) for page in pages]
+    anchored_sizes = [len(page_records("/content/page", page)) for page in pages]
+    results = {
+        "pages": args.pages,
+        "chunks_per_page": {"positional": statistics.mean(positional_sizes), "anchored": statistics.mean(anchored_sizes)},
+        "edits": {},
+    }
+    print(f"{args.pages} pages, chunks per page: positional {results['chunks_per_page']['positional']:.1f}, "
+          f"anchored {results['chunks_per_page']['anchored']:.1f}")
+
+    print(f"\n{'edit':<18} {'scheme':<16} {'chunks':>7} {'chars':>8} {'of page':>8}")
+    for kind in EDITS:
+        volumes = [embed_volume(page, edit_page(rng, page, kind)) for page in pages]
+        page_chars = statistics.mean(v["positional_full"][1] for v in volumes)
+        results["edits"][kind] = {}
+        for scheme in ("positional_full", "positional_diff", "anchored"):
+            chunks = statistics.mean(v[scheme][0] for v in volumes)
+            chars = statistics.mean(v[scheme][1] for v in volumes)
+            results["edits"][kind][scheme] = {"chunks": chunks, "chars": chars, "share": chars / page_chars}
+            print(f"{kind:<18} {scheme:<16} {chunks:>7.2f} {chars:>8.0f} {chars / page_chars:>7.0%}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
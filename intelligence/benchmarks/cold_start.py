@@ -0,0 +1,144 @@
+"""
+Cold-start benchmark: time for a new node to serve its first query from
+  - re-ingest: embedding and upserting every crawled chunk (the crawl itself
+    is not included, so a real rebuild is slower still)
+  - directory copy: copying a live ChromaDB directory and opening it
+  - snapshot: bulk-loading a snapshot file (src/vector_store/snapshot.py),
+    with and without checksum verification
+
+It also reports export time, snapshot and directory sizes, and the top-k
+overlap between queries on the original and the snapshot-loaded collection.
+Chunks come from a crawler JSONL file or are split from a generated site.
+
+Usage:
+    python benchmarks/cold_start.py --input output.jsonl --output cold_start.json
+    python benchmarks/cold_start.py --pages 1000 --hash-embeddings
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import chromadb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from benchmarks.context_packing import sample_queries, synthetic_chunks
+from benchmarks.end_to_end import HashingEmbedder
+from benchmarks.projection_recall import directory_size
+from src.utils.embeddings import compute_embeddings, get_embedding_model
+from src.vector_store.collection import get_or_create_collection
+from src.vector_store.evaluation import recall_at_k
+from src.vector_store.ingest import ingest_file
+from src.vector_store.snapshot import export_snapshot, load_snapshot
+
+COLLECTION = "aem_content"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold start: re-ingest vs. directory copy vs. snapshot load")
+    parser.add_argument("--input", help="Crawler JSONL file (default: chunks of a generated site)")
+    parser.add_argument("--pages", type=int, default=500, help="Pages of the generated site")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Feature-hashing embedder instead of the model")
+    parser.add_argument("--queries", type=int, default=100, help="Queries for the first-query latency and top-k overlap")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def first_query(path, name, embedding):
+    """
+    Opens the collection in a new client and runs one query, as a freshly
+    started service would. Returns the seconds taken.
+    """
+    start = time.perf_counter()
+    chromadb.PersistentClient(path=path).get_collection(name=name).query(query_embeddings=[embedding], n_results=3)
+    return time.perf_counter() - start
+
+
+def top_k(path, name, embeddings, k):
+    result = chromadb.PersistentClient(path=path).get_collection(name=name).query(
+        query_embeddings=embeddings, n_results=k
+    )
+    return result["ids"]
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="cold-start-bench-")
+    try:
+        input_file = args.input
+        if not input_file:
+            input_file = os.path.join(workdir, "output.jsonl")
+            with open(input_file, "w", encoding="utf-8") as f:
+                for record in synthetic_chunks(args.pages, args.seed):
+                    f.write(json.dumps(record) + "\n")
+        with open(input_file, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        model = HashingEmbedder() if args.hash_embeddings else get_embedding_model()
+        query_embeddings = compute_embeddings(model, sample_queries(records, args.queries, args.seed))
+        compute_embeddings(model, ["warm-up"])
+        print(f"{len(records)} chunks, {'hashing' if args.hash_embeddings else 'model'} embeddings")
+
+        # Re-ingest from the crawl output
+        source_path = os.path.join(workdir, "source")
+        start = time.perf_counter()
+        collection = get_or_create_collection(chromadb.PersistentClient(path=source_path), COLLECTION)
+        ingest_file(collection, model, input_file)
+        ingest_s = time.perf_counter() - start
+        ingest_first_s = first_query(source_path, COLLECTION, query_embeddings[0])
+
+        # Export once on the source node
+        snapshot_file = os.path.join(workdir, "index.snapshot.tar")
+        start = time.perf_counter()
+        export_snapshot(collection, snapshot_file, alias=COLLECTION)
+        export_s = time.perf_counter() - start
+
+        # Copy of the live directory
+        copy_path = os.path.join(workdir, "copy")
+        start = time.perf_counter()
+        shutil.copytree(source_path, copy_path)
+        copy_s = time.perf_counter() - start
+        copy_first_s = first_query(copy_path, COLLECTION, query_embeddings[0])
+
+        results = {"chunks": len(records), "export_seconds": export_s,
+                   "snapshot_bytes": os.path.getsize(snapshot_file), "directory_bytes": directory_size(source_path)}
+        rows = [("re-ingest", ingest_s, ingest_first_s), ("directory copy", copy_s, copy_first_s)]
+        for verify in (True, False):
+            target = os.path.join(workdir, f"snapshot-{verify}")
+            start = time.perf_counter()
+            load_snapshot(chromadb.PersistentClient(path=target), snapshot_file, COLLECTION, verify=verify)
+            load_s = time.perf_counter() - start
+            rows.append((f"snapshot{'' if verify else ' (no verify)'}", load_s,
+                         first_query(target, COLLECTION, query_embeddings[0])))
+
+        expected = top_k(source_path, COLLECTION, query_embeddings, args.k)
+        loaded = top_k(os.path.join(workdir, "snapshot-True"), COLLECTION, query_embeddings, args.k)
+        results[f"top{args.k}_overlap"] = recall_at_k(loaded, expected, args.k)
+        results["methods"] = [
+            {"method": name, "load_seconds": load_s, "first_query_seconds": first_s,
+             "ready_seconds": load_s + first_s, "chunks_per_second": len(records) / load_s}
+            for name, load_s, first_s in rows
+        ]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = results["methods"][0]["ready_seconds"]
+    print(f"\nSnapshot {results['snapshot_bytes'] / 1e6:.1f} MB (directory {results['directory_bytes'] / 1e6:.1f} MB), "
+          f"exported in {results['export_seconds']:.2f}s, top-{args.k} overlap {results[f'top{args.k}_overlap']:.3f}")
+    print(f"\n{'method':<22} {'load_s':>8} {'first_q_s':>10} {'ready_s':>8} {'chunks/s':>10} {'speedup':>8}")
+    for row in results["methods"]:
+        print(f"{row['method']:<22} {row['load_seconds']:>8.2f} {row['first_query_seconds']:>10.3f} "
+              f"{row['ready_seconds']:>8.2f} {row['chunks_per_second']:>10.0f} {baseline / row['ready_seconds']:>7.1f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
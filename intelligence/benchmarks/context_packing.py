@@ -0,0 +1,139 @@
+"""
+Context packing benchmark: prompt tokens of the packed context vs. the
+unpacked "Source: ...\nContent: ..." join of the retrieved chunks.
+
+Indexes crawler chunks (from a crawler JSONL file, or split from a generated
+site with the crawler's own splitter) into a throwaway collection, runs
+queries for each n_results and token budget, and reports per combination:
+  - mean prompt tokens unpacked and packed, and the share saved
+  - chunks per page merged into one block, contexts truncated to the budget
+  - packing time p50/p99
+
+Queries are word windows taken from indexed chunks, so as with real
+questions about a page, neighbouring chunks of that page tend to be
+retrieved together.
+
+Usage:
+    python benchmarks/context_packing.py --input output.jsonl --n-results 3,5,10 --budgets 500,1500
+    python benchmarks/context_packing.py --pages 200 --hash-embeddings --output packing.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+import chromadb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from benchmarks.end_to_end import HashingEmbedder
+from benchmarks.hnsw_recall import parse_int_list
+from src.crawler.crawler import chunk_doc_id, page_records
+from src.utils.embeddings import compute_embeddings, get_embedding_model
+from src.vector_store.context import assemble_context
+from src.vector_store.evaluation import latency_percentiles
+from src.vector_store.ingest import iter_batches
+from tests.mock_server import SyntheticSite
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Token savings of context packing")
+    parser.add_argument("--input", help="Crawler JSONL file (default: chunks of a generated site)")
+    parser.add_argument("--pages", type=int, default=100, help="Pages of the generated site")
+    parser.add_argument("--n-results", type=parse_int_list, default=[3, 5, 10], help="Comma-separated chunks retrieved")
+    parser.add_argument("--budgets", type=parse_int_list, default=[500, 1500], help="Comma-separated token budgets")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--hash-embeddings", action="store_true", help="Feature-hashing embedder instead of the model")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def synthetic_chunks(pages, seed):
+    """
+    Crawler records for a generated site, split like process_page does.
+    """
+    site = SyntheticSite(pages=pages, seed=seed)
+    for path in site.page_paths:
+        yield from page_records(path, site.model_json(path))
+
+
+def build_collection(records, model):
+    collection = chromadb.EphemeralClient().create_collection(f"packing_{uuid.uuid4().hex[:8]}")
+    for i in range(0, len(records), 500):
+        batch = records[i:i + 500]
+        docs = [r["text"] for r in batch]
+        collection.add(
+            ids=[chunk_doc_id(r) for r in batch],
+            documents=docs,
+            embeddings=compute_embeddings(model, docs),
+            metadatas=[{**r.get("metadata", {}), "source": r["source"], "chunk_id": r["chunk_id"]} for r in batch],
+        )
+    return collection
+
+
+def sample_queries(records, n, seed):
+    rng = random.Random(seed)
+    queries = []
+    for record in rng.sample(records, min(n, len(records))):
+        words = record["text"].split()
+        start = rng.randrange(max(len(words) - 8, 1))
+        queries.append(" ".join(words[start:start + 8]))
+    return queries
+
+
+def main():
+    args = parse_args()
+    if args.input:
+        records = []
+        for docs, ids, metadatas in iter_batches(args.input):
+            records.extend({"source": m["source"], "chunk_id": m["chunk_id"], "text": d, "metadata": m}
+                           for d, m in zip(docs, metadatas))
+    else:
+        records = list(synthetic_chunks(args.pages, args.seed))
+    model = HashingEmbedder() if args.hash_embeddings else get_embedding_model()
+    collection = build_collection(records, model)
+    queries = sample_queries(records, args.queries, args.seed)
+    embeddings = compute_embeddings(model, queries)
+    print(f"{len(records)} chunks from {len({r['source'] for r in records})} pages, {len(queries)} queries")
+
+    results = []
+    for n_results in args.n_results:
+        found = collection.query(query_embeddings=embeddings, n_results=n_results)
+        for budget in args.budgets:
+            raw, packed_tokens, merged, truncated, timings = 0, 0, 0, 0, []
+            for docs, metas, dists in zip(found["documents"], found["metadatas"], found["distances"]):
+                start = time.perf_counter()
+                packed = assemble_context(docs, metas, dists, budget)
+                timings.append((time.perf_counter() - start) * 1000)
+                raw += packed.raw_tokens
+                packed_tokens += packed.tokens
+                merged += len(docs) - len(packed.sources) - packed.dropped
+                truncated += any(s["truncated"] for s in packed.sources) or packed.dropped > 0
+            results.append({
+                "n_results": n_results,
+                "budget": budget,
+                "raw_tokens": raw / len(queries),
+                "tokens": packed_tokens / len(queries),
+                "saved_ratio": 1 - packed_tokens / raw if raw else 0.0,
+                "merged_chunks": merged / len(queries),
+                "truncated_ratio": truncated / len(queries),
+                **{f"pack_{p}_ms": v for p, v in latency_percentiles(timings, (50, 99)).items()},
+            })
+
+    print(f"\n{'n':>3} {'budget':>7} {'raw_tok':>8} {'packed':>8} {'saved':>6} {'merged':>7} {'trunc':>6} {'p50_ms':>7} {'p99_ms':>7}")
+    for row in results:
+        print(f"{row['n_results']:>3} {row['budget']:>7} {row['raw_tokens']:>8.0f} {row['tokens']:>8.0f} "
+              f"{row['saved_ratio']:>6.0%} {row['merged_chunks']:>7.2f} {row['truncated_ratio']:>6.0%} "
+              f"{row['pack_p50_ms']:>7.3f} {row['pack_p99_ms']:>7.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(records), "queries": len(queries), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
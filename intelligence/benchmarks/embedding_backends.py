@@ -0,0 +1,134 @@
+"""
+Embedding backend benchmark: PyTorch SentenceTransformer vs. ONNX Runtime.
+
+Runs the same texts through the torch model and each ONNX export found in the
+model directory (fp32 and int8), and reports:
+  - single-query latency p50/p95/p99 (batch of one, as /api/v1/chat embeds)
+  - ingest throughput in texts/sec at the given batch size
+  - cosine similarity of each ONNX embedding to the torch one (mean / min)
+
+Texts come from a crawler JSONL file if given, otherwise they are generated.
+
+Usage:
+    python src/utils/onnx_export.py
+    python benchmarks/embedding_backends.py --input output.jsonl --texts 2000 --output embeddings.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.utils.embeddings import LOCAL_MODEL_NAME, ONNX_CONFIG_FILE, ONNX_FILES, ONNX_MODEL_DIR, OnnxEmbeddingModel
+from src.vector_store.evaluation import latency_percentiles
+from tests.mock_server import SYNTHETIC_WORDS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Torch vs. ONNX Runtime embedding benchmark")
+    parser.add_argument("--onnx-dir", default=ONNX_MODEL_DIR, help="Exported model directory (ONNX_MODEL_DIR)")
+    parser.add_argument("--model", help="Torch model to compare with (defaults to the export's source model)")
+    parser.add_argument("--input", help="Crawler JSONL file to take chunk texts from")
+    parser.add_argument("--texts", type=int, default=1000, help="Texts embedded for throughput")
+    parser.add_argument("--queries", type=int, default=200, help="Single-text encodes timed for latency")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads for both backends (0 = default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def load_texts(input_file, n, seed):
+    """
+    Chunk texts from a crawler JSONL file, or generated chunk-sized texts.
+    """
+    if input_file:
+        texts = []
+        with open(input_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    texts.append(json.loads(line).get("text", ""))
+                if len(texts) >= n:
+                    break
+        return [t for t in texts if t]
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(rng.randint(5, 110))) for _ in range(n)]
+
+
+def benchmark(encode, texts, queries, batch_size):
+    """
+    Times single-text and batched encodes. Returns the results and the
+    batched embeddings.
+    """
+    encode(texts[:batch_size])  # warm-up
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        encode([query])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    embeddings = np.asarray(encode(texts))
+    seconds = time.perf_counter() - start
+    return {
+        **{f"query_{p}_ms": v for p, v in latency_percentiles(latencies).items()},
+        "texts": len(texts),
+        "seconds": seconds,
+        "texts_per_second": len(texts) / seconds,
+    }, embeddings
+
+
+def main():
+    args = parse_args()
+    with open(os.path.join(args.onnx_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    model_name = args.model or config.get("source_model", LOCAL_MODEL_NAME)
+
+    texts = load_texts(args.input, args.texts, args.seed)
+    rng = random.Random(args.seed)
+    queries = [" ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(rng.randint(2, 8))) for _ in range(args.queries)]
+    print(f"{len(texts)} texts, {len(queries)} queries, batch size {args.batch_size}, torch model '{model_name}'")
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch_model = SentenceTransformer(model_name, device="cpu")
+    results = []
+    row, reference = benchmark(lambda batch: torch_model.encode(batch, batch_size=args.batch_size),
+                               texts, queries, args.batch_size)
+    results.append({"backend": "torch", "model": model_name, **row})
+
+    for model_file in reversed(ONNX_FILES):
+        if not os.path.exists(os.path.join(args.onnx_dir, model_file)):
+            continue
+        onnx_model = OnnxEmbeddingModel(args.onnx_dir, model_file, args.threads, args.batch_size)
+        row, embeddings = benchmark(onnx_model.encode, texts, queries, args.batch_size)
+        cosine = (embeddings * reference).sum(axis=1) / (
+            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1)
+        )
+        results.append({"backend": "onnx", "model": model_file, **row,
+                        "cosine_mean": float(cosine.mean()), "cosine_min": float(cosine.min())})
+
+    baseline = results[0]["texts_per_second"]
+    print(f"\n{'backend':<24} {'q_p50_ms':>9} {'q_p95_ms':>9} {'q_p99_ms':>9} {'texts/s':>9} {'speedup':>8} {'cos_min':>8}")
+    for row in results:
+        name = f"{row['backend']}:{row['model']}" if row["backend"] == "onnx" else "torch"
+        cos_min = f"{row['cosine_min']:.4f}" if "cosine_min" in row else "-"
+        print(f"{name:<24} {row['query_p50_ms']:>9.2f} {row['query_p95_ms']:>9.2f} {row['query_p99_ms']:>9.2f} "
+              f"{row['texts_per_second']:>9.1f} {row['texts_per_second'] / baseline:>7.2f}x {cos_min:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"batch_size": args.batch_size, "threads": args.threads, "cpus": os.cpu_count(),
+                       "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+End-to-end pipeline benchmark on a synthetic AEM site.
+
+Serves a generated site (tests/mock_server.py) in place of AEM, then measures:
+  - crawl: Query Builder discovery plus concurrent .model.json fetch and
+    chunking (pages/s, chunks/s)
+  - ingest: embedding and ChromaDB upsert throughput, timed separately
+  - endpoints: /api/v1/context and /api/v1/chat latency p50/p95/p99 under
+    concurrent load against the live sync service running on the ingested
+    collection
+
+Everything runs against a throwaway ChromaDB in a temporary directory. The
+results JSON records the configuration, commit and host so runs of different
+versions can be compared; --baseline prints the change against an earlier
+results file.
+
+--hash-embeddings swaps the sentence-transformer for a feature-hashing
+embedder, measuring the pipeline without model cost (or without a model
+download).
+
+Usage:
+    python benchmarks/end_to_end.py --pages 500 --clients 8 --requests 400 --output e2e.json
+    python benchmarks/end_to_end.py --pages 500 --baseline e2e.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+
+import httpx
+import numpy as np
+import uvicorn
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.vector_store.evaluation import latency_percentiles
+from tests.mock_server import SyntheticSite, serve_site
+
+BENCH_COLLECTION = "e2e_bench"
+
+# (section, metric, higher is better) compared against --baseline
+COMPARED_METRICS = [
+    ("crawl", "pages_per_second", True),
+    ("crawl", "chunks_per_second", True),
+    ("ingest", "chunks_per_second", True),
+    ("ingest", "embed_chunks_per_second", True),
+    ("ingest", "upsert_chunks_per_second", True),
+    ("context", "p50_ms", False),
+    ("context", "p95_ms", False),
+    ("context", "p99_ms", False),
+    ("chat", "p50_ms", False),
+    ("chat", "p95_ms", False),
+    ("chat", "p99_ms", False),
+]
+
+
+class HashingEmbedder:
+    """
+    Feature-hashing stand-in for SentenceTransformer.encode: tokens are
+    hashed into signed buckets and the vector is L2-normalised.
+    """
+
+    def __init__(self, dims=384):
+        self.dims = dims
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dims] += 1.0 if h & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end crawl/ingest/query benchmark on a synthetic AEM site")
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the synthetic site")
+    parser.add_argument("--depth", type=int, default=3, help="Container nesting depth per page")
+    parser.add_argument("--components", type=int, default=5, help="Text components per page")
+    parser.add_argument("--text-size", type=int, default=800, help="Characters per text component")
+    parser.add_argument("--crawl-concurrency", type=int, default=10, help="Concurrent page fetches")
+    parser.add_argument("--batch-size", type=int, default=50, help="Chunks per embed/upsert batch")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients per endpoint")
+    parser.add_argument("--endpoints", default="context,chat", help="Comma-separated endpoints to load (context, chat)")
+    parser.add_argument("--retrieval-cache", action="store_true",
+                        help="Keep the service's retrieval cache on (off by default, so every request retrieves)")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Use a feature-hashing embedder instead of the model")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change reported as a regression")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary ChromaDB and crawl output")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(workdir, aem_url, retrieval_cache):
+    """
+    Points the pipeline at the synthetic site and a throwaway ChromaDB. The
+    src modules read their configuration at import, so this runs first.
+    """
+    chroma_path = os.path.join(workdir, "chroma_db")
+    os.environ.update({
+        "AEM_BASE_URL": aem_url,
+        "CHROMA_DB_PATH": chroma_path,
+        "CHROMA_ALIAS_FILE": os.path.join(chroma_path, "aliases.json"),
+        "CHROMA_COLLECTION_NAME": BENCH_COLLECTION,
+        "QUERY_STATS_FILE": os.path.join(workdir, "query_stats.json"),
+        "TRAFFIC_RANKING_FILE": "",
+        "RECONCILE_INTERVAL_SECONDS": "0",
+        "PREWARM_ON_STARTUP": "false",
+    })
+    if not retrieval_cache:
+        os.environ["RETRIEVAL_CACHE_SIZE"] = "0"
+    return chroma_path
+
+
+async def bench_crawl(site, concurrency, output_file):
+    """
+    Discovers and crawls the site, writing the chunks as crawler JSONL.
+    """
+    from src.crawler.crawler import crawl_pages, search_pages
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+        start = time.perf_counter()
+        pages = await search_pages(client, site.root)
+        discovered = time.perf_counter()
+        results = await crawl_pages(client, pages, concurrency)
+        elapsed = time.perf_counter() - start
+
+    records = [record for page_records in results for record in page_records]
+    with open(output_file, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return {
+        "pages": len(pages),
+        "chunks": len(records),
+        "text_bytes": sum(len(record["text"]) for record in records),
+        "discovery_seconds": discovered - start,
+        "seconds": elapsed,
+        "pages_per_second": len(pages) / elapsed,
+        "chunks_per_second": len(records) / elapsed,
+    }
+
+
+def bench_ingest(chroma_path, model, input_file, batch_size):
+    """
+    Embeds and upserts the crawl output, timing each phase separately.
+    """
+    import chromadb
+    from src.utils.embeddings import compute_embeddings
+    from src.vector_store.collection import get_or_create_collection, resolve_alias
+    from src.vector_store.ingest import iter_batches
+
+    collection = get_or_create_collection(chromadb.PersistentClient(path=chroma_path), resolve_alias(BENCH_COLLECTION))
+    chunks, embed_seconds, upsert_seconds = 0, 0.0, 0.0
+    for docs, ids, metadatas in iter_batches(input_file, batch_size):
+        start = time.perf_counter()
+        embeddings = compute_embeddings(model, docs)
+        embedded = time.perf_counter()
+        collection.upsert(ids=ids, documents=docs, embeddings=embeddings, metadatas=metadatas)
+        upsert_seconds += time.perf_counter() - embedded
+        embed_seconds += embedded - start
+        chunks += len(docs)
+    seconds = embed_seconds + upsert_seconds
+    return {
+        "chunks": chunks,
+        "batch_size": batch_size,
+        "seconds": seconds,
+        "embed_seconds": embed_seconds,
+        "upsert_seconds": upsert_seconds,
+        "chunks_per_second": chunks / seconds if seconds else 0.0,
+        "embed_chunks_per_second": chunks / embed_seconds if embed_seconds else 0.0,
+        "upsert_chunks_per_second": chunks / upsert_seconds if upsert_seconds else 0.0,
+    }
+
+
+def start_service(port):
+    """
+    Runs the live sync service with uvicorn in a background thread.
+    """
+    from src.crawler.live_sync_service import app
+
+    # Per-request INFO logs would dominate the measured latency
+    for name in ("src.crawler.live_sync_service", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 120
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("live sync service did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run_load(url, bodies, clients, timeout=60.0):
+    """
+    Sends `bodies` to `url` from `clients` concurrent clients. Percentiles
+    cover successful responses; shed or failed ones are counted by status.
+    """
+    latencies, statuses = [], Counter()
+    pending = iter(bodies)
+
+    async def client_loop(client):
+        for body in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=body)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            statuses[str(response.status_code)] += 1
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=clients)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[client_loop(client) for _ in range(clients)])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(bodies),
+        "clients": clients,
+        "seconds": elapsed,
+        "requests_per_second": len(bodies) / elapsed,
+        "errors": len(bodies) - statuses["200"],
+        "statuses": dict(statuses),
+        "mean_ms": float(np.mean(latencies)) if latencies else 0.0,
+        "max_ms": max(latencies, default=0.0),
+        **{f"{p}_ms": v for p, v in latency_percentiles(latencies).items()},
+    }
+
+
+async def bench_endpoints(base_url, site, endpoints, requests, clients):
+    queries = site.sample_queries(requests)
+    sections = [page for page in site.page_paths if page.count("/") == site.root.count("/") + 2] or [None]
+    results = {}
+    for endpoint in endpoints:
+        if endpoint == "context":
+            bodies = [{"query": q, "scope": sections[i % len(sections)] if i % 2 else None} for i, q in enumerate(queries)]
+        else:
+            bodies = [{"message": q} for q in queries]
+        url = f"{base_url}/api/v1/{endpoint}"
+        await run_load(url, bodies[:clients], clients)  # warm-up
+        results[endpoint] = await run_load(url, bodies, clients)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints each compared metric against the baseline. Returns the metrics
+    that got worse by more than `tolerance`.
+    """
+    regressions = []
+    print(f"\n{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for section, metric, higher_is_better in COMPARED_METRICS:
+        group = "endpoints" if section in ("context", "chat") else section
+        old = baseline.get(group, {}).get(section, {}) if group == "endpoints" else baseline.get(group, {})
+        new = results.get(group, {}).get(section, {}) if group == "endpoints" else results.get(group, {})
+        if metric not in old or metric not in new or not old[metric]:
+            continue
+        change = (new[metric] - old[metric]) / old[metric]
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"{section + '.' + metric:<36} {old[metric]:>12.2f} {new[metric]:>12.2f} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(f"{section}.{metric}")
+    return regressions
+
+
+def print_results(results):
+    crawl, ingest = results["crawl"], results["ingest"]
+    print(f"\nCrawl:  {crawl['pages']} pages, {crawl['chunks']} chunks in {crawl['seconds']:.2f}s "
+          f"({crawl['pages_per_second']:.1f} pages/s, {crawl['chunks_per_second']:.1f} chunks/s)")
+    print(f"Ingest: {ingest['chunks']} chunks in {ingest['seconds']:.2f}s ({ingest['chunks_per_second']:.1f} chunks/s; "
+          f"embed {ingest['embed_chunks_per_second']:.1f}/s, upsert {ingest['upsert_chunks_per_second']:.1f}/s)")
+    print(f"\n{'endpoint':<10} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'errors':>7}")
+    for endpoint, row in results["endpoints"].items():
+        print(f"{endpoint:<10} {row['requests_per_second']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['errors']:>7}")
+
+
+def main():
+    args = parse_args()
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    site = SyntheticSite(args.pages, args.depth, args.components, args.text_size, seed=args.seed)
+    aem = serve_site(site)
+    workdir = tempfile.mkdtemp(prefix="aem-e2e-")
+    chroma_path = configure_environment(workdir, f"http://127.0.0.1:{aem.server_address[1]}", args.retrieval_cache)
+
+    from src.utils import embeddings
+    if args.hash_embeddings:
+        embeddings._MODEL_CACHE = HashingEmbedder()  # the service picks it up through get_embedding_model
+    model = embeddings.get_embedding_model()
+
+    server = None
+    try:
+        print(f"Synthetic site: {args.pages} pages x {args.components} components "
+              f"(depth {args.depth}, {args.text_size} chars) at {os.environ['AEM_BASE_URL']}")
+        crawl_file = os.path.join(workdir, "output.jsonl")
+        results = {
+            "commit": git_commit(),
+            "timestamp": int(time.time()),
+            "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "config": {**vars(args), "embedding_model": type(model).__name__},
+            "crawl": asyncio.run(bench_crawl(site, args.crawl_concurrency, crawl_file)),
+        }
+        results["ingest"] = bench_ingest(chroma_path, model, crawl_file, args.batch_size)
+
+        port = free_port()
+        server, thread = start_service(port)
+        results["endpoints"] = asyncio.run(
+            bench_endpoints(f"http://127.0.0.1:{port}", site, endpoints, args.requests, args.clients)
+        )
+    finally:
+        if server:
+            server.should_exit = True
+            thread.join(timeout=30)
+        aem.shutdown()
+        if args.keep_workdir:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+HNSW parameter benchmark: recall@k vs. query latency on the stored corpus.
+
+Copies the embeddings of the live collection into in-memory collections built
+for each (M, ef_construction, ef_search) combination. A loaded index keeps the
+ef_search it was opened with, so every setting gets its own build. Exact top-k
+ground truth is computed with NumPy over the same embeddings.
+
+Usage:
+    python benchmarks/hnsw_recall.py --m 16,32 --ef-construction 100,200 --ef-search 10,50,100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.vector_store.collection import hnsw_configuration, resolve_alias
+from src.vector_store.evaluation import exact_top_k, recall_at_k, latency_percentiles
+
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
+PAGE_SIZE = 1000
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency benchmark")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Source collection with stored embeddings")
+    parser.add_argument("--k", type=int, default=3, help="Neighbours per query (recall@k)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of stored vectors sampled as queries")
+    parser.add_argument("--m", type=parse_int_list, default=[16], help="Comma-separated max_neighbors (M) values")
+    parser.add_argument("--ef-construction", type=parse_int_list, default=[100], help="Comma-separated ef_construction values")
+    parser.add_argument("--ef-search", type=parse_int_list, default=[10, 20, 50, 100], help="Comma-separated ef_search values")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="Distance space (defaults to the source collection's)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def load_embeddings(collection):
+    """
+    Reads all ids and embeddings from a collection in pages.
+    """
+    ids, embeddings = [], []
+    offset = 0
+    while True:
+        page = collection.get(limit=PAGE_SIZE, offset=offset, include=["embeddings"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        embeddings.extend(page["embeddings"])
+        offset += len(page["ids"])
+    return ids, np.asarray(embeddings, dtype=np.float32)
+
+
+def build_collection(client, ids, embeddings, space, m, ef_construction, ef_search):
+    """
+    Builds a throwaway collection with the given HNSW parameters.
+    Returns the collection and the build time in seconds.
+    """
+    name = f"hnsw-bench-{uuid.uuid4().hex[:8]}"
+    collection = client.create_collection(
+        name=name,
+        configuration={"hnsw": hnsw_configuration(space=space, m=m, ef_construction=ef_construction, ef_search=ef_search)}
+    )
+    batch_size = client.get_max_batch_size()
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch_size):
+        collection.add(ids=ids[i:i + batch_size], embeddings=embeddings[i:i + batch_size].tolist())
+    return collection, time.perf_counter() - start
+
+
+def run_queries(collection, queries, k):
+    """
+    Issues one query per vector (as the service does) and records latencies.
+    """
+    retrieved, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        retrieved.append(result["ids"][0])
+    return retrieved, latencies
+
+
+def main():
+    args = parse_args()
+
+    source = chromadb.PersistentClient(path=CHROMA_DB_PATH).get_collection(name=resolve_alias(args.collection))
+    space = args.space or ((source.configuration or {}).get("hnsw") or {}).get("space", "l2")
+    ids, embeddings = load_embeddings(source)
+    if len(ids) == 0:
+        print(f"Collection '{args.collection}' is empty.")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    queries = embeddings[sample]
+
+    print(f"Corpus: {len(ids)} vectors x {embeddings.shape[1]} dims, space={space}, {len(queries)} queries, k={args.k}")
+    start = time.perf_counter()
+    truth_idx = exact_top_k(embeddings, queries, args.k, space)
+    print(f"Exact ground truth computed in {time.perf_counter() - start:.2f}s")
+    truth = [[ids[i] for i in row] for row in truth_idx]
+
+    client = chromadb.EphemeralClient()
+    results = []
+    print(f"\n{'M':>4} {'ef_c':>6} {'ef_s':>6} {'build_s':>8} {'recall':>7} {'p50_ms':>8} {'p99_ms':>8}")
+    for m in args.m:
+        for ef_construction in args.ef_construction:
+            for ef_search in args.ef_search:
+                collection, build_s = build_collection(client, ids, embeddings, space, m, ef_construction, ef_search)
+                run_queries(collection, queries[:10], args.k)  # warm-up
+                retrieved, latencies = run_queries(collection, queries, args.k)
+                row = {
+                    "max_neighbors": m,
+                    "ef_construction": ef_construction,
+                    "ef_search": ef_search,
+                    "build_seconds": build_s,
+                    f"recall@{args.k}": recall_at_k(retrieved, truth, args.k),
+                    **{f"{p}_ms": v for p, v in latency_percentiles(latencies, (50, 99)).items()},
+                }
+                results.append(row)
+                print(f"{m:>4} {ef_construction:>6} {ef_search:>6} {build_s:>8.2f} "
+                      f"{row[f'recall@{args.k}']:>7.3f} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+                client.delete_collection(collection.name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"corpus_size": len(ids), "dims": int(embeddings.shape[1]), "space": space,
+                       "k": args.k, "queries": len(queries), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
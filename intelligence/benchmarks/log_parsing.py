@@ -0,0 +1,184 @@
+"""
+Dispatcher log parsing benchmark on a generated log.
+
+Generates a synthetic dispatcher access log of the requested size (reused if
+it already exists) and reports lines/sec and peak RSS for the DataFrame
+loaders, the streaming parser and the parallel byte-range parser at several
+worker counts, for both the per-line and the vectorized parse engine.
+Each mode runs in a fresh process so peak memory is measured in isolation.
+
+Usage:
+    python benchmarks/log_parsing.py --size-gb 2 --workers 1,2,4,8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.analysis.log_aggregates import SketchAggregates
+from src.analysis.log_cache import METRIC_COLUMNS, aggregate_cached, build_cache, read_cached_frame
+from src.analysis.log_parsing import parse_log_line
+from src.analysis.log_sources import STREAM_CHUNK_BYTES, ENGINES, aggregate_stream, aggregate_parallel, read_frame
+
+SECTIONS = ["adventures", "magazine", "faqs", "about-us", "sports", "travel", "culture"]
+METHODS = ["GET"] * 18 + ["POST", "HEAD"]
+STATUSES = [200] * 80 + [304] * 10 + [404] * 6 + [500] * 2 + [302] * 2
+
+
+def generate_log(path, size_bytes, seed=7, distinct_paths=50000):
+    """
+    Writes a dispatcher log of roughly `size_bytes` with a skewed (Zipf-like)
+    path distribution, similar to real site traffic.
+    """
+    rng = random.Random(seed)
+    paths = [
+        f"/content/wknd/{rng.choice(['us', 'ca', 'de'])}/{rng.choice(['en', 'fr', 'de'])}/"
+        f"{rng.choice(SECTIONS)}/page-{i}.html"
+        for i in range(distinct_paths)
+    ]
+    weights = [1.0 / (rank + 1) for rank in range(distinct_paths)]
+    written = 0
+    with open(path, "w") as f:
+        while written < size_bytes:
+            batch = []
+            for i, path_choice in enumerate(rng.choices(paths, weights, k=10000)):
+                second = (written // 100 + i) % 86400
+                batch.append(
+                    f'10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)} - - '
+                    f'[10/Feb/2026:{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d} +0530] '
+                    f'"{rng.choice(METHODS)} {path_choice} HTTP/1.1" {rng.choice(STATUSES)} {rng.randint(200, 90000)}\n'
+                )
+            chunk = "".join(batch)
+            f.write(chunk)
+            written += len(chunk)
+
+
+def dataframe_python(logfile):
+    """
+    The original analyzer path: parse_log_line per line into a list of dicts.
+    """
+    data = []
+    with open(logfile, 'r') as f:
+        for line in f:
+            parsed = parse_log_line(line)
+            if parsed:
+                data.append(parsed)
+    return len(pd.DataFrame(data))
+
+
+def dataframe_vectorized(logfile):
+    return len(read_frame(logfile))
+
+
+def cache_build(logfile, cache_dir):
+    """
+    Parses the log into a fresh Parquet cache.
+    """
+    return pq.ParquetFile(build_cache(logfile, cache_dir)).metadata.num_rows
+
+
+def cache_frame(logfile, cache_dir, metrics):
+    """
+    A repeat analysis: loads only the columns `metrics` needs from the cache.
+    """
+    return len(read_cached_frame(logfile, METRIC_COLUMNS[metrics], cache_dir))
+
+
+def peak_rss_kb():
+    """
+    Peak RSS of this process. On Linux ru_maxrss survives exec, so a spawned
+    child would inherit the parent's peak; VmHWM is reset with the new image.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(func, args):
+    """
+    Runs one mode (inside a fresh process) and returns elapsed seconds,
+    parsed lines and peak RSS in MB, including any worker processes.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    lines = result if isinstance(result, int) else result.total
+    peak_kb = max(peak_rss_kb(), resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return elapsed, lines, peak_kb / 1024
+
+
+def timed(label, func, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        elapsed, lines, peak_mb = pool.submit(run_mode, func, args).result()
+    result = {"mode": label, "seconds": elapsed, "lines": lines,
+              "lines_per_sec": lines / elapsed if elapsed else 0.0, "peak_rss_mb": peak_mb}
+    print(f"{label:<28} {elapsed:>9.2f}s {result['lines_per_sec']:>14,.0f} lines/s {peak_mb:>10,.0f} MB")
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dispatcher log parsing benchmark")
+    parser.add_argument("--log", default="/tmp/dispatcher-bench.log", help="Generated log path (reused if present)")
+    parser.add_argument("--size-gb", type=float, default=2.0, help="Size of the generated log")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}", help="Comma-separated worker counts")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated parse engines")
+    parser.add_argument("--distinct-paths", type=int, default=50000, help="Distinct paths in the generated log")
+    parser.add_argument("--sketch-size", type=int, default=0, help="Also run stream mode with Space-Saving sketches of N counters")
+    parser.add_argument("--cache-dir", default="/tmp/dispatcher-bench-cache", help="Parquet cache directory for the cache modes")
+    parser.add_argument("--skip-cache", action="store_true", help="Skip the Parquet cache modes")
+    parser.add_argument("--skip-dataframe", action="store_true", help="Skip the in-memory DataFrame modes (large logs)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    size_bytes = int(args.size_gb * 1024 ** 3)
+    if not os.path.exists(args.log) or os.path.getsize(args.log) < size_bytes * 0.95:
+        print(f"Generating {args.size_gb} GB log at {args.log}...")
+        generate_log(args.log, size_bytes, distinct_paths=args.distinct_paths)
+    print(f"Log: {args.log} ({os.path.getsize(args.log) / 1024 ** 3:.2f} GB), {os.cpu_count()} CPUs\n")
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    results = []
+    if not args.skip_dataframe:
+        loaders = {"python": dataframe_python, "vectorized": dataframe_vectorized}
+        for engine in engines:
+            results.append(timed(f"dataframe {engine}", loaders[engine], args.log))
+    if not args.skip_cache:
+        results.append(timed("cache build", cache_build, args.log, args.cache_dir))
+        for metrics in METRIC_COLUMNS:
+            results.append(timed(f"cache dataframe {metrics}", cache_frame, args.log, args.cache_dir, metrics))
+        results.append(timed("cache stream", aggregate_cached, args.log, args.cache_dir))
+    for engine in engines:
+        results.append(timed(f"stream {engine}", aggregate_stream, args.log, STREAM_CHUNK_BYTES, engine))
+        if args.sketch_size:
+            results.append(timed(f"stream {engine} sketch", aggregate_stream, args.log, STREAM_CHUNK_BYTES, engine,
+                                 partial(SketchAggregates, args.sketch_size)))
+        for workers in sorted({int(w) for w in args.workers.split(",") if w.strip()}):
+            results.append(timed(f"parallel x{workers} {engine}", aggregate_parallel, args.log, workers,
+                                 STREAM_CHUNK_BYTES, engine))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"log_bytes": os.path.getsize(args.log), "cpus": os.cpu_count(), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Projection benchmark: recall@k lost vs. memory and latency gained by storing
+PCA-reduced embeddings.
+
+Reads the full embeddings of a collection that stores them, fits a PCA for
+each target dimension and reports, next to the full-dimension baseline:
+  - variance retained and exact recall@k (projected vs. full exact search),
+    i.e. the loss due to the projection alone
+  - HNSW recall@k against the full exact ground truth, the recall a
+    projected collection would actually serve
+  - vector bytes and on-disk index size per collection, query p50/p99
+
+Held-out stored vectors are used as queries, so the PCA is never fitted on
+the vectors it is evaluated with.
+
+Usage:
+    python benchmarks/projection_recall.py --dims 64,128,192 --k 10 --output projection.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from benchmarks.hnsw_recall import build_collection, load_embeddings, parse_int_list, run_queries
+from src.vector_store.collection import resolve_alias
+from src.vector_store.evaluation import exact_top_k, latency_percentiles, recall_at_k
+from src.vector_store.projection import PROJECTION_FIT_SAMPLE, Projection, load_projection
+
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PCA projection recall/memory/latency benchmark")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Collection with full-dimension embeddings")
+    parser.add_argument("--dims", type=parse_int_list, default=[64, 128, 192], help="Comma-separated target dimensions")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (recall@k)")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out stored vectors used as queries")
+    parser.add_argument("--fit-sample", type=int, default=PROJECTION_FIT_SAMPLE, help="Vectors the PCA is fitted on")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    return parser.parse_args()
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def evaluate(ids, corpus, queries, truth, space, k, workdir):
+    """
+    Builds a persistent collection of `corpus` and measures HNSW recall
+    against `truth`, query latency and the index size on disk.
+    """
+    path = tempfile.mkdtemp(dir=workdir)
+    client = chromadb.PersistentClient(path=path)
+    collection, build_s = build_collection(client, ids, corpus, space, None, None, None)
+    run_queries(collection, queries[:10], k)  # warm-up
+    retrieved, latencies = run_queries(collection, queries, k)
+    return {
+        "build_seconds": build_s,
+        f"hnsw_recall@{k}": recall_at_k(retrieved, truth, k),
+        "vector_bytes": int(corpus.shape[1] * 4),
+        "disk_bytes": directory_size(path),
+        **{f"{p}_ms": v for p, v in latency_percentiles(latencies, (50, 99)).items()},
+    }
+
+
+def main():
+    args = parse_args()
+    name = resolve_alias(args.collection)
+    if load_projection(name) is not None:
+        print(f"Collection '{name}' already stores projected vectors; evaluate a full-dimension collection.")
+        sys.exit(1)
+    source = chromadb.PersistentClient(path=CHROMA_DB_PATH).get_collection(name=name)
+    space = ((source.configuration or {}).get("hnsw") or {}).get("space", "l2")
+    ids, embeddings = load_embeddings(source)
+    if len(ids) <= args.queries:
+        print(f"Collection '{name}' has {len(ids)} vectors; need more than --queries ({args.queries}).")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(ids))
+    query_idx, fit_idx = order[:args.queries], order[args.queries:][:args.fit_sample]
+    queries = embeddings[query_idx]
+    truth_idx = exact_top_k(embeddings, queries, args.k, space)
+    truth = [[ids[i] for i in row] for row in truth_idx]
+    print(f"Corpus: {len(ids)} vectors x {embeddings.shape[1]} dims, space={space}, "
+          f"{len(queries)} held-out queries, PCA fitted on {len(fit_idx)}, k={args.k}")
+
+    workdir = tempfile.mkdtemp(prefix="projection-bench-")
+    results = []
+    try:
+        baseline = evaluate(ids, embeddings, queries, truth, space, args.k, workdir)
+        results.append({"dim": int(embeddings.shape[1]), "variance": 1.0, f"exact_recall@{args.k}": 1.0, **baseline})
+        for dim in args.dims:
+            start = time.perf_counter()
+            projection = Projection.fit(embeddings[fit_idx], dim, space)
+            fit_s = time.perf_counter() - start
+            projected, projected_queries = projection.apply(embeddings), projection.apply(queries)
+            exact = exact_top_k(projected, projected_queries, args.k, space)
+            row = {
+                "dim": dim,
+                "fit_seconds": fit_s,
+                "variance": projection.retained_variance,
+                f"exact_recall@{args.k}": recall_at_k([[ids[i] for i in r] for r in exact], truth, args.k),
+                **evaluate(ids, projected, projected_queries, truth, space, args.k, workdir),
+            }
+            results.append(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    recall = f"recall@{args.k}"
+    print(f"\n{'dim':>5} {'variance':>9} {'exact_' + recall:>16} {'hnsw_' + recall:>15} "
+          f"{'disk_MB':>8} {'memory':>7} {'p50_ms':>7} {'p99_ms':>7}")
+    for row in results:
+        print(f"{row['dim']:>5} {row['variance']:>9.3f} {row['exact_' + recall]:>16.3f} {row['hnsw_' + recall]:>15.3f} "
+              f"{row['disk_bytes'] / 1e6:>8.1f} {row['vector_bytes'] / baseline['vector_bytes']:>6.0%} "
+              f"{row['p50_ms']:>7.2f} {row['p99_ms']:>7.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"corpus_size": len(ids), "space": space, "k": args.k, "queries": len(queries),
+                       "fit_sample": int(len(fit_idx)), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import pandas as pd
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from src.analysis.sketches import SKETCH_CAPACITY, SpaceSaving
+
+
+class LogAggregates:
+    """
+    Incrementally maintained counters behind the --metrics report.
+    Memory grows with the number of distinct paths, not with the number of
+    lines, and aggregates from separate chunks or shards can be merged.
+    """
+
+    approximate = False
+
+    def __init__(self):
+        self.total = 0
+        self.errors = 0
+        self.not_found = Counter()
+        self.server_errors = Counter()
+        self.paths = Counter()
+        self.methods = Counter()
+
+    def add(self, parsed: Dict[str, Any]):
+        """
+        Adds one parsed log line (as returned by parse_log_line).
+        """
+        self.add_request(parsed["path"], parsed["method"], parsed["status"])
+
+    def add_request(self, path: str, method: str, status: int, count: int = 1):
+        self.total += count
+        self.paths[path] += count
+        self.methods[method] += count
+        if status >= 400:
+            self.errors += count
+            if status == 404:
+                self.not_found[path] += count
+            elif status == 500:
+                self.server_errors[path] += count
+
+    def merge(self, other: "LogAggregates") -> "LogAggregates":
+        """
+        Folds another aggregate (e.g. from a different shard) into this one.
+        """
+        self.total += other.total
+        self.errors += other.errors
+        self.not_found.update(other.not_found)
+        self.server_errors.update(other.server_errors)
+        self.paths.update(other.paths)
+        self.methods.update(other.methods)
+        return self
+
+
+class SketchAggregates(LogAggregates):
+    """
+    LogAggregates whose path counters are fixed-size Space-Saving sketches,
+    for logs with too many distinct paths to count exactly. Methods are
+    still counted exactly. Totals are exact; path counts are estimates.
+    """
+
+    approximate = True
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        super().__init__()
+        self.capacity = capacity
+        self.not_found = SpaceSaving(capacity)
+        self.server_errors = SpaceSaving(capacity)
+        self.paths = SpaceSaving(capacity)
+
+    def add_request(self, path: str, method: str, status: int, count: int = 1):
+        self.total += count
+        self.paths.add(path, count)
+        self.methods[method] += count
+        if status >= 400:
+            self.errors += count
+            if status == 404:
+                self.not_found.add(path, count)
+            elif status == 500:
+                self.server_errors.add(path, count)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "errors": self.errors,
+            "methods": dict(self.methods),
+            "paths": self.paths.to_dict(),
+            "not_found": self.not_found.to_dict(),
+            "server_errors": self.server_errors.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SketchAggregates":
+        aggregates = cls(data["capacity"])
+        aggregates.total = data["total"]
+        aggregates.errors = data["errors"]
+        aggregates.methods = Counter(data["methods"])
+        for name in ["paths", "not_found", "server_errors"]:
+            setattr(aggregates, name, SpaceSaving.from_dict(data[name]))
+        return aggregates
+
+    def save(self, sketch_file: str):
+        """
+        Writes the sketches as JSON so separate runs can be merged later.
+        """
+        with open(sketch_file, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, sketch_file: str) -> "SketchAggregates":
+        with open(sketch_file, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def top_counts(counter, n: Optional[int], index_name: str) -> pd.Series:
+    """
+    Returns the n most common entries as a Series formatted like
+    `value_counts().head(n)`, so both analysis modes print identically.
+    """
+    series = pd.Series(dict(counter.most_common(n)), name="count", dtype="int64")
+    series.index.name = index_name
+    return series
+
+
+def print_accuracy(aggregates: LogAggregates, sketch: SpaceSaving):
+    """
+    Prints the error bounds of an approximate top list.
+    """
+    if aggregates.approximate:
+        print(f"(approximate: {len(sketch)}/{sketch.capacity} counters over {sketch.total} requests, "
+              f"counts overestimate by at most {sketch.error_bound()}; "
+              f"worst case {sketch.total // sketch.capacity})")
+
+
+def print_report(aggregates: LogAggregates, metrics: str):
+    """
+    Prints the error and/or traffic analysis for the given aggregates.
+    """
+    # 1. Error Hotspots (404s, 500s)
+    if metrics in ["errors", "all"]:
+        print("\n--- Error Analysis ---")
+        if aggregates.errors:
+            print(f"Total Errors: {aggregates.errors}")
+            print("\nTop 404 Paths (Not Found):")
+            print(top_counts(aggregates.not_found, 5, "path"))
+            print_accuracy(aggregates, aggregates.not_found)
+
+            print("\nTop 500 Paths (Server Error):")
+            print(top_counts(aggregates.server_errors, 5, "path"))
+            print_accuracy(aggregates, aggregates.server_errors)
+        else:
+            print("No errors found 🎉")
+
+    # 2. High Traffic Paths
+    if metrics in ["traffic", "all"]:
+        print("\n--- Traffic Analysis ---")
+        print("\nTop 10 Most Requested Paths:")
+        print(top_counts(aggregates.paths, 10, "path"))
+        print_accuracy(aggregates, aggregates.paths)
+
+        print("\nTraffic by Method:")
+        print(top_counts(aggregates.methods, None, "method"))
@@ -1,57 +1,123 @@
 import pandas as pd
-import re
 import argparse
+import os
 import sys
-from collections import Counter
+from functools import partial
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.analysis.log_parsing import parse_log_line
+from src.analysis.log_aggregates import LogAggregates, SketchAggregates, print_report
+from src.analysis.sketches import SKETCH_CAPACITY
+from src.analysis.log_cache import LOG_CACHE_DIR, METRIC_COLUMNS, aggregate_cached, cache_available, read_cached_frame
+from src.analysis.log_follow import FOLLOW_INTERVAL_SECONDS, FOLLOW_WINDOW_MINUTES, follow
+from src.analysis.log_sources import (
+    STREAM_CHUNK_BYTES, ENGINES, aggregate_stream, aggregate_parallel, expand_log_paths, iter_source_blocks, read_frame
+)
 
 def parse_args():
     parser = argparse.ArgumentParser(description="AEM Dispatcher Log Analyzer")
-    parser.add_argument("logfile", help="Path to dispatcher.log file")
+    parser.add_argument("logfile", nargs="+", help="Dispatcher log files, globs or directories (plain or .gz rotations)")
     parser.add_argument("--metrics", choices=["errors", "traffic", "all"], default="all", help="Metrics to analyze")
-    return parser.parse_args()
-
-def parse_log_line(line):
-    """
-    Parses a standard Apache/Dispatcher log line.
-    Example: 127.0.0.1 - - [10/Feb/2026:14:00:00 +0530] "GET /content/wknd/us/en.html HTTP/1.1" 200 1234
-    """
-    # Regex for Common Log Format (CLF) / Combined Log Format
-    # This is a simplified regex, might need adjustment based on actual dispatcher log format
-    regex = r'^(\S+) \S+ \S+ \[([\w:/]+\s[+\-]\d{4})\] "(\S+) (\S+)\s*(\S+)?" (\d{3}) (\S+)'
-    match = re.match(regex, line)
-    if match:
-        return {
-            "ip": match.group(1),
-            "timestamp": match.group(2),
-            "method": match.group(3),
-            "path": match.group(4),
-            "protocol": match.group(5),
-            "status": int(match.group(6)),
-            "size": match.group(7)
-        }
-    return None
+    parser.add_argument("--stream", action="store_true", help="Aggregate incrementally in constant memory instead of building a DataFrame")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_BYTES, help="Bytes read per chunk in streaming mode")
+    parser.add_argument("--workers", type=int, default=0, help="Parse byte-range shards in N processes (implies --stream)")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="Per-line regex parser or block-wise Arrow/pandas string kernels")
+    parser.add_argument("--cache", action="store_true", help="Parse each log once into a Parquet cache and analyze from it")
+    parser.add_argument("--cache-dir", default=LOG_CACHE_DIR, help="Directory of the parsed-log cache")
+    parser.add_argument("--sketch-size", type=int, default=0, metavar="COUNTERS",
+                        help="Approximate top paths with fixed-size Space-Saving sketches of N counters (implies --stream; with --follow, per minute bucket)")
+    parser.add_argument("--save-sketch", help="Write this run's sketches to a JSON file (with --sketch-size)")
+    parser.add_argument("--merge-sketch", action="append", default=[], help="Merge sketches saved by earlier runs or shards")
+    parser.add_argument("--follow", action="store_true", help="Tail a single log and report rolling per-minute rates and hotspots")
+    parser.add_argument("--checkpoint", help="Follow-mode offset checkpoint (default: <logfile name>.checkpoint.json in the working directory)")
+    parser.add_argument("--from-start", action="store_true", help="Follow from the beginning of the log when there is no checkpoint")
+    parser.add_argument("--interval", type=float, default=FOLLOW_INTERVAL_SECONDS, help="Seconds between polls in follow mode")
+    parser.add_argument("--window", type=int, default=FOLLOW_WINDOW_MINUTES, help="Minutes of log time in the follow-mode window")
+    args = parser.parse_args()
+    if args.save_sketch and not (args.sketch_size or args.merge_sketch):
+        parser.error("--save-sketch needs --sketch-size (or --merge-sketch) to build sketches")
+    return args
 
 def main():
     args = parse_args()
     
-    print(f"Analyzing {args.logfile}...")
+    if args.follow:
+        if len(args.logfile) != 1 or args.logfile[0].endswith(".gz"):
+            print("Error: --follow takes a single plain log file.")
+            sys.exit(1)
+        logfile = args.logfile[0]
+        checkpoint = args.checkpoint or f"{os.path.basename(logfile)}.checkpoint.json"
+        print(f"Following {logfile} (checkpoint {checkpoint}, Ctrl+C to stop)...")
+        follow(logfile, checkpoint, args.metrics, args.interval, args.window, args.from_start,
+               capacity=args.sketch_size or SKETCH_CAPACITY)
+        return
+
+    if args.cache and not cache_available():
+        print("Error: --cache requires pyarrow.")
+        sys.exit(1)
+    if args.cache and args.workers > 1:
+        print("Error: --cache reads the parsed cache in one process; drop --workers.")
+        sys.exit(1)
+
+    print(f"Analyzing {', '.join(args.logfile)}...")
+
+    try:
+        logfiles = expand_log_paths(args.logfile)
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found.")
+        sys.exit(1)
+
+    if args.stream or args.workers > 1 or args.sketch_size or args.merge_sketch:
+        try:
+            previous = [SketchAggregates.load(sketch_file) for sketch_file in args.merge_sketch]
+            make_aggregates = LogAggregates
+            if args.sketch_size or previous:
+                capacity = args.sketch_size or (previous[0].capacity if previous else SKETCH_CAPACITY)
+                make_aggregates = partial(SketchAggregates, capacity)
+            if args.cache:
+                aggregates = aggregate_cached(logfiles, args.cache_dir, args.chunk_size, make_aggregates, args.metrics)
+            elif args.workers > 1:
+                aggregates = aggregate_parallel(logfiles, args.workers, args.chunk_size, args.engine, make_aggregates)
+            else:
+                aggregates = aggregate_stream(logfiles, args.chunk_size, args.engine, make_aggregates)
+            for sketch in previous:
+                aggregates.merge(sketch)
+        except FileNotFoundError as e:
+            print(f"Error: File {e.filename} not found.")
+            sys.exit(1)
+
+        if args.save_sketch and aggregates.approximate:
+            aggregates.save(args.save_sketch)
+
+        if not aggregates.total:
+            print("No valid log lines found or parsed.")
+            return
+
+        print_report(aggregates, args.metrics)
+        return
     
     data = []
     try:
-        with open(args.logfile, 'r') as f:
-            for line in f:
-                parsed = parse_log_line(line)
-                if parsed:
-                    data.append(parsed)
-    except FileNotFoundError:
-        print(f"Error: File {args.logfile} not found.")
+        if args.cache:
+            df = read_cached_frame(logfiles, METRIC_COLUMNS[args.metrics], args.cache_dir, args.chunk_size)
+        elif args.engine == "vectorized":
+            df = read_frame(logfiles, args.chunk_size)
+        else:
+            # Plain files are memory-mapped and gzip members streamed, as in the other modes
+            for logfile in logfiles:
+                for block in iter_source_blocks(logfile, chunk_bytes=args.chunk_size):
+                    for line in block.splitlines():
+                        parsed = parse_log_line(line)
+                        if parsed:
+                            data.append(parsed)
+            df = pd.DataFrame(data)
+    except FileNotFoundError as e:
+        print(f"Error: File {e.filename} not found.")
         sys.exit(1)
 
-    if not data:
+    if df.empty:
         print("No valid log lines found or parsed.")
         return
-
-    df = pd.DataFrame(data)
     
     # 1. Error Hotspots (404s, 500s)
     if args.metrics in ["errors", "all"]:
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pandas as pd
+from typing import Iterator, List, Optional
+
+from src.analysis.log_aggregates import LogAggregates
+from src.analysis.log_sources import STREAM_CHUNK_BYTES, LogPaths, as_log_paths, iter_source_blocks
+from src.analysis.log_vectorized import FIELD_NAMES, aggregate_table, parse_table, pa
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # the cache needs pyarrow
+    pq = None
+
+# Where parsed logs are cached as Parquet
+LOG_CACHE_DIR = os.getenv("LOG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "aem-intelligence", "logs"))
+
+LOG_CACHE_COMPRESSION = "zstd"
+
+# Columns each report reads from the cache
+METRIC_COLUMNS = {
+    "errors": ["path", "status"],
+    "traffic": ["path", "method"],
+    "all": ["path", "method", "status"],
+}
+
+
+def cache_available() -> bool:
+    return pq is not None
+
+
+def cache_path(logfile: str, cache_dir: str = LOG_CACHE_DIR) -> str:
+    """
+    Cache file for the current version of a log, keyed by its real path,
+    size and mtime, so a rotated or appended file is parsed again.
+    """
+    stat = os.stat(logfile)
+    source = hashlib.sha1(os.path.realpath(logfile).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{source}-{stat.st_size}-{stat.st_mtime_ns}.parquet")
+
+
+def build_cache(logfile: str, cache_dir: str = LOG_CACHE_DIR, chunk_bytes=STREAM_CHUNK_BYTES) -> str:
+    """
+    Parses a log once into a compressed Parquet file, one row group per
+    block, and removes cache files of older versions of the same log.
+    Returns the cache file path.
+    """
+    target = cache_path(logfile, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = f"{target}.tmp"
+    writer = None
+    try:
+        for block in iter_source_blocks(logfile, chunk_bytes=chunk_bytes):
+            table = parse_table(block)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_file, table.schema, compression=LOG_CACHE_COMPRESSION)
+            writer.write_table(table)
+        if writer is None:
+            table = parse_table("")
+            writer = pq.ParquetWriter(tmp_file, table.schema, compression=LOG_CACHE_COMPRESSION)
+            writer.write_table(table)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    writer.close()
+    os.replace(tmp_file, target)
+
+    prefix = os.path.basename(target).split("-", 1)[0] + "-"
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith(".parquet") and name != os.path.basename(target):
+            os.remove(os.path.join(cache_dir, name))
+    return target
+
+
+def ensure_cache(logfile: str, cache_dir: str = LOG_CACHE_DIR, chunk_bytes=STREAM_CHUNK_BYTES) -> str:
+    """
+    Returns the cache file for a log, parsing the log only on a miss.
+    """
+    target = cache_path(logfile, cache_dir)
+    if os.path.exists(target):
+        return target
+    return build_cache(logfile, cache_dir, chunk_bytes)
+
+
+def read_cached_frame(logfiles: LogPaths, columns: Optional[List[str]] = None, cache_dir: str = LOG_CACHE_DIR,
+                      chunk_bytes=STREAM_CHUNK_BYTES) -> pd.DataFrame:
+    """
+    Loads the given columns of the logs (all fields by default) as one typed
+    DataFrame, from the cache where possible.
+    """
+    columns = columns or FIELD_NAMES
+    tables = [pq.read_table(ensure_cache(path, cache_dir, chunk_bytes), columns=columns) for path in as_log_paths(logfiles)]
+    table = pa.concat_tables(tables) if tables else parse_table("").select(columns)
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def iter_cached_batches(logfile: str, columns: List[str], cache_dir: str = LOG_CACHE_DIR,
+                        chunk_bytes=STREAM_CHUNK_BYTES) -> Iterator["pa.Table"]:
+    """
+    Yields the cached log one row group at a time.
+    """
+    parquet = pq.ParquetFile(ensure_cache(logfile, cache_dir, chunk_bytes))
+    for group in range(parquet.num_row_groups):
+        yield parquet.read_row_group(group, columns=columns)
+
+
+def aggregate_cached(logfiles: LogPaths, cache_dir: str = LOG_CACHE_DIR, chunk_bytes=STREAM_CHUNK_BYTES,
+                     make_aggregates=LogAggregates, metrics: str = "all") -> LogAggregates:
+    """
+    Streams cached row groups into aggregates, in constant memory, reading
+    only the columns the `metrics` report needs.
+    """
+    aggregates = make_aggregates()
+    for path in as_log_paths(logfiles):
+        for table in iter_cached_batches(path, METRIC_COLUMNS[metrics], cache_dir, chunk_bytes):
+            aggregate_table(table, aggregates)
+    return aggregates
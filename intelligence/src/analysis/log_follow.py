@@ -0,0 +1,268 @@
+import json
+import os
+import time
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src.analysis.log_aggregates import SketchAggregates, top_counts
+from src.analysis.log_parsing import LOG_PATTERN, minute_of
+from src.analysis.sketches import SKETCH_CAPACITY
+
+# Minutes of log time kept in the rolling window
+FOLLOW_WINDOW_MINUTES = 15
+
+# Seconds between polls of the followed log
+FOLLOW_INTERVAL_SECONDS = 10
+
+# Bytes read per call while draining newly appended data
+FOLLOW_READ_BYTES = 4 * 1024 * 1024
+
+
+def read_checkpoint(checkpoint_file: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads a follow checkpoint ({"inode", "offset"}), or None if there is none.
+    """
+    try:
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_checkpoint(checkpoint_file: str, inode: int, offset: int):
+    """
+    Atomically replaces the follow checkpoint.
+    """
+    os.makedirs(os.path.dirname(checkpoint_file) or ".", exist_ok=True)
+    tmp_file = f"{checkpoint_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"inode": inode, "offset": offset}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, checkpoint_file)
+
+
+class MinuteBuckets:
+    """
+    Rolling per-minute aggregates over the last `window_minutes` of log time.
+    Holds at most `window_minutes` buckets, each counting paths in Space-Saving
+    sketches of `capacity` counters, so memory stays bounded no matter how
+    long the log is followed or how many distinct paths it has. Request and
+    error totals are exact; path counts are exact until a minute sees more
+    than `capacity` distinct paths.
+    """
+
+    def __init__(self, window_minutes: int = FOLLOW_WINDOW_MINUTES, capacity: int = SKETCH_CAPACITY):
+        self.window_minutes = window_minutes
+        self.capacity = capacity
+        self.buckets: Dict[int, SketchAggregates] = {}
+        self.latest: Optional[int] = None
+
+    def add_request(self, minute: int, path: str, method: str, status: int):
+        """
+        Counts one request in its minute bucket. Requests older than the
+        window (late lines after a long pause) are dropped.
+        """
+        if self.latest is not None and minute <= self.latest - self.window_minutes:
+            return
+        bucket = self.buckets.get(minute)
+        if bucket is None:
+            bucket = self.buckets[minute] = SketchAggregates(self.capacity)
+        bucket.add_request(path, method, status)
+        if self.latest is None or minute > self.latest:
+            self.latest = minute
+            for old in [m for m in self.buckets if m <= minute - self.window_minutes]:
+                del self.buckets[old]
+
+    def add_lines(self, lines: List[str]) -> int:
+        """
+        Parses raw log lines into the buckets. Returns the number counted.
+        """
+        match = LOG_PATTERN.match
+        counted = 0
+        for line in lines:
+            m = match(line)
+            if not m:
+                continue
+            minute = minute_of(m.group(2))
+            if minute is not None:
+                self.add_request(minute, m.group(4), m.group(3), int(m.group(6)))
+                counted += 1
+        return counted
+
+    def totals(self) -> SketchAggregates:
+        """
+        Aggregates across the whole window.
+        """
+        totals = SketchAggregates(self.capacity)
+        for minute in sorted(self.buckets):
+            totals.merge(self.buckets[minute])
+        return totals
+
+    def per_minute(self) -> pd.DataFrame:
+        """
+        Requests, errors, 404s and 500s per minute (UTC), oldest first.
+        """
+        rows = [
+            {
+                "minute": datetime.fromtimestamp(minute * 60, tz=timezone.utc).strftime("%Y-%m-%d %H:%M"),
+                "requests": bucket.total,
+                "errors": bucket.errors,
+                "404": bucket.not_found.total,
+                "500": bucket.server_errors.total,
+            }
+            for minute, bucket in sorted(self.buckets.items())
+        ]
+        return pd.DataFrame(rows, columns=["minute", "requests", "errors", "404", "500"]).set_index("minute")
+
+
+class LogFollower:
+    """
+    Tails a plain log file, returning complete lines appended since the last
+    poll. The inode and the offset of the last complete line are checkpointed
+    so a restart resumes where it stopped instead of rescanning. Rotation
+    (new inode at the path) is handled by draining the old file first;
+    truncation in place restarts from the beginning.
+    """
+
+    def __init__(self, logfile: str, checkpoint_file: Optional[str] = None, from_start: bool = False):
+        self.logfile = logfile
+        self.checkpoint_file = checkpoint_file
+        self.from_start = from_start
+        self.handle = None
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self.carry = b""
+        # Rotated away but the new file could not be opened yet
+        self.rotating = False
+
+    def _open(self) -> bool:
+        try:
+            self.handle = open(self.logfile, "rb")
+        except FileNotFoundError:
+            return False
+        stat = os.fstat(self.handle.fileno())
+        checkpoint = read_checkpoint(self.checkpoint_file) if self.checkpoint_file else None
+        if checkpoint and checkpoint.get("inode") == stat.st_ino and checkpoint.get("offset", 0) <= stat.st_size:
+            self.offset = checkpoint["offset"]
+        elif checkpoint is None and not self.from_start:
+            self.offset = stat.st_size  # like tail -f: only new lines
+        else:  # rotated while stopped, or --from-start
+            self.offset = 0
+        self.inode = stat.st_ino
+        self.carry = b""
+        self.handle.seek(self.offset)
+        return True
+
+    def _drain(self) -> List[str]:
+        lines = []
+        while True:
+            data = self.handle.read(FOLLOW_READ_BYTES)
+            if not data:
+                return lines
+            data = self.carry + data
+            cut = data.rfind(b"\n") + 1
+            self.carry = data[cut:]
+            self.offset += cut
+            lines.extend(data[:cut].decode("utf-8", errors="replace").splitlines())
+
+    def poll(self) -> List[str]:
+        """
+        Returns the complete lines appended since the previous poll and
+        checkpoints the new position.
+        """
+        if self.handle is None and not (self._reopen_rotated() if self.rotating else self._open()):
+            return []
+        lines = self._drain()
+
+        try:
+            stat = os.stat(self.logfile)
+        except FileNotFoundError:
+            stat = None  # rotated away, new file not created yet
+        if stat is not None and stat.st_ino != self.inode:
+            # The old file is complete: its unterminated tail is a final line
+            if self.carry:
+                lines.append(self.carry.decode("utf-8", errors="replace"))
+            self.handle.close()
+            self.inode = None
+            if self._reopen_rotated():
+                lines.extend(self._drain())
+        elif stat is not None and stat.st_size < self.offset + len(self.carry):
+            self.offset = 0
+            self.carry = b""
+            self.handle.seek(0)
+            lines.extend(self._drain())
+
+        if self.checkpoint_file and self.inode is not None:
+            write_checkpoint(self.checkpoint_file, self.inode, self.offset)
+        return lines
+
+    def _reopen_rotated(self) -> bool:
+        try:
+            self.handle = open(self.logfile, "rb")
+        except FileNotFoundError:
+            # Renamed or removed again since the stat: retried on the next poll
+            self.handle = None
+            self.rotating = True
+            return False
+        self.rotating = False
+        self.inode = os.fstat(self.handle.fileno()).st_ino
+        self.offset = 0
+        self.carry = b""
+        return True
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def print_window_report(buckets: MinuteBuckets, metrics: str = "all"):
+    """
+    Prints per-minute rates and the window's error and traffic hotspots.
+    """
+    minutes = len(buckets.buckets)
+    totals = buckets.totals()
+    print(f"\n--- Live Window (last {buckets.window_minutes} min of log time, UTC) ---")
+    if not totals.total:
+        print("No requests in window.")
+        return
+    print(buckets.per_minute())
+    print(f"\nRequests/min: {totals.total / minutes:.1f}  Errors/min: {totals.errors / minutes:.1f}  "
+          f"Error rate: {100 * totals.errors / totals.total:.1f}%")
+
+    if metrics in ["errors", "all"]:
+        print("\nTop 404 Paths (Not Found):")
+        print(top_counts(totals.not_found, 5, "path"))
+        print("\nTop 500 Paths (Server Error):")
+        print(top_counts(totals.server_errors, 5, "path"))
+
+    if metrics in ["traffic", "all"]:
+        print("\nTop 10 Most Requested Paths:")
+        print(top_counts(totals.paths, 10, "path"))
+
+
+def follow(logfile: str, checkpoint_file: str, metrics: str = "all", interval: float = FOLLOW_INTERVAL_SECONDS,
+           window_minutes: int = FOLLOW_WINDOW_MINUTES, from_start: bool = False, iterations: Optional[int] = None,
+           capacity: int = SKETCH_CAPACITY):
+    """
+    Polls the log every `interval` seconds and prints the rolling window
+    report whenever new lines arrive. Runs until interrupted, or for
+    `iterations` polls. `capacity` is the sketch size per minute bucket.
+    """
+    follower = LogFollower(logfile, checkpoint_file, from_start)
+    buckets = MinuteBuckets(window_minutes, capacity)
+    polls = 0
+    try:
+        while iterations is None or polls < iterations:
+            if buckets.add_lines(follower.poll()):
+                print_window_report(buckets, metrics)
+            polls += 1
+            if iterations is None or polls < iterations:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+    return buckets
@@ -0,0 +1,72 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+# Regex for Common Log Format (CLF) / Combined Log Format
+# This is a simplified regex, might need adjustment based on actual dispatcher log format
+LOG_REGEX = r'^(\S+) \S+ \S+ \[([\w:/]+\s[+\-]\d{4})\] "(\S+) (\S+)\s*(\S+)?" (\d{3}) (\S+)'
+
+# Compiled once per process; re.match() with a pattern string pays a cache
+# lookup on every line
+LOG_PATTERN = re.compile(LOG_REGEX)
+
+# Timestamp field format, e.g. 10/Feb/2026:14:00:00 +0530
+TIMESTAMP_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+def parse_timestamp(timestamp):
+    """
+    Parses a log timestamp into a timezone-aware datetime.
+    Returns None if it does not match TIMESTAMP_FORMAT.
+    """
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=4096)
+def _epoch_minute(minute_and_zone: str) -> Optional[int]:
+    try:
+        return int(datetime.strptime(minute_and_zone, "%d/%b/%Y:%H:%M %z").timestamp()) // 60
+    except ValueError:
+        return None
+
+def minute_of(timestamp):
+    """
+    Returns the UTC epoch minute of a log timestamp, or None if it does not
+    parse. strptime runs once per distinct minute rather than once per line.
+    """
+    return _epoch_minute(timestamp[:17] + timestamp[-6:])
+
+def parse_log_line(line):
+    """
+    Parses a standard Apache/Dispatcher log line.
+    Example: 127.0.0.1 - - [10/Feb/2026:14:00:00 +0530] "GET /content/wknd/us/en.html HTTP/1.1" 200 1234
+    """
+    match = LOG_PATTERN.match(line)
+    if match:
+        return {
+            "ip": match.group(1),
+            "timestamp": match.group(2),
+            "method": match.group(3),
+            "path": match.group(4),
+            "protocol": match.group(5),
+            "status": int(match.group(6)),
+            "size": match.group(7)
+        }
+    return None
+
+def aggregate_lines(lines, aggregates):
+    """
+    Feeds raw log lines into aggregates without building a dict per line.
+    Returns the number of lines that parsed.
+    """
+    match = LOG_PATTERN.match
+    add_request = aggregates.add_request
+    parsed = 0
+    for line in lines:
+        m = match(line)
+        if m:
+            add_request(m.group(4), m.group(3), int(m.group(6)))
+            parsed += 1
+    return parsed
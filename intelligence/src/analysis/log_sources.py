@@ -0,0 +1,242 @@
+import errno
+import glob
+import gzip
+import math
+import mmap
+import os
+import re
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.analysis.log_aggregates import LogAggregates
+from src.analysis.log_parsing import aggregate_lines
+from src.analysis.log_vectorized import aggregate_text, parse_text
+
+# Bytes of log text read per chunk in streaming mode
+STREAM_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Shards per worker; more, smaller shards even out skew between processes
+SHARDS_PER_WORKER = 4
+
+# Parse engines: "python" runs the compiled regex per line, "vectorized"
+# parses whole blocks with Arrow/pandas string kernels
+ENGINES = ["python", "vectorized"]
+
+COMPRESSED_SUFFIX = ".gz"
+
+# dispatcher.log, dispatcher.log.1, dispatcher.log.2.gz, ...
+ROTATED_NAME = re.compile(r"^(.*?)(?:\.(\d+))?(?:\.gz)?$")
+
+LogPaths = Union[str, Iterable[str]]
+
+MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+
+def is_compressed(path: str) -> bool:
+    return path.endswith(COMPRESSED_SUFFIX)
+
+
+def rotation_key(path: str):
+    """
+    Sort key placing a rotation set oldest first: dispatcher.log.2.gz,
+    dispatcher.log.1.gz, dispatcher.log.
+    """
+    base, number = ROTATED_NAME.match(os.path.basename(path)).groups()
+    return os.path.dirname(path), base, -int(number or 0)
+
+
+def expand_log_paths(patterns: Iterable[str]) -> List[str]:
+    """
+    Expands files, globs and directories into log files ordered by rotation.
+    Raises FileNotFoundError when a glob or directory yields no files.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        elif any(char in pattern for char in "*?["):
+            matches = glob.glob(pattern)
+        else:
+            paths.append(pattern)
+            continue
+        matches = sorted((m for m in matches if os.path.isfile(m)), key=rotation_key)
+        if not matches:
+            raise FileNotFoundError(errno.ENOENT, "No log files found", pattern)
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+
+def as_log_paths(logfiles: LogPaths) -> List[str]:
+    return [logfiles] if isinstance(logfiles, str) else list(logfiles)
+
+
+def aggregate_stream(logfiles: LogPaths, chunk_bytes=STREAM_CHUNK_BYTES, engine="python", make_aggregates=LogAggregates):
+    """
+    Reads the logs block by block (memory-mapped for plain files, streamed
+    through gzip for compressed ones) into one set of counters, never
+    holding more than one block in memory.
+    """
+    aggregates = make_aggregates()
+    for path in as_log_paths(logfiles):
+        aggregates.merge(aggregate_range(path, 0, None, chunk_bytes, engine, make_aggregates))
+    return aggregates
+
+
+def shard_ranges(logfile, shards: int) -> List[Tuple[int, int]]:
+    """
+    Splits a file into up to `shards` byte ranges whose boundaries fall on
+    line starts, so every line belongs to exactly one range.
+    """
+    size = os.path.getsize(logfile)
+    if size == 0:
+        return []
+    boundaries = [0]
+    with open(logfile, 'rb') as f:
+        for i in range(1, shards):
+            target = size * i // shards
+            if target <= boundaries[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # finish the line containing target - 1
+            position = f.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def iter_range_blocks(logfile, start: int, end: Optional[int], chunk_bytes=STREAM_CHUNK_BYTES) -> Iterator[str]:
+    """
+    Yields decoded text blocks of the byte range [start, end) of a plain
+    file, each ending on a line boundary. The file is memory-mapped, so
+    blocks are decoded straight from the page cache without buffered reads.
+    """
+    size = os.path.getsize(logfile)
+    end = size if end is None else min(end, size)
+    if start >= end:
+        return
+    with open(logfile, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = start
+        released = start - start % mmap.PAGESIZE
+        while position < end:
+            stop = min(position + chunk_bytes, end)
+            if stop < end:
+                cut = mm.rfind(b"\n", position, stop) + 1
+                if cut > position:
+                    stop = cut
+                else:  # a line longer than the block: extend to its end
+                    stop = min(mm.find(b"\n", stop, end) + 1 or end, end)
+            yield mm[position:stop].decode("utf-8", errors="replace")
+            position = stop
+            # Drop consumed pages from this process' RSS (they stay in the page cache)
+            upto = stop - stop % mmap.PAGESIZE
+            if MADV_DONTNEED is not None and upto > released:
+                mm.madvise(MADV_DONTNEED, released, upto - released)
+                released = upto
+
+
+def iter_gzip_blocks(logfile, chunk_bytes=STREAM_CHUNK_BYTES) -> Iterator[str]:
+    """
+    Yields decoded text blocks of a gzip-compressed log, each ending on a
+    line boundary.
+    """
+    with gzip.open(logfile, 'rb') as f:
+        carry = b""
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                carry = block
+                continue
+            carry = block[cut:]
+            yield block[:cut].decode("utf-8", errors="replace")
+        if carry:
+            yield carry.decode("utf-8", errors="replace")
+
+
+def iter_source_blocks(logfile, start: int = 0, end: Optional[int] = None, chunk_bytes=STREAM_CHUNK_BYTES) -> Iterator[str]:
+    """
+    Yields text blocks of a log; compressed logs are always read whole.
+    """
+    if is_compressed(logfile):
+        return iter_gzip_blocks(logfile, chunk_bytes)
+    return iter_range_blocks(logfile, start, end, chunk_bytes)
+
+
+def iter_range_lines(logfile, start: int, end: int, chunk_bytes=STREAM_CHUNK_BYTES) -> Iterator[List[str]]:
+    """
+    Yields decoded lines of the byte range [start, end) in chunks.
+    """
+    for block in iter_range_blocks(logfile, start, end, chunk_bytes):
+        yield block.splitlines()
+
+
+def aggregate_range(logfile, start: int, end: Optional[int], chunk_bytes=STREAM_CHUNK_BYTES, engine="python",
+                    make_aggregates=LogAggregates) -> LogAggregates:
+    """
+    Worker entry point: aggregates one byte range of a plain log, or a whole
+    compressed log. `make_aggregates` must be picklable (a class or partial).
+    """
+    aggregates = make_aggregates()
+    for block in iter_source_blocks(logfile, start, end, chunk_bytes):
+        if engine == "vectorized":
+            aggregate_text(block, aggregates)
+        else:
+            aggregate_lines(block.splitlines(), aggregates)
+    return aggregates
+
+
+def read_frame(logfiles: LogPaths, chunk_bytes=STREAM_CHUNK_BYTES) -> pd.DataFrame:
+    """
+    Loads the logs as one typed DataFrame with the vectorized engine,
+    parsing them block by block.
+    """
+    frames = [
+        parse_text(block)
+        for path in as_log_paths(logfiles)
+        for block in iter_source_blocks(path, chunk_bytes=chunk_bytes)
+    ]
+    if not frames:
+        return parse_text("")
+    return pd.concat(frames, ignore_index=True)
+
+
+def source_tasks(logfiles: LogPaths, shards: int) -> List[Tuple[str, int, Optional[int]]]:
+    """
+    Splits a set of logs into work units: plain files become newline-aligned
+    byte ranges (about `shards` in total, in proportion to size) and each
+    compressed file is one unit, since a gzip stream cannot be entered midway.
+    """
+    paths = as_log_paths(logfiles)
+    plain_bytes = sum(os.path.getsize(p) for p in paths if not is_compressed(p))
+    tasks = []
+    for path in paths:
+        if is_compressed(path):
+            tasks.append((path, 0, None))
+            continue
+        share = math.ceil(shards * os.path.getsize(path) / plain_bytes) if plain_bytes else 1
+        tasks.extend((path, start, end) for start, end in shard_ranges(path, max(1, share)))
+    return tasks
+
+
+def aggregate_parallel(logfiles: LogPaths, workers: int, chunk_bytes=STREAM_CHUNK_BYTES, engine="python",
+                       make_aggregates=LogAggregates) -> LogAggregates:
+    """
+    Parses byte ranges of plain logs and whole compressed logs in a process
+    pool, so compressed members decompress in parallel, and merges the
+    results in file order.
+    """
+    tasks = source_tasks(logfiles, workers * SHARDS_PER_WORKER)
+    aggregates = make_aggregates()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(aggregate_range, path, start, end, chunk_bytes, engine, make_aggregates)
+            for path, start, end in tasks
+        ]
+        for future in futures:
+            aggregates.merge(future.result())
+    return aggregates
@@ -0,0 +1,151 @@
+import re
+import pandas as pd
+
+from src.analysis.log_parsing import LOG_REGEX
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pandas string kernels are used instead
+    pa = None
+    pc = None
+
+FIELD_NAMES = ["ip", "timestamp", "method", "path", "protocol", "status", "size"]
+
+# LOG_REGEX with named groups, as required by Arrow's extract_regex
+_names = iter(FIELD_NAMES)
+NAMED_LOG_REGEX = re.sub(r"\((?!\?)", lambda m: f"(?P<{next(_names)}>", LOG_REGEX)
+
+# The canonical single-space layout of LOG_REGEX. Lines in this layout are
+# split into fields by position, which is several times cheaper than regex
+# capture extraction; anything else goes through NAMED_LOG_REGEX.
+CANONICAL_LOG_REGEX = r'^\S+ \S+ \S+ \[[\w:/]+ [+\-]\d{4}\] "\S+ \S+ \S+" \d{3} \S+(?: |$)'
+
+
+def _split_canonical(lines) -> dict:
+    """
+    Field columns for lines in the canonical layout, taken by token position.
+    """
+    tokens = pc.split_pattern(lines, " ", max_splits=10)
+
+    def token(i):
+        return pc.list_element(tokens, i)
+
+    return {
+        "ip": token(0),
+        "timestamp": pc.binary_join_element_wise(
+            pc.utf8_slice_codeunits(token(3), 1), pc.utf8_slice_codeunits(token(4), 0, -1), " "
+        ),
+        "method": pc.utf8_slice_codeunits(token(5), 1),
+        "path": token(6),
+        "protocol": pc.utf8_slice_codeunits(token(7), 0, -1),
+        "status": token(8),
+        "size": token(9),
+    }
+
+
+def _extract_fields(lines) -> dict:
+    """
+    Field columns for any matching line, via regex capture extraction.
+    """
+    fields = pc.extract_regex(lines, NAMED_LOG_REGEX)
+    fields = fields.filter(fields.is_valid())
+    return {name: fields.field(name) for name in FIELD_NAMES}
+
+
+def parse_table(text: str) -> "pa.Table":
+    """
+    Splits and parses a block with Arrow compute kernels into a typed table;
+    no Python object is created per line. Requires pyarrow.
+    """
+    lines = pc.split_pattern(pa.array([text]), "\n").flatten()
+    canonical = pc.match_substring_regex(lines, CANONICAL_LOG_REGEX)
+    valid = pc.match_substring_regex(lines, LOG_REGEX)
+    # A valid line outside the canonical layout sends the whole block through
+    # extraction, so rows always stay in file order
+    if pc.any(pc.and_not(valid, canonical)).as_py():
+        columns = _extract_fields(lines)
+    else:
+        columns = _split_canonical(lines.filter(canonical))
+
+    size = columns["size"]
+    columns["status"] = pc.cast(columns["status"], pa.int16())
+    columns["size"] = pc.cast(
+        pc.if_else(pc.match_substring_regex(size, r"^\d+$"), size, pa.scalar(None, pa.string())), pa.int64()
+    )
+    return pa.table(columns)
+
+
+def _parse_text_pandas(text: str) -> pd.DataFrame:
+    """
+    Fallback when pyarrow is unavailable: pandas `str.extract` over the block.
+    """
+    fields = pd.Series(text.splitlines(), dtype="str").str.extract(LOG_REGEX)
+    fields.columns = FIELD_NAMES
+    fields = fields.dropna(subset=["status"])
+    fields["status"] = fields["status"].astype("int16")
+    fields["size"] = pd.to_numeric(fields["size"], errors="coerce").astype("Int64")
+    return fields.reset_index(drop=True)
+
+
+def parse_text(text: str) -> pd.DataFrame:
+    """
+    Parses a block of log text into a typed DataFrame: string columns for
+    ip/timestamp/method/path/protocol, int16 status and nullable Int64 size.
+    Lines that do not match the log format are dropped.
+    """
+    if pa is not None:
+        return parse_table(text).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    return _parse_text_pandas(text)
+
+
+def _value_counts(values) -> dict:
+    """
+    Arrow value counts as a dict, in first-occurrence order.
+    """
+    counts = pc.value_counts(values)
+    return dict(zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()))
+
+
+def aggregate_table(table: "pa.Table", aggregates):
+    """
+    Folds a parsed Arrow block into LogAggregates. Counters whose columns
+    the block does not have (see METRIC_COLUMNS) are left untouched.
+    """
+    paths = table["path"]
+    aggregates.total += table.num_rows
+    aggregates.paths.update(_value_counts(paths))
+    if "method" in table.column_names:
+        aggregates.methods.update(_value_counts(table["method"]))
+    if "status" in table.column_names:
+        status = table["status"]
+        aggregates.errors += pc.sum(pc.greater_equal(status, 400)).as_py() or 0
+        aggregates.not_found.update(_value_counts(paths.filter(pc.equal(status, 404))))
+        aggregates.server_errors.update(_value_counts(paths.filter(pc.equal(status, 500))))
+
+
+def aggregate_frame(frame: pd.DataFrame, aggregates):
+    """
+    Folds a parsed block into LogAggregates using vectorized value_counts.
+    Counts keep first-occurrence order so ties rank as in the other modes.
+    """
+    if frame.empty:
+        return
+    status = frame["status"]
+    aggregates.total += len(frame)
+    aggregates.errors += int((status >= 400).sum())
+    aggregates.paths.update(frame["path"].value_counts(sort=False).to_dict())
+    aggregates.methods.update(frame["method"].value_counts(sort=False).to_dict())
+    aggregates.not_found.update(frame.loc[status == 404, "path"].value_counts(sort=False).to_dict())
+    aggregates.server_errors.update(frame.loc[status == 500, "path"].value_counts(sort=False).to_dict())
+
+
+def aggregate_text(text: str, aggregates):
+    """
+    Parses a block of log text and folds it into LogAggregates, staying in
+    Arrow when pyarrow is available.
+    """
+    if pa is not None:
+        aggregate_table(parse_table(text), aggregates)
+    else:
+        aggregate_frame(_parse_text_pandas(text), aggregates)
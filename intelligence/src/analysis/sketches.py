@@ -0,0 +1,126 @@
+import heapq
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+# Counters per Space-Saving sketch in approximate mode
+SKETCH_CAPACITY = 10000
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter sketch (Metwally et al.) with mergeable-summary
+    merging (Agarwal et al.). Tracks at most `capacity` items; every tracked
+    count overestimates the true count by at most its recorded error, which
+    is itself at most total / capacity. Any item whose true count exceeds
+    total / capacity is guaranteed to be tracked.
+
+    Updates are buffered in an exact Counter of up to `capacity` entries and
+    folded in as a batch, so memory stays under 2 * capacity entries and
+    per-line updates stay O(1).
+    """
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._pending: Counter = Counter()
+
+    def add(self, item: str, count: int = 1):
+        self._pending[item] += count
+        self.total += count
+        if len(self._pending) > self.capacity:
+            self._flush()
+
+    def update(self, other: Union["SpaceSaving", Mapping[str, int]]):
+        """
+        Counter-style update: folds in exact counts, or merges another sketch.
+        """
+        if isinstance(other, SpaceSaving):
+            other._flush()
+            self._flush()
+            self.total += other.total
+            self._combine(other.counts, other.errors, other.min_count())
+            return
+        for item, count in other.items():
+            self.add(item, count)
+
+    def min_count(self) -> int:
+        """
+        Upper bound on the true count of any untracked item.
+        """
+        self._flush()
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def error_bound(self) -> int:
+        """
+        Worst-case overestimate of any reported count.
+        """
+        self._flush()
+        return max(self.errors.values(), default=0)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Top `n` items by estimated count, like Counter.most_common.
+        """
+        self._flush()
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def estimate(self, item: str) -> Tuple[int, int]:
+        """
+        Returns (estimated count, maximum overestimate) for an item.
+        """
+        self._flush()
+        if item in self.counts:
+            return self.counts[item], self.errors[item]
+        minimum = self.min_count()
+        return minimum, minimum
+
+    def _flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, Counter()
+            self._combine(pending, {}, 0)
+
+    def _combine(self, counts: Mapping[str, int], errors: Mapping[str, int], other_min: int):
+        """
+        Mergeable-summary combine: an item missing from one side is assumed
+        to have that side's minimum count, then the top `capacity` are kept.
+        """
+        own_min = min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+        items = list(self.counts) + [item for item in counts if item not in self.counts]
+        merged = [
+            (item,
+             self.counts.get(item, own_min) + counts.get(item, other_min),
+             self.errors.get(item, own_min) + errors.get(item, other_min))
+            for item in items
+        ]
+        if len(merged) > self.capacity:
+            kept = {entry[0] for entry in heapq.nlargest(self.capacity, merged, key=lambda entry: entry[1])}
+            merged = [entry for entry in merged if entry[0] in kept]
+        # First-seen order is kept so ties rank as they do in Counter
+        self.counts = {item: count for item, count, _ in merged}
+        self.errors = {item: error for item, _, error in merged}
+
+    def __len__(self):
+        self._flush()
+        return len(self.counts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._flush()
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[item, count, self.errors[item]] for item, count in self.counts.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpaceSaving":
+        sketch = cls(data["capacity"])
+        sketch.total = data["total"]
+        for item, count, error in data["items"]:
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+        return sketch
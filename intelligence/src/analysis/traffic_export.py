@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+from functools import partial
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.analysis.log_aggregates import LogAggregates, SketchAggregates
+from src.analysis.log_sources import STREAM_CHUNK_BYTES, ENGINES, aggregate_parallel, aggregate_stream, expand_log_paths
+from src.utils.traffic import TRAFFIC_RANKING_FILE, rank_pages, read_ranking, write_ranking
+
+# Pages kept in the exported ranking
+TRAFFIC_TOP_PAGES = int(os.getenv("TRAFFIC_TOP_PAGES", 1000))
+
+
+def successful_path_counts(aggregates: LogAggregates):
+    """
+    Request counts per path, minus 404s and 500s, which say nothing about
+    which content is in demand.
+    """
+    counts = Counter(dict(aggregates.paths.most_common()))
+    counts.subtract(dict(aggregates.not_found.most_common()))
+    counts.subtract(dict(aggregates.server_errors.most_common()))
+    return [(path, hits) for path, hits in counts.items() if hits > 0]
+
+
+async def request_prewarm(service_url: str, ranking_file: str, timeout: float = 300.0):
+    """
+    Sends the exported ranking to the live sync service's prewarm endpoint.
+    """
+    ranking = read_ranking(ranking_file)
+    payload = {
+        "pages": [entry["path"] for entry in ranking["pages"]],
+        "sections": [entry["path"] for entry in ranking["sections"]],
+    }
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        response = await client.post(f"{service_url.rstrip('/')}/api/v1/prewarm", json=payload)
+        response.raise_for_status()
+        return response.json()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export a page traffic ranking from dispatcher logs")
+    parser.add_argument("logfile", nargs="+", help="Dispatcher log files, globs or directories (plain or .gz rotations)")
+    parser.add_argument("--output", default=TRAFFIC_RANKING_FILE or "traffic.json", help="Ranking file (TRAFFIC_RANKING_FILE)")
+    parser.add_argument("--top", type=int, default=TRAFFIC_TOP_PAGES, help="Pages kept in the ranking")
+    parser.add_argument("--workers", type=int, default=0, help="Parse in N processes")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="Log parse engine")
+    parser.add_argument("--sketch-size", type=int, default=0, help="Rank with fixed-size Space-Saving sketches")
+    parser.add_argument("--prewarm-url", help="Live sync service to prewarm afterwards, e.g. http://localhost:8000")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    logfiles = expand_log_paths(args.logfile)
+    make_aggregates = partial(SketchAggregates, args.sketch_size) if args.sketch_size else LogAggregates
+    if args.workers > 1:
+        aggregates = aggregate_parallel(logfiles, args.workers, STREAM_CHUNK_BYTES, args.engine, make_aggregates)
+    else:
+        aggregates = aggregate_stream(logfiles, STREAM_CHUNK_BYTES, args.engine, make_aggregates)
+
+    pages = rank_pages(successful_path_counts(aggregates))
+    write_ranking(args.output, pages, args.top, source=", ".join(args.logfile))
+    print(f"Ranked {len(pages)} pages from {aggregates.total} requests; top {min(args.top, len(pages))} written to {args.output}")
+
+    if args.prewarm_url:
+        result = await request_prewarm(args.prewarm_url, args.output)
+        print(f"Prewarm: {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
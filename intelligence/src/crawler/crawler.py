@@ -1,13 +1,21 @@
 import asyncio
+import hashlib
 import httpx
 import json
+import logging
 import os
 import sys
 import aiofiles
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 # from langchain_text_splitters import RecursiveCharacterTextSplitter (Removed to avoid zstandard dependency)
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.utils.profiling import TRACE_SPANS, batch, profiled, span
+from src.utils.scope import path_metadata
+from src.utils.traffic import page_hits, prioritize, read_ranking
+
 load_dotenv()
 
 # Configuration
@@ -17,9 +25,19 @@ AEM_PASSWORD = os.getenv("AEM_PASSWORD", "admin")
 AUTH = (AEM_USER, AEM_PASSWORD)
 QUERY_BUILDER_URL = f"{AEM_BASE_URL}/bin/querybuilder.json"
 OUTPUT_FILE = "output.jsonl"
+CRAWL_CONCURRENCY = 10
+# Page dates compared against the high-water mark by incremental discovery
+MODIFIED_PROPERTIES = ["jcr:content/cq:lastModified", "jcr:content/cq:lastReplicated"]
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+
+class FetchError(Exception):
+    """
+    Raised when a page's .model.json could not be fetched or parsed
+    (other than a 404, which means the page has no content).
+    """
+
 # Text Splitter Configuration
 CHUNK_SIZE = 650
 CHUNK_OVERLAP = 65
@@ -31,110 +49,235 @@ splitter = RecursiveCharacterTextSplitter(
     is_separator_regex=False,
 )
 
-async def search_pages(client: httpx.AsyncClient, root_path: str = "/content") -> List[str]:
+# Text properties read from each component, and how texts are joined
+TEXT_PROPERTIES = ["text", "jcr:title", "jcr:description", "value"]
+COMPONENT_SEPARATOR = "\n\n"
+# A component at least this long always ends its chunk. Breakpoints then
+# depend on each component's own length, not on the lengths before it.
+CHUNK_MIN_SIZE = 200
+
+async def query_pages(client: httpx.AsyncClient, root_path: str, predicates: Optional[Dict[str, str]] = None,
+                      properties: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
-    Finds all cq:Page nodes under the root path using AEM Query Builder.
+    Runs a Query Builder query for cq:Page nodes under the root path and
+    returns the hits with the selected properties (default jcr:path).
     """
     params = {
         "path": root_path,
         "type": "cq:Page",
         "p.limit": "-1",  # Fetch all results
         "p.hits": "selective",
-        "p.properties": "jcr:path"
+        "p.properties": " ".join(properties or ["jcr:path"]),
+        **(predicates or {})
     }
-    
+    response = await client.get(QUERY_BUILDER_URL, params=params, auth=AUTH)
+    response.raise_for_status()
+    return response.json().get("hits", [])
+
+async def search_pages(client: httpx.AsyncClient, root_path: str = "/content") -> List[str]:
+    """
+    Finds all cq:Page nodes under the root path using AEM Query Builder.
+    """
     try:
-        response = await client.get(QUERY_BUILDER_URL, params=params, auth=AUTH)
-        response.raise_for_status()
-        data = response.json()
-        
-        hits = data.get("hits", [])
+        hits = await query_pages(client, root_path)
         print(f"Found {len(hits)} pages under {root_path}")
         return [hit["jcr:path"] for hit in hits]
     except Exception as e:
         print(f"Error searching pages: {e}")
         return []
 
-def extract_text_from_component(component: Dict[str, Any]) -> List[str]:
+async def search_modified_pages(client: httpx.AsyncClient, root_path: str, since: datetime) -> List[Dict[str, Any]]:
     """
-    Recursively extracts text from a Sling Model JSON structure.
-    Focuses on common text properties like 'text', 'jcr:title', 'jcr:description'.
+    Finds cq:Page nodes under the root path whose cq:lastModified or
+    cq:lastReplicated is at or after `since`, with one daterange predicate
+    per property in an OR group. Returns the hits with jcr:path and both
+    dates. Unlike search_pages, errors are raised: a failed query must not
+    be mistaken for "nothing changed".
     """
-    texts = []
-    
-    # Direct text properties
-    for key in ["text", "jcr:title", "jcr:description", "value"]:
-        if key in component and isinstance(component[key], str):
-            texts.append(component[key])
-            
+    bound = since.isoformat(timespec="milliseconds")
+    predicates = {"group.p.or": "true"}
+    for i, prop in enumerate(MODIFIED_PROPERTIES, start=1):
+        predicates[f"group.{i}_daterange.property"] = prop
+        predicates[f"group.{i}_daterange.lowerBound"] = bound
+        predicates[f"group.{i}_daterange.lowerOperation"] = ">="
+    return await query_pages(client, root_path, predicates, ["jcr:path", *MODIFIED_PROPERTIES])
+
+def extract_components(component: Dict[str, Any], path: str = "jcr:content") -> List[Tuple[str, List[str]]]:
+    """
+    Recursively extracts text from a Sling Model JSON structure, per component.
+    Returns (component path, texts) for every node with text properties like
+    'text', 'jcr:title', 'jcr:description', in page order. Paths follow the
+    JSON keys without the ':items' levels, e.g. jcr:content/root/container/text.
+    """
+    texts = [component[key] for key in TEXT_PROPERTIES if isinstance(component.get(key), str)]
+    components = [(path, texts)] if texts else []
+
     # Recursive traversal of children
     for key, value in component.items():
+        child_path = path if key == ":items" else f"{path}/{key}"
         if isinstance(value, dict):
-            texts.extend(extract_text_from_component(value))
+            components.extend(extract_components(value, child_path))
         elif isinstance(value, list):
-            for item in value:
+            for i, item in enumerate(value):
                 if isinstance(item, dict):
-                    texts.extend(extract_text_from_component(item))
-                    
-    return texts
+                    components.extend(extract_components(item, f"{child_path}/{i}"))
+
+    return components
+
+def extract_text_from_component(component: Dict[str, Any]) -> List[str]:
+    """
+    Recursively extracts text from a Sling Model JSON structure.
+    Focuses on common text properties like 'text', 'jcr:title', 'jcr:description'.
+    """
+    return [text for _, texts in extract_components(component) for text in texts]
+
+def chunk_components(components: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Groups consecutive components into chunks, never splitting a component
+    across chunks; a component longer than CHUNK_SIZE is split on its own.
+    Returns (component path, text) per chunk, the path being that of the
+    chunk's first component.
+
+    A chunk ends after every component of at least CHUNK_MIN_SIZE characters,
+    so short ones (titles, teasers) join the component that follows them.
+    Since these breakpoints depend only on each component itself, an edit
+    changes only the chunks between the breakpoints around it; a length change
+    does not shift the chunks of the rest of the page.
+    """
+    chunks = []
+    run_path, run = None, []
+
+    def flush():
+        if run:
+            chunks.append((run_path, COMPONENT_SEPARATOR.join(run)))
+            run.clear()
+
+    for path, text in components:
+        if len(text) > CHUNK_SIZE:
+            flush()
+            chunks.extend((path, piece) for piece in splitter.split_text(text))
+            continue
+        if run and len(COMPONENT_SEPARATOR.join(run + [text])) > CHUNK_SIZE:
+            flush()
+        if not run:
+            run_path = path
+        run.append(text)
+        if len(text) >= CHUNK_MIN_SIZE:
+            flush()
+    flush()
+    return chunks
 
-async def process_page(client: httpx.AsyncClient, page_path: str) -> List[Dict[str, Any]]:
+def chunk_key(component_path: str, text: str) -> str:
+    """
+    Stable key of a chunk within its page: the path of its (first) component
+    and a hash of its text.
+    """
+    return f"{component_path}#{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+
+def chunk_doc_id(record: Dict[str, Any]) -> str:
+    """
+    ChromaDB ID of a crawler record, e.g.
+    /content/wknd/us/en/jcr:content/root/text#3f2a9c0d81b7. It only changes
+    when the chunk's text does. Records of older crawls without a chunk_key
+    keep the positional {source}_{chunk_id}.
+    """
+    source = record.get("source", "unknown")
+    key = record.get("chunk_key")
+    return f"{source}/{key}" if key else f"{source}_{record.get('chunk_id', 0)}"
+
+def page_records(page_path: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Splits a page's .model.json into chunk records anchored to its components.
+    """
+    # Extract all text from the page per the "Unified Content Layer" concept
+    # We try to get the 'jcr:content' part if available, else root
+    content_root = data.get("jcr:content", data)
+
+    # Remove duplicates (across the page) while preserving order
+    seen = set()
+    components = []
+    for path, texts in extract_components(content_root):
+        deduped_texts = [t for t in texts if t.strip() and t not in seen]
+        seen.update(deduped_texts)
+        if deduped_texts:
+            components.append((path, COMPONENT_SEPARATOR.join(deduped_texts)))
+
+    if not components:
+        return []
+
+    # Split text
+    with span("split", path=page_path, chars=sum(len(text) for _, text in components)):
+        chunks = profiled(chunk_components)(components)
+
+    # Format output records
+    records = []
+    keys = set()
+    scope_metadata = path_metadata(page_path)
+    for i, (component_path, chunk) in enumerate(chunks):
+        key = base_key = chunk_key(component_path, chunk)
+        # The same text twice within one component
+        n = 1
+        while key in keys:
+            n += 1
+            key = f"{base_key}.{n}"
+        keys.add(key)
+        records.append({
+            "source": page_path,
+            "chunk_id": i,
+            "chunk_key": key,
+            "text": chunk,
+            "metadata": {
+                "url": f"{AEM_BASE_URL}{page_path}.html",
+                "title": data.get("jcr:content", {}).get("jcr:title", "Unknown"),
+                "component": component_path,
+                **scope_metadata
+            }
+        })
+
+    return records
+
+async def process_page(client: httpx.AsyncClient, page_path: str, raise_errors: bool = False) -> List[Dict[str, Any]]:
     """
     Fetches page content via .model.json, extracts text, splits it, and returns chunks.
+    A missing page returns no chunks; other failures (5xx, timeouts) do too,
+    or raise FetchError with `raise_errors`, so callers can tell them apart.
     """
     model_url = f"{AEM_BASE_URL}{page_path}.model.json"
     
     try:
-        response = await client.get(model_url, auth=AUTH)
+        with span("fetch", path=page_path):
+            response = await client.get(model_url, auth=AUTH)
         if response.status_code == 404:
             # Fallback or just skip
             print(f"Skipping {page_path}: .model.json not found")
             return []
         
         response.raise_for_status()
-        data = response.json()
-        
-        # Extract all text from the page per the "Unified Content Layer" concept
-        # We try to get the 'jcr:content' part if available, else root
-        content_root = data.get("jcr:content", data)
-        raw_texts = extract_text_from_component(content_root)
-        # Remove duplicates while preserving order
-        seen = set()
-        deduped_texts = []
-        for t in raw_texts:
-            if t not in seen:
-                seen.add(t)
-                deduped_texts.append(t)
-        
-        full_text = "\n\n".join(deduped_texts)
-        
-        if not full_text:
-            return []
-            
-        # Split text
-        chunks = splitter.split_text(full_text)
-        
-        # Format output records
-        records = []
-        for i, chunk in enumerate(chunks):
-            records.append({
-                "source": page_path,
-                "chunk_id": i,
-                "text": chunk,
-                "metadata": {
-                    "url": f"{AEM_BASE_URL}{page_path}.html",
-                    "title": data.get("jcr:content", {}).get("jcr:title", "Unknown")
-                }
-            })
-            
-        return records
+        return page_records(page_path, response.json())
         
     except Exception as e:
         print(f"Error processing {page_path}: {e}")
+        if raise_errors:
+            raise FetchError(f"Could not fetch {model_url}: {e}") from e
         return []
 
+async def crawl_pages(client: httpx.AsyncClient, pages: List[str], concurrency: int = CRAWL_CONCURRENCY) -> List[List[Dict[str, Any]]]:
+    """
+    Processes pages concurrently, at most `concurrency` requests in flight.
+    Returns the chunk records of each page, in page order.
+    """
+    sem = asyncio.Semaphore(concurrency) # Limit concurrent requests
+
+    async def bounded_process(page):
+        async with sem:
+            return await process_page(client, page)
+
+    return await asyncio.gather(*[bounded_process(page) for page in pages])
+
 async def main():
     print("Starting AEM Crawler...")
+    if TRACE_SPANS:
+        logging.basicConfig(level=logging.INFO)
     
     async with httpx.AsyncClient() as client:
         # 1. Discover Pages
@@ -144,15 +287,16 @@ async def main():
             print("No pages found. Exiting.")
             return
 
-        # 2. Process Pages (Concurrent with Semaphore)
-        sem = asyncio.Semaphore(10) # Limit concurrent requests
-        
-        async def bounded_process(page):
-            async with sem:
-                return await process_page(client, page)
+        # Most requested pages first (TRAFFIC_RANKING_FILE), so they are
+        # fetched, written and ingested before the long tail
+        hits = page_hits(read_ranking())
+        if hits:
+            pages = prioritize(pages, hits)
+            print(f"Prioritized {sum(1 for page in pages if page in hits)} pages by dispatcher traffic")
 
-        tasks = [bounded_process(page) for page in pages]
-        results = await asyncio.gather(*tasks)
+        # 2. Process Pages (Concurrent with Semaphore)
+        with batch("crawl", pages=len(pages)):
+            results = await crawl_pages(client, pages)
         
         # 3. Write Output
         total_chunks = 0
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import chromadb
+import httpx
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.crawler.crawler import MODIFIED_PROPERTIES, search_modified_pages, search_pages
+from src.crawler.reconcile import list_indexed_sources, orphaned_sources
+from src.vector_store.collection import get_or_create_collection, resolve_alias
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Configuration
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
+CATCH_UP_ROOT = os.getenv("CATCH_UP_ROOT", "/content")
+# High-water mark per content root: changes up to it are in the index
+DISCOVERY_STATE_FILE = os.getenv("DISCOVERY_STATE_FILE", os.path.join(CHROMA_DB_PATH, "discovery.json"))
+# Pages changed this long before the mark are still picked up, for clock skew
+# between author/publish instances and saves that land out of order
+CATCH_UP_OVERLAP_SECONDS = int(os.getenv("CATCH_UP_OVERLAP_SECONDS", 300))
+
+def parse_date(value: Any) -> Optional[datetime]:
+    """
+    Parses a date as Query Builder returns it: ISO 8601, or the ECMAScript
+    format JCR dates are written in ("Tue Jan 23 2024 10:00:00 GMT+0100").
+    Dates without a zone are taken as UTC.
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value.split(" (")[0], "%a %b %d %Y %H:%M:%S GMT%z")
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def hit_dates(hit: Dict[str, Any]) -> List[datetime]:
+    """
+    The modification and replication dates of a Query Builder hit, whether
+    the relative properties come back flat or nested.
+    """
+    dates = []
+    for prop in MODIFIED_PROPERTIES:
+        value = hit.get(prop)
+        if value is None:
+            value = hit
+            for name in prop.split("/"):
+                value = value.get(name) if isinstance(value, dict) else None
+        date = parse_date(value)
+        if date:
+            dates.append(date)
+    return dates
+
+def read_mark(root: str = CATCH_UP_ROOT, state_file: Optional[str] = None) -> Optional[datetime]:
+    """
+    The high-water mark saved for a content root, or None before the first catch-up.
+    """
+    try:
+        with open(state_file or DISCOVERY_STATE_FILE, "r", encoding="utf-8") as f:
+            return parse_date(json.load(f).get(root))
+    except (OSError, ValueError):
+        return None
+
+def save_mark(root: str, mark: datetime, state_file: Optional[str] = None):
+    """
+    Saves the high-water mark of a content root (atomically).
+    """
+    state_file = state_file or DISCOVERY_STATE_FILE
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            marks = json.load(f)
+    except (OSError, ValueError):
+        marks = {}
+    marks[root] = mark.isoformat(timespec="milliseconds")
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(marks, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+async def plan_catch_up(client: httpx.AsyncClient, collection, root: str = CATCH_UP_ROOT,
+                        since: Optional[datetime] = None,
+                        overlap_seconds: int = CATCH_UP_OVERLAP_SECONDS,
+                        indexed: Optional[Set[str]] = None,
+                        empty: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """
+    Works out what changed under `root` since the high-water mark `since`:
+      - modified: pages whose cq:lastModified or cq:lastReplicated is newer
+      - added: listed pages with nothing in the index (moved or copied pages
+        keep their old dates; also pages whose earlier sync failed), except
+        the `empty` pages, known to sync without content
+      - deleted: indexed pages no longer listed
+    Without a mark, every listed page counts as modified. The returned mark is
+    the newest date seen, or the time discovery started if Query Builder
+    returned no dates (None if nothing could be listed).
+    `indexed` is the collection's sources if already known (see SourceIndex);
+    otherwise they are listed from the collection, off the event loop.
+    """
+    started = datetime.now(timezone.utc)
+    live_pages = await search_pages(client, root)
+    if since is None:
+        # No mark is set from a failed listing, or every page before it would be skipped
+        modified, mark = list(live_pages), started if live_pages else None
+    else:
+        hits = await search_modified_pages(client, root, since - timedelta(seconds=overlap_seconds))
+        modified = [hit["jcr:path"] for hit in hits]
+        dates = [date for hit in hits for date in hit_dates(hit)]
+        if dates:
+            mark = max(dates + [since])
+        elif hits:
+            # Query Builder did not return the dates
+            mark = started
+        else:
+            mark = since
+
+    added, deleted = [], []
+    if live_pages:
+        if indexed is None:
+            indexed = await asyncio.to_thread(list_indexed_sources, collection)
+        deleted = orphaned_sources(indexed, set(live_pages), root)
+        seen = set(modified)
+        skip = seen | (empty or set())
+        added = [page for page in live_pages if page not in indexed and page not in skip]
+    else:
+        # An empty listing is far more likely an AEM/query error than an empty site
+        logger.warning(f"Query Builder returned no pages under {root}; skipping added/deleted detection")
+
+    logger.info(f"Catch-up {root} since {since}: {len(modified)} modified, {len(added)} added, {len(deleted)} deleted")
+    return {"since": since, "mark": mark, "modified": modified, "added": added, "deleted": deleted}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="List pages changed in AEM since the last catch-up")
+    parser.add_argument("--root", default=CATCH_UP_ROOT, help="Content root to check")
+    parser.add_argument("--since", type=parse_date, help="ISO date to check from (default: the saved high-water mark)")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    collection = get_or_create_collection(client, resolve_alias(COLLECTION_NAME))
+    since = args.since or read_mark(args.root)
+
+    async with httpx.AsyncClient() as http_client:
+        plan = await plan_catch_up(http_client, collection, args.root, since)
+    mark = plan["mark"].isoformat() if plan["mark"] else "unchanged"
+    print(f"Since {since.isoformat() if since else 'the beginning'} (new mark {mark}):")
+    for kind in ("modified", "added", "deleted"):
+        print(f"  {kind}: {len(plan[kind])}")
+        for path in plan[kind][:10]:
+            print(f"    {path}")
+    print("Run them with POST /api/v1/catch-up on the live sync service.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
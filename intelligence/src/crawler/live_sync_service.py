@@ -1,22 +1,41 @@
 import asyncio
+import json
 import os
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 from contextlib import asynccontextmanager
 import chromadb
+from chromadb.errors import NotFoundError
 from dotenv import load_dotenv
 
 # Import usage from existing modules
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from src.crawler.crawler import process_page
+from src.crawler.crawler import FetchError, chunk_doc_id, process_page
 # from src.vector_store.ingest import upsert_batch # Removed to avoid circular import or duplication
 from src.utils.embeddings import get_embedding_model, compute_embeddings, compute_query_embedding
-from src.vector_store.query import get_relevant_context
+from src.vector_store.query import pack_results, retrieve_context, retrieve_contexts
+from src.vector_store.context import CONTEXT_TOKEN_BUDGET, PackedContext, PackingStats
+from src.crawler.reconcile import SourceIndex, reconcile
+from src.crawler.discovery import CATCH_UP_ROOT, plan_catch_up, read_mark, save_mark
+from src.utils.scope import path_metadata, scope_filter, subtree_filter
+from src.vector_store.collection import (
+    apply_search_ef, get_or_create_collection, resolve_alias, building_collection, delete_matching
+)
+from src.vector_store.projection import load_projection, project
+from src.vector_store.snapshot import SNAPSHOT_PATH, import_snapshot, needs_snapshot
+from src.utils.admission import AdmissionController, Deadline, DeadlineExceeded, Overloaded, parse_timeout_ms
+from src.utils.cache import SemanticCache, TTLCache
+from src.utils.generation import OLLAMA_MODEL, GenerationError, build_prompt, generate, sources_fingerprint, stream_generate
+from src.utils.profiling import ProfilingMiddleware, profiled, requests_enabled, span
+from src.utils.traffic import read_ranking
+from src.analysis.sketches import SpaceSaving
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -28,15 +47,227 @@ load_dotenv()
 CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
 COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
 AEM_BASE_URL = os.getenv("AEM_BASE_URL", "http://localhost:4502")
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", 64))
+
+# Admission control for query endpoints
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", 4))
+QUERY_MAX_QUEUE = int(os.getenv("QUERY_MAX_QUEUE", 16))
+QUERY_DEADLINE_MS = int(os.getenv("QUERY_DEADLINE_MS", 10000))
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+# Events that remove a page from the index (ResourceChange REMOVED from the
+# ContentChangeListener, replication deactivate/delete)
+DELETE_EVENTS = {"REMOVED", "DELETE", "DEACTIVATE", "UNPUBLISH"}
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", 0))
+# Sync pages changed in AEM since the last run every N seconds (0 = off)
+CATCH_UP_INTERVAL_SECONDS = int(os.getenv("CATCH_UP_INTERVAL_SECONDS", 0))
+
+# Retrieved-context cache, cleared whenever the index changes (0 = disabled)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 1024))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", 300))
+
+# Generated answers, reused for questions whose embedding is at least
+# ANSWER_CACHE_SIMILARITY similar and that retrieve the same sources;
+# dropped when one of those sources is re-synced (0 entries = disabled)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+
+# Most frequent (scope, query) pairs, kept in a fixed-size sketch and
+# persisted across restarts so prewarm knows what authors ask
+QUERY_STATS_FILE = os.getenv("QUERY_STATS_FILE", os.path.join(CHROMA_DB_PATH, "query_stats.json"))
+QUERY_STATS_SIZE = int(os.getenv("QUERY_STATS_SIZE", 1000))
+
+# Prewarm limits and startup behaviour
+PREWARM_MAX_PAGES = int(os.getenv("PREWARM_MAX_PAGES", 200))
+PREWARM_MAX_QUERIES = int(os.getenv("PREWARM_MAX_QUERIES", 50))
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "false").lower() == "true"
 
 # Global state
 class AppState:
     chroma_client = None
     collection = None
+    collection_name = None
     model = None
     http_client = None
+    reconcile_task = None
+    catch_up_task = None
+    prewarm_task = None
 
 state = AppState()
+admission = AdmissionController(QUERY_MAX_CONCURRENCY, QUERY_MAX_QUEUE)
+retrieval_cache = TTLCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL_SECONDS)
+query_stats = SpaceSaving(QUERY_STATS_SIZE)
+packing_stats = PackingStats()
+catch_up_lock = asyncio.Lock()
+# Sources per collection for catch-up, kept current by syncs and deletes
+source_index = SourceIndex()
+answer_cache = SemanticCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY)
+# Bumped on every index change, so answers generated meanwhile are not cached
+index_version = 0
+
+# Separates scope and query in query_stats items
+QUERY_STATS_SEPARATOR = "\t"
+
+def active_collection():
+    """
+    Returns the collection currently behind the COLLECTION_NAME alias,
+    reopening it when a blue-green rebuild has swapped the alias.
+    An alias pointing at a missing collection is logged and the previous
+    collection keeps serving, rather than an empty one being created.
+    """
+    name = resolve_alias(COLLECTION_NAME)
+    if name != state.collection_name:
+        if name == COLLECTION_NAME:
+            # Not aliased: the collection is created on first use
+            collection = get_or_create_collection(state.chroma_client, name)
+        else:
+            try:
+                collection = state.chroma_client.get_collection(name=name)
+            except NotFoundError:
+                logger.error(f"Alias '{COLLECTION_NAME}' points to missing collection '{name}'; "
+                             f"still serving '{state.collection_name}'")
+                if state.collection is None:
+                    raise
+                return state.collection
+            apply_search_ef(collection)
+        logger.info(f"Serving collection '{name}' for alias '{COLLECTION_NAME}'")
+        state.collection = collection
+        state.collection_name = name
+    return state.collection
+
+def write_collections():
+    """
+    Returns the collections live updates must be written to: the serving one
+    and, during a rebuild, the one being built so the swap loses no changes.
+    """
+    collections = [active_collection()]
+    building = building_collection(COLLECTION_NAME)
+    if building and building != state.collection_name:
+        collections.append(get_or_create_collection(state.chroma_client, building))
+    return collections
+
+def retrieval_key(query: str, scope: Optional[str], n_results: int = 3, token_budget: Optional[int] = None):
+    """
+    Cache key of a retrieval. Includes the physical collection, so an alias
+    swap to a rebuilt collection never serves the old one's results.
+    """
+    active_collection()
+    return (state.collection_name, scope or "", n_results, token_budget or CONTEXT_TOKEN_BUDGET, " ".join(query.split()))
+
+def index_changed(path: Optional[str] = None, subtree: bool = False):
+    """
+    Drops what a change to the index made stale: all retrieved contexts, and
+    the answers generated from `path` (and pages below it, with subtree), or
+    all answers and the known sources when no path is given.
+    """
+    global index_version
+    index_version += 1
+    retrieval_cache.clear()
+    if path is None:
+        answer_cache.clear()
+        source_index.invalidate()
+    else:
+        answer_cache.invalidate(path, subtree=subtree)
+
+def record_query(query: str, scope: Optional[str]):
+    query_stats.add(f"{scope or ''}{QUERY_STATS_SEPARATOR}{' '.join(query.split())}")
+
+def top_queries(n: int) -> List[tuple]:
+    """
+    Most frequent (query, scope) pairs seen by the query endpoints.
+    """
+    pairs = []
+    for item, _ in query_stats.most_common(n):
+        scope, _, query = item.partition(QUERY_STATS_SEPARATOR)
+        pairs.append((query, scope or None))
+    return pairs
+
+def load_query_stats():
+    global query_stats
+    try:
+        with open(QUERY_STATS_FILE, "r", encoding="utf-8") as f:
+            query_stats = SpaceSaving.from_dict(json.load(f))
+        logger.info(f"Loaded query stats for {len(query_stats)} queries from {QUERY_STATS_FILE}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable query stats {QUERY_STATS_FILE}: {e}")
+
+def save_query_stats():
+    try:
+        os.makedirs(os.path.dirname(QUERY_STATS_FILE) or ".", exist_ok=True)
+        tmp_file = f"{QUERY_STATS_FILE}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(query_stats.to_dict(), f)
+        os.replace(tmp_file, QUERY_STATS_FILE)
+    except Exception as e:
+        logger.warning(f"Could not save query stats to {QUERY_STATS_FILE}: {e}")
+
+def cache_retrieval(key, packed: PackedContext, version: int):
+    """
+    Caches a retrieved context unless retrieval failed or the index changed
+    since `version` was read, before retrieval started: the cache was cleared
+    meanwhile and the result may hold a deleted or outdated page.
+    """
+    if not packed.error and version == index_version:
+        retrieval_cache.put(key, packed)
+
+async def cached_context(query: str, scope: Optional[str], deadline: Deadline,
+                         token_budget: Optional[int] = None) -> PackedContext:
+    """
+    Returns the packed context for a query from the retrieval cache,
+    retrieving and caching it on a miss.
+    """
+    key = retrieval_key(query, scope, token_budget=token_budget)
+    packed = retrieval_cache.get(key)
+    if packed is None:
+        version = index_version
+        packed = await deadline.run(
+            "context retrieval", retrieve_context, query, scope=scope, deadline=deadline, token_budget=token_budget
+        )
+        cache_retrieval(key, packed, version)
+    return packed
+
+async def reconcile_periodically(interval: int):
+    """
+    Background job purging chunks of pages that no longer exist in AEM.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for collection in write_collections():
+                result = await reconcile(state.http_client, collection)
+                if result.get("deleted_sources"):
+                    index_changed()
+        except Exception as e:
+            logger.error(f"Reconciliation failed: {e}", exc_info=True)
+
+async def catch_up_periodically(interval: int):
+    """
+    Background job syncing the pages changed in AEM since its last run.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await catch_up()
+        except Exception as e:
+            logger.error(f"Catch-up failed: {e}", exc_info=True)
+
+async def load_startup_snapshot(path: str):
+    """
+    Bulk-loads an index snapshot on a node whose collection is missing or
+    empty and points the alias at it, instead of re-crawling and re-embedding.
+    A failed load is logged and the node starts with what it has.
+    """
+    logger.info(f"Collection '{COLLECTION_NAME}' is empty; loading snapshot {path}...")
+    start = time.perf_counter()
+    try:
+        collection, manifest = await asyncio.to_thread(import_snapshot, state.chroma_client, path, COLLECTION_NAME)
+        logger.info(f"Loaded {manifest['count']} chunks from snapshot into '{collection.name}' "
+                    f"in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Could not load snapshot {path}: {e}", exc_info=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -46,7 +277,9 @@ async def lifespan(app: FastAPI):
     # Initialize ChromaDB
     logger.info(f"Connecting to ChromaDB at {CHROMA_DB_PATH}...")
     state.chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    state.collection = state.chroma_client.get_or_create_collection(name=COLLECTION_NAME)
+    if SNAPSHOT_PATH and needs_snapshot(state.chroma_client, COLLECTION_NAME):
+        await load_startup_snapshot(SNAPSHOT_PATH)
+    active_collection()
     
     # Initialize Model
     logger.info("Loading embedding model...")
@@ -55,11 +288,24 @@ async def lifespan(app: FastAPI):
     # Initialize HTTP Client for crawler
     import httpx
     state.http_client = httpx.AsyncClient()
+
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        state.reconcile_task = asyncio.create_task(reconcile_periodically(RECONCILE_INTERVAL_SECONDS))
+    if CATCH_UP_INTERVAL_SECONDS > 0:
+        state.catch_up_task = asyncio.create_task(catch_up_periodically(CATCH_UP_INTERVAL_SECONDS))
+
+    load_query_stats()
+    if PREWARM_ON_STARTUP:
+        state.prewarm_task = asyncio.create_task(prewarm(PrewarmPayload()))
     
     yield
     
     # Shutdown
     logger.info("Shutting down Live Sync Service...")
+    save_query_stats()
+    for task in (state.reconcile_task, state.catch_up_task, state.prewarm_task):
+        if task:
+            task.cancel()
     if state.http_client:
         await state.http_client.aclose()
 
@@ -76,157 +322,614 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Correlation IDs, request spans and profiles; not installed when disabled
+if requests_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 class WebhookPayload(BaseModel):
     path: str
     event: Optional[str] = None
+    # ContentChangeListener sends the ResourceChange type as "type"
+    type: Optional[str] = None
 
 class ChatPayload(BaseModel):
     message: str
+    scope: Optional[str] = None
 
 class ContextPayload(BaseModel):
     query: str
+    scope: Optional[str] = None
+    # Prompt tokens the packed context may use (default CONTEXT_TOKEN_BUDGET)
+    token_budget: Optional[int] = Field(None, gt=0)
+
+class BatchContextPayload(BaseModel):
+    queries: List[str]
+    scope: Optional[str] = None
+    token_budget: Optional[int] = Field(None, gt=0)
+
+class GeneratePayload(BaseModel):
+    message: str
+    scope: Optional[str] = None
+    # Ollama model (default OLLAMA_MODEL)
+    model: Optional[str] = None
+    # Stream Ollama's NDJSON messages instead of returning one JSON body
+    stream: bool = False
+    token_budget: Optional[int] = Field(None, gt=0)
+
+class PrewarmPayload(BaseModel):
+    # Hot pages and sections, most requested first; default to TRAFFIC_RANKING_FILE
+    pages: Optional[List[str]] = None
+    sections: Optional[List[str]] = None
+    # Queries to warm (unscoped and per section); default to the most frequent recorded ones
+    queries: Optional[List[str]] = None
+    # Index hot pages missing from the collection, most requested first
+    sync_missing: bool = False
+
+def resolve_scope_filter(scope: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Converts a request scope into a ChromaDB where filter, rejecting paths
+    outside /content with a 400.
+    """
+    try:
+        return scope_filter(scope)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@asynccontextmanager
+async def admitted(request: Request):
+    """
+    Admits a query request under the concurrency limit and yields its deadline
+    (from the X-Request-Timeout-Ms header, capped at QUERY_DEADLINE_MS).
+    Shed requests get a 503; requests whose deadline expires mid-flight a 504.
+    """
+    deadline = Deadline(parse_timeout_ms(request.headers.get(DEADLINE_HEADER), QUERY_DEADLINE_MS))
+    try:
+        async with admission.admit(deadline):
+            yield deadline
+    except Overloaded as e:
+        logger.warning(f"Shed {request.url.path}: {e}")
+        raise HTTPException(status_code=503, detail=f"overloaded: {e}", headers={"Retry-After": "1"})
+    except DeadlineExceeded as e:
+        logger.warning(f"Deadline exceeded for {request.url.path}: {e}")
+        if e.stage == "admission":
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        raise HTTPException(status_code=504, detail=str(e))
+
+async def chat_context(query_text: str, where: Optional[Dict[str, Any]], deadline: Deadline) -> PackedContext:
+    """
+    Retrieves and packs the chat context with the service's loaded model and collection.
+    """
+    # 1. Generate embedding for the query (in the collection's vector space)
+    collection = active_collection()
+    query_embedding = await deadline.run(
+        "embedding", compute_query_embedding, state.model, query_text, load_projection(collection.name)
+    )
+
+    # 2. Query ChromaDB (restricted to the requested subtree, if any)
+    return await search_context(collection, query_embedding, where, deadline)
+
+async def search_context(collection, query_embedding: List[float], where: Optional[Dict[str, Any]],
+                         deadline: Deadline, token_budget: Optional[int] = None) -> PackedContext:
+    """
+    Runs the vector search for an embedded query and packs the results.
+    """
+    results = await deadline.run(
+        "vector search",
+        collection.query,
+        query_embeddings=[query_embedding],
+        n_results=3,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
+    return pack_results(results, 0, token_budget)
+
+def chat_response(packed: PackedContext) -> Dict[str, str]:
+    """
+    Turns a packed context into the chat endpoint's assistant message.
+    """
+    context_str = packed.text
+
+    # 3. Format response
+    has_results = bool(context_str)
+
+    # For now, return the retrieved context as the "answer" to prove RAG works
+    # Later we will pass this `context_str` + `query_text` to Ollama
+
+    # Simple cleanup of AEM noise
+    import re
+    context_str = re.sub(r'aem-GridColumn--[a-z0-9-]+', '', context_str)
+    context_str = re.sub(r'aem-GridColumn', '', context_str)
+
+    response_text = f"I found some relevant information in the AEM content:\n\n{context_str}"
+
+    if not has_results:
+        response_text = "I couldn't find any relevant information in the AEM content to answer your question."
+
+    return {
+        "role": "assistant",
+        "content": response_text
+    }
 
 @app.post("/api/v1/chat")
-async def chat_endpoint(payload: ChatPayload):
+async def chat_endpoint(payload: ChatPayload, request: Request):
+    where = resolve_scope_filter(payload.scope)
+    record_query(payload.message, payload.scope)
+    key = retrieval_key(payload.message, payload.scope)
+    # Cache hits skip admission, as in context_endpoint
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        packing_stats.record(cached)
+        return chat_response(cached)
+    async with admitted(request) as deadline:
+        try:
+            query_text = payload.message
+            logger.info(f"Received chat request: {query_text}")
+
+            version = index_version
+            packed = await chat_context(query_text, where, deadline)
+            cache_retrieval(key, packed, version)
+            packing_stats.record(packed)
+            return chat_response(packed)
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error in chat endpoint: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/generate")
+async def generate_endpoint(payload: GeneratePayload, request: Request):
+    """
+    Retrieval plus Ollama generation. Answers are served from the semantic
+    answer cache when a near-identical question retrieved the same sources;
+    otherwise Ollama generates them and they are cached. Retrieval runs under
+    admission control, generation does not hold an admission slot.
+    """
+    where = resolve_scope_filter(payload.scope)
+    record_query(payload.message, payload.scope)
+    model = payload.model or OLLAMA_MODEL
+    # Read before retrieval: a sync from here on may change the sources the answer is built from
+    version = index_version
+    async with admitted(request) as deadline:
+        try:
+            logger.info(f"Received generate request: {payload.message}")
+            collection = active_collection()
+            query_embedding = await deadline.run(
+                "embedding", compute_query_embedding, state.model, payload.message, load_projection(collection.name)
+            )
+            key = retrieval_key(payload.message, payload.scope, token_budget=payload.token_budget)
+            packed = retrieval_cache.get(key)
+            if packed is None:
+                packed = await search_context(collection, query_embedding, where, deadline, payload.token_budget)
+                cache_retrieval(key, packed, version)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error retrieving context for generation: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+    packing_stats.record(packed)
+
+    answer_key = (state.collection_name, model, sources_fingerprint(packed.sources))
+    cached = answer_cache.get(query_embedding, answer_key)
+    if cached is not None:
+        answer, similarity = cached
+        result = {"model": model, "response": answer, "done": True, "cached": True,
+                  "similarity": round(similarity, 4), "sources": packed.sources}
+        if payload.stream:
+            return StreamingResponse(iter([json.dumps(result) + "\n"]), media_type="application/x-ndjson")
+        return result
+
+    prompt = build_prompt(payload.message, packed.text)
+    sources = [s["source"] for s in packed.sources]
+
+    def cache_answer(answer: str):
+        # A sync during retrieval or generation may have changed the sources
+        if version == index_version:
+            answer_cache.put(query_embedding, answer_key, sources, answer)
+
+    if payload.stream:
+        async def messages():
+            parts = []
+            try:
+                async for message in stream_generate(state.http_client, prompt, model):
+                    parts.append(message.get("response", ""))
+                    if message.get("done"):
+                        cache_answer("".join(parts))
+                        message = {**message, "cached": False, "sources": packed.sources}
+                    yield json.dumps(message) + "\n"
+            except GenerationError as e:
+                logger.error(str(e))
+                yield json.dumps({"error": str(e), "done": True}) + "\n"
+        return StreamingResponse(messages(), media_type="application/x-ndjson")
+
+    start = time.perf_counter()
     try:
-        query_text = payload.message
-        logger.info(f"Received chat request: {query_text}")
-        
-        # 1. Generate embedding for the query
-        query_embedding = compute_query_embedding(state.model, query_text)
-        
-        # 2. Query ChromaDB
-        results = state.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=3,
-            include=["documents", "metadatas", "distances"]
-        )
-        
-        # 3. Format response
-        # unique_documents = set()
-        formatted_context = []
-        
-        if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                meta = results['metadatas'][0][i] if results['metadatas'] else {}
-                source = meta.get("source", "Unknown")
-                formatted_context.append(f"Source: {source}\nContent: {doc}")
-        
-        context_str = "\n\n".join(formatted_context)
+        with span("generation", model=model):
+            generated = await generate(state.http_client, prompt, model)
+    except GenerationError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=502, detail=str(e))
+    answer = generated.get("response", "")
+    cache_answer(answer)
+    return {"model": model, "response": answer, "done": True, "cached": False,
+            "generation_ms": round((time.perf_counter() - start) * 1000, 1), "sources": packed.sources}
+
+@app.post("/api/v1/context")
+async def context_endpoint(payload: ContextPayload, request: Request):
+    resolve_scope_filter(payload.scope)
+    record_query(payload.query, payload.scope)
+    # Cache hits skip admission: they cost no model or index time
+    cached = retrieval_cache.get(retrieval_key(payload.query, payload.scope, token_budget=payload.token_budget))
+    if cached is not None:
+        packing_stats.record(cached)
+        return cached.to_dict()
+    async with admitted(request) as deadline:
+        try:
+            query = payload.query
+            logger.info(f"Received context request for: {query}")
+
+            packed = await cached_context(query, payload.scope, deadline, payload.token_budget)
+            packing_stats.record(packed)
+
+            return packed.to_dict()
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error in context endpoint: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/context/batch")
+async def batch_context_endpoint(payload: BatchContextPayload, request: Request):
+    resolve_scope_filter(payload.scope)
+    if not payload.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(payload.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_QUERIES} queries per batch")
+    for query in payload.queries:
+        record_query(query, payload.scope)
+    async with admitted(request) as deadline:
+        try:
+            logger.info(f"Received batch context request for {len(payload.queries)} queries")
+
+            keys = [retrieval_key(query, payload.scope, token_budget=payload.token_budget) for query in payload.queries]
+            contexts = [retrieval_cache.get(key) for key in keys]
+            misses = [i for i, context in enumerate(contexts) if context is None]
+            if misses:
+                version = index_version
+                retrieved = await deadline.run(
+                    "context retrieval", retrieve_contexts, [payload.queries[i] for i in misses],
+                    scope=payload.scope, deadline=deadline, token_budget=payload.token_budget
+                )
+                for i, packed in zip(misses, retrieved):
+                    contexts[i] = packed
+                    cache_retrieval(keys[i], packed, version)
+            for packed in contexts:
+                packing_stats.record(packed)
+
+            return {
+                "contexts": [packed.text for packed in contexts],
+                "sources": [packed.sources for packed in contexts]
+            }
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error in batch context endpoint: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+def page_path_of(path: str) -> str:
+    """
+    Maps a component path (/content/site/page/jcr:content/root/text) to its page.
+    """
+    return path.split("/jcr:content", 1)[0]
+
+def delete_page(path: str, collections) -> int:
+    """
+    Removes every chunk of a page and its descendant pages from the given
+    write collections (blocking). Returns the number of chunks deleted from
+    the serving one.
+    """
+    where = subtree_filter(path)
+    deleted = []
+    for collection in collections:
+        deleted.append(delete_matching(collection, where))
+        source_index.discard_subtree(collection.name, path)
+    return deleted[0]
+
+def write_page(path: str, records: List[Dict[str, Any]], collections) -> Tuple[Dict[str, Any], bool]:
+    """
+    Writes a page's chunk records to the write collections (blocking): embeds
+    only chunk IDs not stored yet, updates the metadata of chunks that moved
+    and deletes the page's chunks it no longer produces. Returns the sync
+    result and whether the index changed.
+    """
+    # 1. Prepare data for ChromaDB
+    docs = []
+    ids = []
+    metadatas = []
+    
+    for record in records:
+        text = record.get("text", "")
+        if not text:
+            continue
+            
+        source = record.get("source", path)
+        chunk_id = record.get("chunk_id", 0)
         
-        # For now, return the retrieved context as the "answer" to prove RAG works
-        # Later we will pass this `context_str` + `query_text` to Ollama
+        # Reconstruct metadata as ingest.py does
+        meta = record.get("metadata", {}).copy()
+        meta.update(path_metadata(source))
+        meta["source"] = source
+        meta["chunk_id"] = chunk_id
         
-        # Simple cleanup of AEM noise
-        import re
-        context_str = re.sub(r'aem-GridColumn--[a-z0-9-]+', '', context_str)
-        context_str = re.sub(r'aem-GridColumn', '', context_str)
+        # ID construction: stable per component and text (see chunk_doc_id)
+        doc_id = chunk_doc_id(record)
         
-        response_text = f"I found some relevant information in the AEM content:\n\n{context_str}"
+        docs.append(text)
+        ids.append(doc_id)
+        metadatas.append(meta)
         
-        if not formatted_context:
-            response_text = "I couldn't find any relevant information in the AEM content to answer your question."
-
-        return {
-            "role": "assistant",
-            "content": response_text
-        }
+    # 2. Write only what changed. A chunk keeps its ID (and embedding) as
+    # long as its component's text is unchanged, so only new IDs are
+    # embedded; moved chunks get their metadata updated, and IDs no
+    # longer produced by the page are deleted.
+    stored = {}
+    for collection in collections:
+        found = profiled(collection.get)(where={"source": path}, include=["metadatas"])
+        stored[collection.name] = dict(zip(found["ids"], found.get("metadatas") or [None] * len(found["ids"])))
 
-    except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    new = [i for i, doc_id in enumerate(ids) if any(doc_id not in known for known in stored.values())]
+    embeddings = {}
+    if new:
+        with span("embed", chunks=len(new)):
+            embeddings = dict(zip(new, profiled(compute_embeddings)(state.model, [docs[i] for i in new])))
 
-@app.post("/api/v1/context")
-async def context_endpoint(payload: ContextPayload):
-    try:
-        query = payload.query
-        logger.info(f"Received context request for: {query}")
+    current_ids = set(ids)
+    changed = False
+    removed = 0
+    for collection in collections:
+        known = stored[collection.name]
+        missing = [i for i in new if ids[i] not in known]
+        moved = [i for i, doc_id in enumerate(ids) if doc_id in known and known[doc_id] != metadatas[i]]
+        # Chunks of edited components, or left over from a longer previous version of the page
+        stale_ids = [doc_id for doc_id in known if doc_id not in current_ids]
+        if missing:
+            with span("upsert", collection=collection.name, chunks=len(missing)):
+                profiled(collection.upsert)(
+                    ids=[ids[i] for i in missing],
+                    documents=[docs[i] for i in missing],
+                    embeddings=project(collection.name, [embeddings[i] for i in missing]),
+                    metadatas=[metadatas[i] for i in missing]
+                )
+        if moved:
+            profiled(collection.update)(ids=[ids[i] for i in moved], metadatas=[metadatas[i] for i in moved])
+        if stale_ids:
+            profiled(collection.delete)(ids=stale_ids)
+        source_index.update(collection.name, path, bool(ids))
+        if collection is collections[0]:
+            removed = len(stale_ids)
+        changed = changed or bool(missing or moved or stale_ids)
+    # Pages without content are never indexed; remembered so catch-up does not refetch them as added
+    source_index.set_empty(path, not ids)
+    logger.info(f"Embedded {len(new)} of {len(docs)} chunks, removed {removed} stale chunks")
         
-        context = get_relevant_context(query)
-        
-        return {
-            "context": context
-        }
-    except Exception as e:
-        logger.error(f"Error in context endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    result = {
+        "status": "success", 
+        "path": path, 
+        "chunks_processed": len(records),
+        "chunks_upserted": len(new),
+        "chunks_unchanged": len(docs) - len(new),
+        "chunks_removed": removed
+    }
+    if not records:
+        result["message"] = "no content extracted"
+    return result, changed
 
 @app.post("/api/v1/sync")
 async def sync_page(payload: WebhookPayload):
     path = payload.path
-    logger.info(f"Received sync request for path: {path}")
+    event = (payload.event or payload.type or "").upper()
+    logger.info(f"Received sync request for path: {path} (event: {event or 'n/a'})")
     
     if not path.startswith("/content"):
         logger.warning(f"Ignored path {path} (not content path)")
         return {"status": "ignored", "reason": "not content path"}
+
+    page_path = page_path_of(path)
+    if event in DELETE_EVENTS and page_path == path:
+        try:
+            deleted = await asyncio.to_thread(delete_page, path, write_collections())
+            index_changed(path, subtree=True)
+            logger.info(f"Deleted {deleted} chunks for {path} and descendants")
+            return {"status": "success", "path": path, "event": event, "chunks_deleted": deleted}
+        except Exception as e:
+            logger.error(f"Error deleting {path}: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    # Component-level changes (including removed components) re-sync the page
+    path = page_path
     
     try:
         # 1. Process page to get updated chunks
         # We reuse the process_page function from crawler.py
         # It requires an interactive client, we pass our persistent one
-        records = await process_page(state.http_client, path)
+        # A failed fetch must not look like an empty page, or the chunks stay
+        # stale while the caller (e.g. catch-up) counts the page as synced
+        records = await process_page(state.http_client, path, raise_errors=True)
         
-        if not records:
+        if records:
+            logger.info(f"Extracted {len(records)} chunks from {path}")
+        else:
+            # Still written below: a page edited down to no text loses its stored chunks
             logger.info(f"No content found for {path}")
-            return {"status": "success", "message": "no content extracted", "chunks_processed": 0}
-            
-        logger.info(f"Extracted {len(records)} chunks from {path}")
-        
-        # 2. Prepare data for ChromaDB
-        docs = []
-        ids = []
-        metadatas = []
-        
-        for record in records:
-            text = record.get("text", "")
-            if not text:
-                continue
-                
-            source = record.get("source", path)
-            chunk_id = record.get("chunk_id", 0)
-            
-            # Reconstruct metadata as ingest.py does
-            meta = record.get("metadata", {}).copy()
-            meta["source"] = source
-            meta["chunk_id"] = chunk_id
-            
-            # ID construction: source_chunk_id
-            doc_id = f"{source}_{chunk_id}"
-            
-            docs.append(text)
-            ids.append(doc_id)
-            metadatas.append(meta)
-            
-        # 3. Upsert to ChromaDB
-        if docs:
-            # We reuse the logic from verify/ingest, but we can call upsert directly
-            # since we have the objects loaded in memory
-            
-            # Use shared compute logic
-            embeddings = compute_embeddings(state.model, docs)
-            
-            state.collection.upsert(
-                ids=ids,
-                documents=docs,
-                embeddings=embeddings,
-                metadatas=metadatas
+
+        # 2. Chroma reads/writes and embedding block, so they run in a worker
+        # thread; queries keep being served while catch-up or prewarm sync pages
+        result, changed = await asyncio.to_thread(write_page, path, records, write_collections())
+        if changed:
+            index_changed(path)
+        return result
+
+    except FetchError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error syncing {path}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/reconcile")
+async def reconcile_endpoint(dry_run: bool = False):
+    try:
+        results = [await reconcile(state.http_client, collection, dry_run=dry_run) for collection in write_collections()]
+        if any(result.get("deleted_sources") for result in results):
+            index_changed()
+        return results[0]
+    except Exception as e:
+        logger.error(f"Error in reconcile endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def catch_up(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Syncs the pages modified, replicated or added under CATCH_UP_ROOT since
+    the high-water mark, deletes indexed pages that are gone, then moves the
+    mark forward. The mark stays put if a page fails, so the next run retries it.
+    """
+    async with catch_up_lock:
+        start = time.perf_counter()
+        since = read_mark(CATCH_UP_ROOT)
+        collection = active_collection()
+        indexed = await asyncio.to_thread(source_index.sources, collection)
+        plan = await plan_catch_up(state.http_client, collection, CATCH_UP_ROOT, since,
+                                   indexed=indexed, empty=source_index.empty())
+        pages = plan["modified"] + plan["added"]
+        result = {
+            "status": "dry_run" if dry_run else "success",
+            "since": since.isoformat() if since else None,
+            "mark": plan["mark"].isoformat() if plan["mark"] else None,
+            "modified": len(plan["modified"]),
+            "added": len(plan["added"]),
+            "deleted": len(plan["deleted"]),
+            "sample": (pages + plan["deleted"])[:10]
+        }
+        if dry_run:
+            return result
+
+        # Blocking work runs in worker threads (see sync_page), so the event
+        # loop serves queries between and during pages
+        for path in plan["deleted"]:
+            for collection in write_collections():
+                await asyncio.to_thread(delete_matching, collection, {"source": path})
+                source_index.update(collection.name, path, False)
+            index_changed(path)
+        failed = []
+        upserted = 0
+        for path in pages:
+            try:
+                upserted += (await sync_page(WebhookPayload(path=path))).get("chunks_upserted", 0)
+            except HTTPException:
+                failed.append(path)
+        if failed:
+            result["status"] = "partial"
+        elif plan["mark"]:
+            save_mark(CATCH_UP_ROOT, plan["mark"])
+        result.update(chunks_upserted=upserted, failed=failed[:10], seconds=round(time.perf_counter() - start, 3))
+        logger.info(f"Catch-up synced {len(pages) - len(failed)} pages ({upserted} chunks embedded), "
+                    f"deleted {len(plan['deleted'])}, {len(failed)} failed in {result['seconds']}s")
+        return result
+
+@app.post("/api/v1/catch-up")
+async def catch_up_endpoint(dry_run: bool = False):
+    try:
+        return await catch_up(dry_run)
+    except Exception as e:
+        logger.error(f"Error in catch-up endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/prewarm")
+async def prewarm(payload: PrewarmPayload):
+    """
+    Warms the service for the traffic it is about to get: loads the model,
+    touches the index for the hottest pages (optionally indexing missing
+    ones, most requested first) and fills the retrieval cache for the most
+    frequent queries, unscoped and within the hottest sections.
+    A page that fails to sync or a query that fails or runs out of time is
+    logged and counted, and the rest are still warmed.
+    """
+    ranking = read_ranking() if payload.pages is None or payload.sections is None else {}
+    pages = payload.pages if payload.pages is not None else [e["path"] for e in ranking.get("pages", [])]
+    sections = payload.sections if payload.sections is not None else [e["path"] for e in ranking.get("sections", [])]
+    pages = pages[:PREWARM_MAX_PAGES]
+    try:
+        # 1. Model: the first encode pays for lazy initialisation
+        await asyncio.to_thread(compute_query_embedding, state.model, "warmup")
+
+        # 2. Index: fetch the hot pages' chunks, which also finds unindexed ones
+        indexed = set()
+        collection = active_collection()
+        for i in range(0, len(pages), 100):
+            found = await asyncio.to_thread(
+                collection.get, where={"source": {"$in": pages[i:i + 100]}}, include=["metadatas"]
             )
-            logger.info(f"Upserted {len(docs)} chunks to ChromaDB")
-            
+            indexed.update((meta or {}).get("source") for meta in found["metadatas"] or [])
+        missing = [page for page in pages if page not in indexed]
+        synced, failed = [], []
+        if payload.sync_missing:
+            for page in missing:
+                try:
+                    result = await sync_page(WebhookPayload(path=page))
+                except HTTPException as e:
+                    logger.warning(f"Prewarm could not sync {page}: {e.detail}")
+                    failed.append(page)
+                    continue
+                if result.get("chunks_upserted"):
+                    synced.append(page)
+
+        # 3. Retrieval cache: hot queries, unscoped and per hot section
+        if payload.queries is not None:
+            scopes = [None] + sections
+            pairs = [(query, scope) for query in payload.queries for scope in scopes]
+        else:
+            pairs = top_queries(PREWARM_MAX_QUERIES)
+        warmed = queries_failed = 0
+        for query, scope in pairs[:PREWARM_MAX_QUERIES]:
+            try:
+                scope_filter(scope)
+            except ValueError:
+                continue
+            try:
+                await cached_context(query, scope, Deadline(QUERY_DEADLINE_MS / 1000))
+            except Exception as e:
+                # DeadlineExceeded included: a slow query must not stop the warm-up
+                logger.warning(f"Prewarm could not warm query {query!r} (scope {scope}): {e!r}")
+                queries_failed += 1
+                continue
+            warmed += 1
+
+        logger.info(f"Prewarmed {len(pages)} pages ({len(missing)} missing, {len(synced)} synced, "
+                    f"{len(failed)} failed), {warmed} queries ({queries_failed} failed)")
         return {
-            "status": "success", 
-            "path": path, 
-            "chunks_processed": len(records),
-            "chunks_upserted": len(docs)
+            "status": "success",
+            "pages": {"requested": len(pages), "indexed": len(pages) - len(missing), "missing": missing[:20],
+                      "synced": len(synced), "failed": len(failed)},
+            "sections": len(sections),
+            "queries_warmed": warmed,
+            "queries_failed": queries_failed,
         }
-
     except Exception as e:
-        logger.error(f"Error syncing {path}: {e}", exc_info=True)
+        logger.error(f"Error in prewarm endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/v1/metrics")
+async def metrics():
+    return {
+        "admission": admission.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "context_packing": packing_stats.stats(),
+        "answer_cache": answer_cache.stats()
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
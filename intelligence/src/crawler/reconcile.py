@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+import chromadb
+import httpx
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.crawler.crawler import search_pages
+from src.vector_store.collection import get_or_create_collection, resolve_alias
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Configuration
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
+RECONCILE_ROOT = os.getenv("RECONCILE_ROOT", "/content")
+PAGE_SIZE = 1000
+DELETE_BATCH_SIZE = 100
+
+def list_indexed_sources(collection, page_size: int = PAGE_SIZE) -> Set[str]:
+    """
+    Returns the distinct `source` paths stored in a collection, paging
+    through metadata only.
+    """
+    sources = set()
+    offset = 0
+    previous = None
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+        ids = list(page["ids"])
+        # An empty page ends the listing, as does one that does not advance (the
+        # same rows again, from a backend ignoring the offset), so it cannot spin
+        if not ids or ids == previous:
+            break
+        for meta in page["metadatas"]:
+            if meta and meta.get("source"):
+                sources.add(meta["source"])
+        offset += len(ids)
+        previous = ids
+    return sources
+
+class SourceIndex:
+    """
+    The distinct sources of each collection, listed once with
+    list_indexed_sources and then kept up to date by the writers that sync
+    and delete pages, so catch-up does not page through the whole collection
+    on every run. Also remembers the pages that synced without content, which
+    are never indexed, so catch-up does not fetch them again as added pages.
+    Thread-safe, as pages are written from worker threads.
+    A write racing with the first listing may be missed; at worst catch-up
+    then re-syncs an unchanged page or re-deletes a deleted one.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Set[str]] = {}
+        self._empty: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def sources(self, collection) -> Set[str]:
+        """
+        A copy of the collection's sources, listing them on first use (blocking).
+        """
+        with self._lock:
+            known = self._sources.get(collection.name)
+            if known is not None:
+                return set(known)
+        listed = list_indexed_sources(collection)
+        with self._lock:
+            return set(self._sources.setdefault(collection.name, listed))
+
+    def empty(self) -> Set[str]:
+        """
+        A copy of the pages last synced without content.
+        """
+        with self._lock:
+            return set(self._empty)
+
+    def set_empty(self, source: str, empty: bool):
+        """
+        Records whether `source` last synced without content.
+        """
+        with self._lock:
+            if empty:
+                self._empty.add(source)
+            else:
+                self._empty.discard(source)
+
+    def update(self, name: str, source: str, present: bool):
+        """
+        Records whether `source` has chunks in collection `name` after a write.
+        """
+        with self._lock:
+            known = self._sources.get(name)
+            if known is None:
+                return
+            if present:
+                known.add(source)
+            else:
+                known.discard(source)
+
+    def discard_subtree(self, name: str, path: str):
+        """
+        Forgets `path` and every source below it in collection `name`.
+        """
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            self._empty.difference_update([s for s in self._empty if s == path or s.startswith(prefix)])
+            known = self._sources.get(name)
+            if known is not None:
+                known.difference_update([s for s in known if s == path or s.startswith(prefix)])
+
+    def invalidate(self, name: Optional[str] = None):
+        """
+        Drops what is known about collection `name` (or all collections), e.g.
+        after a bulk change; it is listed again on next use. Empty pages are
+        kept, as they are a property of the pages, not of a collection.
+        """
+        with self._lock:
+            if name is None:
+                self._sources.clear()
+            else:
+                self._sources.pop(name, None)
+
+def orphaned_sources(indexed: Set[str], live_pages: Set[str], root: str = RECONCILE_ROOT) -> List[str]:
+    """
+    Indexed sources under `root` that are not among the live pages, sorted.
+    """
+    return sorted(
+        s for s in indexed
+        if (s == root or s.startswith(root.rstrip("/") + "/")) and s not in live_pages
+    )
+
+async def reconcile(client: httpx.AsyncClient, collection, root: str = RECONCILE_ROOT,
+                    batch_size: int = DELETE_BATCH_SIZE, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Compares indexed sources against the pages Query Builder lists under
+    `root` and purges chunks of sources that no longer exist, in batches.
+    Collection reads and deletes run in worker threads, off the event loop.
+    """
+    live_pages = set(await search_pages(client, root))
+    if not live_pages:
+        # An empty listing is far more likely an AEM/query error than an empty site
+        logger.warning(f"Query Builder returned no pages under {root}; skipping reconciliation")
+        return {"status": "skipped", "reason": "no live pages listed", "orphans": 0, "deleted_sources": 0}
+
+    indexed = await asyncio.to_thread(list_indexed_sources, collection)
+    orphans = orphaned_sources(indexed, live_pages, root)
+    logger.info(f"Reconcile {collection.name}: {len(indexed)} indexed sources, {len(live_pages)} live pages, {len(orphans)} orphans")
+
+    if not dry_run:
+        for i in range(0, len(orphans), batch_size):
+            batch = orphans[i:i + batch_size]
+            await asyncio.to_thread(collection.delete, where={"source": {"$in": batch}})
+            logger.info(f"Purged {len(batch)} orphaned sources")
+
+    return {
+        "status": "dry_run" if dry_run else "success",
+        "indexed_sources": len(indexed),
+        "live_pages": len(live_pages),
+        "orphans": len(orphans),
+        "deleted_sources": 0 if dry_run else len(orphans),
+        "sample": orphans[:10]
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Purge index chunks of pages that no longer exist in AEM")
+    parser.add_argument("--root", default=RECONCILE_ROOT, help="Content root to reconcile")
+    parser.add_argument("--dry-run", action="store_true", help="Only report orphans")
+    parser.add_argument("--interval", type=int, default=0, help="Repeat every N seconds (0 = run once)")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+    async with httpx.AsyncClient() as http_client:
+        while True:
+            collection = get_or_create_collection(client, resolve_alias(COLLECTION_NAME))
+            result = await reconcile(http_client, collection, args.root, dry_run=args.dry_run)
+            print(f"Reconciliation {result['status']}: {result['orphans']} orphaned sources")
+            for source in result.get("sample", []):
+                print(f"  {source}")
+            if args.interval <= 0:
+                break
+            await asyncio.sleep(args.interval)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional, Set
+
+from src.utils.profiling import profiled, span
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because the wait queue is full."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline expires or can no longer be met."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Absolute per-request deadline that is checked and propagated through each
+    processing stage (admission, embedding, vector search).
+    """
+
+    def __init__(self, timeout_s: float):
+        self.timeout_s = timeout_s
+        self.expires_at = time.monotonic() + timeout_s
+        self._workers: Set[asyncio.Future] = set()
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self, stage: str):
+        """
+        Raises DeadlineExceeded if the deadline has passed before `stage` starts.
+        """
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(stage)
+
+    async def run(self, stage: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Runs a blocking call in a worker thread, giving up once the deadline
+        passes. The thread itself cannot be interrupted and finishes in the
+        background, but the request is answered without waiting for it; it
+        stays in in_flight() until it does.
+        """
+        self.check(stage)
+        worker = asyncio.ensure_future(asyncio.to_thread(profiled(functools.partial(func, *args, **kwargs))))
+        self._workers.add(worker)
+        worker.add_done_callback(self._worker_done)
+        try:
+            with span(stage):
+                return await asyncio.wait_for(asyncio.shield(worker), timeout=self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage)
+
+    def _worker_done(self, worker: asyncio.Future):
+        self._workers.discard(worker)
+        if not worker.cancelled():
+            # Retrieved here, as an abandoned worker's error has no caller to reach
+            worker.exception()
+
+    def in_flight(self) -> Set[asyncio.Future]:
+        """
+        Worker threads started by run() that have not finished yet.
+        """
+        return set(self._workers)
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue. Requests beyond the queue
+    bound are shed immediately; queued requests are shed as soon as their
+    deadline cannot cover the typical service time. A request's slot is held
+    until the worker threads it abandoned at its deadline finish, so the limit
+    bounds the work actually running, not just the requests being answered.
+    """
+
+    # Weight of the newest sample in the service-time moving average
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.completed = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        self.deadline_exceeded = 0
+        self.lingering = 0
+        self.service_time_s = 0.0
+
+    def _can_meet(self, deadline: Deadline) -> bool:
+        return deadline.remaining() > self.service_time_s
+
+    @asynccontextmanager
+    async def admit(self, deadline: Deadline):
+        """
+        Waits for a free slot within the request's deadline.
+        Raises Overloaded or DeadlineExceeded if the request is shed.
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.shed_queue_full += 1
+            raise Overloaded("too many queued requests")
+        if not self._can_meet(deadline):
+            self.shed_deadline += 1
+            raise DeadlineExceeded("admission")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            self.shed_deadline += 1
+            raise DeadlineExceeded("admission")
+        finally:
+            self.waiting -= 1
+
+        if not self._can_meet(deadline):
+            self._semaphore.release()
+            self.shed_deadline += 1
+            raise DeadlineExceeded("admission")
+
+        self.active += 1
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        except DeadlineExceeded:
+            self.deadline_exceeded += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.service_time_s += self.EWMA_ALPHA * (elapsed - self.service_time_s)
+            self.active -= 1
+            self.completed += 1
+            self._release_after(deadline.in_flight())
+
+    def _release_after(self, workers: Set[asyncio.Future]):
+        """
+        Frees a slot once `workers` are done (right away if there are none).
+        """
+        if not workers:
+            self._semaphore.release()
+            return
+        self.lingering += 1
+        remaining = set(workers)
+
+        def done(worker):
+            remaining.discard(worker)
+            if not remaining:
+                self.lingering -= 1
+                self._semaphore.release()
+
+        for worker in workers:
+            worker.add_done_callback(done)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_deadline": self.shed_deadline,
+            "deadline_exceeded": self.deadline_exceeded,
+            "lingering": self.lingering,
+            "service_time_ms": round(self.service_time_s * 1000, 2),
+        }
+
+
+def parse_timeout_ms(value: Optional[str], default_ms: int) -> float:
+    """
+    Converts a client-supplied timeout header (milliseconds) into seconds,
+    clamped to the server default. Invalid values fall back to the default.
+    """
+    try:
+        timeout_ms = int(value) if value is not None else default_ms
+    except ValueError:
+        timeout_ms = default_ms
+    return max(1, min(timeout_ms, default_ms)) / 1000.0
@@ -0,0 +1,176 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after `ttl_seconds`.
+    A max_entries of 0 disables caching. Not thread-safe; callers on the
+    event loop need no locking.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the cached value, or None on a miss or expired entry.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (self.clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops every entry, e.g. after the underlying index changed.
+        """
+        self._entries.clear()
+        self.invalidations += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class SemanticCache:
+    """
+    Bounded LRU cache of values keyed by an embedding and an exact key (e.g.
+    a hash of the sources an answer was generated from). A lookup hits the
+    most similar entry with the same exact key whose cosine similarity is at
+    least `threshold`. Entries expire after `ttl_seconds` and can be dropped
+    by the sources (page paths) they depend on. A max_entries of 0 disables
+    caching. Not thread-safe; callers on the event loop need no locking.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.clock = clock
+        # entry id -> (expires, key, unit embedding, sources, value)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._by_key: Dict[Hashable, List[int]] = {}
+        self._by_source: Dict[str, set] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, embedding, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Returns (value, similarity) of the best match, or None on a miss.
+        """
+        now = self.clock()
+        for entry_id in [i for i in self._by_key.get(key, []) if self._entries[i][0] <= now]:
+            self._remove(entry_id)
+        candidates = self._by_key.get(key, [])
+        if candidates:
+            similarities = np.stack([self._entries[i][2] for i in candidates]) @ self._unit(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                entry_id = candidates[best]
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return self._entries[entry_id][4], float(similarities[best])
+        self.misses += 1
+        return None
+
+    def put(self, embedding, key: Hashable, sources: Iterable[str], value: Any):
+        if self.max_entries <= 0:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        sources = frozenset(sources)
+        self._entries[entry_id] = (self.clock() + self.ttl_seconds, key, self._unit(embedding), sources, value)
+        self._by_key.setdefault(key, []).append(entry_id)
+        for source in sources:
+            self._by_source.setdefault(source, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, path: str, subtree: bool = False) -> int:
+        """
+        Drops the entries that depend on a page (and, with subtree, on any
+        page below it). Returns the number of entries dropped.
+        """
+        prefix = path.rstrip("/") + "/"
+        sources = [s for s in self._by_source if s == path or (subtree and s.startswith(prefix))]
+        entry_ids = {i for source in sources for i in self._by_source[source]}
+        for entry_id in entry_ids:
+            self._remove(entry_id)
+        self.invalidated += len(entry_ids)
+        return len(entry_ids)
+
+    def clear(self):
+        self.invalidated += len(self._entries)
+        self._entries.clear()
+        self._by_key.clear()
+        self._by_source.clear()
+
+    def _remove(self, entry_id: int):
+        _, key, _, sources, _ = self._entries.pop(entry_id)
+        ids = self._by_key[key]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_key[key]
+        for source in sources:
+            ids = self._by_source[source]
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_source[source]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidated": self.invalidated,
+        }
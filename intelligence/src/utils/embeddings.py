@@ -1,5 +1,7 @@
+import json
 import os
 import sys
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
@@ -7,10 +9,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Configuration
-EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "local") # local | openai
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "local") # local | openai | onnx
 LOCAL_MODEL_NAME = "all-MiniLM-L12-v2"
 OPENAI_MODEL_NAME = "text-embeddings-ada-002"
 
+# ONNX export of the local model (src/utils/onnx_export.py); the file defaults
+# to the int8-quantized model when the directory has one
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", f"./models/{LOCAL_MODEL_NAME}-onnx")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", 0))  # 0 = ONNX Runtime default
+ONNX_FILES = ("model_int8.onnx", "model.onnx")
+ONNX_CONFIG_FILE = "embedding_config.json"
+
 _MODEL_CACHE = None
 
 def get_embedding_model():
@@ -28,12 +38,87 @@ def get_embedding_model():
             sys.exit(1)
         print(f"Using OpenAI Embeddings ({OPENAI_MODEL_NAME})")
         _MODEL_CACHE = OpenAIEmbeddings(model=OPENAI_MODEL_NAME, openai_api_key=api_key)
+    elif EMBEDDING_PROVIDER == "onnx":
+        _MODEL_CACHE = OnnxEmbeddingModel(ONNX_MODEL_DIR, ONNX_MODEL_FILE or None, ONNX_THREADS)
+        print(f"Using ONNX Embeddings ({_MODEL_CACHE.model_path})")
     else:
         print(f"Using Local Embeddings ({LOCAL_MODEL_NAME})")
         _MODEL_CACHE = SentenceTransformer(LOCAL_MODEL_NAME)
     
     return _MODEL_CACHE
 
+class OnnxEmbeddingModel:
+    """
+    Sentence-transformer inference on ONNX Runtime (CPU): tokenizer.json,
+    the exported transformer and the pooling/normalisation settings of the
+    original model, all read from a local directory written by onnx_export.py.
+    encode() matches SentenceTransformer.encode for the providers above.
+    """
+
+    def __init__(self, model_dir: str, model_file: str = None, threads: int = 0, batch_size: int = 32):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_PROVIDER=onnx requires onnxruntime and tokenizers") from e
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        if model_file is None:
+            model_file = next((name for name in ONNX_FILES if os.path.exists(os.path.join(model_dir, name))), ONNX_FILES[-1])
+        self.model_path = os.path.join(model_dir, model_file)
+        self.batch_size = batch_size
+        self.pooling = self.config.get("pooling", "mean")
+        self.normalize = self.config.get("normalize", True)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config.get("max_length", 128))
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_token_id", 0))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts, batch_size: int = None) -> np.ndarray:
+        """
+        Embeds texts as a (len(texts), dim) float32 array. Texts are batched
+        by length, so each batch is padded only to its own longest text.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or self.batch_size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            for i, vector in zip(indices, self._encode_batch([texts[i] for i in indices])):
+                embeddings[i] = vector
+        if not embeddings:
+            return np.zeros((0, self.config.get("dimension", 0)), dtype=np.float32)
+        return np.stack(embeddings)
+
+    def _encode_batch(self, texts) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: features[name] for name in self.input_names})[0]
+        mask = features["attention_mask"][:, :, None].astype(np.float32)
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        elif self.pooling == "max":
+            pooled = np.where(mask > 0, hidden, -1e9).max(axis=1)
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
 def compute_embeddings(model, texts):
     """
     Computes embeddings for a list of texts using the provided model.
@@ -44,11 +129,16 @@ def compute_embeddings(model, texts):
     else:
         return model.encode(texts).tolist()
 
-def compute_query_embedding(model, text):
+def compute_query_embedding(model, text, projection=None):
     """
-    Computes embedding for a single query string.
+    Computes embedding for a single query string. Collections that store
+    reduced-dimension vectors pass their projection, which is applied to
+    the query the same way it was applied to the documents.
     """
     if EMBEDDING_PROVIDER == "openai":
-        return model.embed_query(text)
+        embedding = model.embed_query(text)
     else:
-        return model.encode([text]).tolist()[0]
+        embedding = model.encode([text]).tolist()[0]
+    if projection is not None:
+        embedding = projection.apply(embedding).tolist()
+    return embedding
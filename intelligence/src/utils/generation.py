@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Ollama server and default generation model (as configured for OllamaServlet)
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1")
+GENERATION_TIMEOUT_SECONDS = float(os.getenv("GENERATION_TIMEOUT_SECONDS", 300))
+
+# Same RAG prompt as OllamaServlet
+PROMPT_TEMPLATE = (
+    "You are an AEM Expert. Use the following context from the WKND site to answer the question concisely. "
+    "If the answer isn't in the context, say you don't know.\n\n Context: {context} \n\n Question: {question}"
+)
+
+
+class GenerationError(Exception):
+    """
+    Raised when Ollama is unreachable or fails a generation.
+    """
+
+
+def build_prompt(question: str, context: str) -> str:
+    """
+    The RAG prompt for a question, or the bare question without context.
+    """
+    return PROMPT_TEMPLATE.format(context=context, question=question) if context else question
+
+
+def sources_fingerprint(sources: List[Dict[str, Any]]) -> str:
+    """
+    Hash of the pages and chunks a context was packed from, in order.
+    """
+    key = [[s.get("source"), s.get("chunks"), s.get("truncated", False)] for s in sources]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:16]
+
+
+async def generate(client: httpx.AsyncClient, prompt: str, model: str = OLLAMA_MODEL,
+                   url: Optional[str] = None, timeout: float = GENERATION_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Runs a non-streaming Ollama generation. Returns Ollama's response body
+    ("response" holds the answer).
+    """
+    try:
+        response = await client.post(
+            f"{(url or OLLAMA_API_URL).rstrip('/')}/api/generate",
+            json={"model": model, "prompt": prompt, "stream": False},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        raise GenerationError(f"Ollama generation failed: {e}") from e
+
+
+async def stream_generate(client: httpx.AsyncClient, prompt: str, model: str = OLLAMA_MODEL,
+                          url: Optional[str] = None,
+                          timeout: Optional[float] = GENERATION_TIMEOUT_SECONDS) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs a streaming Ollama generation, yielding its NDJSON messages as
+    they arrive (the last one has "done": true).
+    """
+    try:
+        async with client.stream(
+            "POST",
+            f"{(url or OLLAMA_API_URL).rstrip('/')}/api/generate",
+            json={"model": model, "prompt": prompt, "stream": True},
+            timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+    except (httpx.HTTPError, ValueError) as e:
+        raise GenerationError(f"Ollama generation failed: {e}") from e
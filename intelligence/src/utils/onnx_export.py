@@ -0,0 +1,124 @@
+"""
+Exports the local sentence-transformer to ONNX for EMBEDDING_PROVIDER=onnx.
+
+Writes model.onnx (fp32), optionally model_int8.onnx (dynamic int8
+quantization of the weights), tokenizer.json and embedding_config.json
+(sequence length, pooling, normalisation) to the output directory.
+
+Usage:
+    python src/utils/onnx_export.py --output ./models/all-MiniLM-L12-v2-onnx
+    python src/utils/onnx_export.py --model /path/to/local/model --output ./models/custom-onnx --no-quantize
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.utils.embeddings import LOCAL_MODEL_NAME, ONNX_CONFIG_FILE, ONNX_MODEL_DIR
+
+ONNX_OPSET = 17
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def pooling_settings(model):
+    """
+    Pooling mode and normalisation of a SentenceTransformer pipeline.
+    """
+    pooling, normalize = "mean", False
+    for module in model:
+        kind = type(module).__name__
+        if kind == "Pooling":
+            # pooling_mode in sentence-transformers >= 6, get_pooling_mode_str() before
+            mode = getattr(module, "pooling_mode", None) or module.get_pooling_mode_str()
+            if mode not in ("mean", "cls", "max"):
+                raise ValueError(f"Unsupported pooling mode '{mode}'")
+            pooling = mode
+        elif kind == "Normalize":
+            normalize = True
+    return pooling, normalize
+
+
+def export_model(model_name: str, output_dir: str, quantize: bool = True, opset: int = ONNX_OPSET):
+    """
+    Exports the transformer of `model_name` with dynamic batch and sequence
+    axes. Returns the paths of the written model files.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    tokenizer = transformer.tokenizer
+    os.makedirs(output_dir, exist_ok=True)
+
+    sample = tokenizer(["An exported sentence", "Another, slightly longer exported sentence"],
+                       padding=True, return_tensors="pt")
+    input_names = [name for name in INPUT_NAMES if name in sample]
+
+    class Encoder(torch.nn.Module):
+        # Positional inputs in, last hidden state out
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    model_path = os.path.join(output_dir, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(transformer.auto_model.eval()),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+            external_data=False,
+        )
+    paths = [model_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, "model_int8.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        paths.append(quantized_path)
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+    pooling, normalize = pooling_settings(model)
+    config = {
+        "source_model": model_name,
+        "dimension": model.get_embedding_dimension() if hasattr(model, "get_embedding_dimension")
+        else model.get_sentence_embedding_dimension(),
+        "max_length": model.max_seq_length,
+        "pad_token_id": tokenizer.pad_token_id or 0,
+        "pooling": pooling,
+        "normalize": normalize,
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return paths
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export the local embedding model to ONNX")
+    parser.add_argument("--model", default=LOCAL_MODEL_NAME, help="SentenceTransformer name or local path")
+    parser.add_argument("--output", default=ONNX_MODEL_DIR, help="Output directory (ONNX_MODEL_DIR)")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8-quantized model")
+    parser.add_argument("--opset", type=int, default=ONNX_OPSET)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for path in export_model(args.model, args.output, quantize=not args.no_quantize, opset=args.opset):
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
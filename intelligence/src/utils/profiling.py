@@ -0,0 +1,224 @@
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Where .prof files are written (load with pstats, snakeviz, ...)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+# Comma-separated request path prefixes to profile ("/" profiles every request)
+PROFILE_PATHS = [p.strip() for p in os.getenv("PROFILE_PATHS", "").split(",") if p.strip()]
+# Keep only profiles of requests at least this slow; on its own, selects every path
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", 0))
+# Fraction of selected requests actually profiled
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 1.0))
+# Profile ingest batches and crawl runs
+PROFILE_BATCHES = os.getenv("PROFILE_BATCHES", "false").lower() == "true"
+# Log the duration of each span with its correlation ID
+TRACE_SPANS = os.getenv("TRACE_SPANS", "false").lower() == "true"
+
+CORRELATION_HEADER = "X-Request-ID"
+
+_correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+_active_profile: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+# Set while a profiler runs on this thread; one profiler per thread at a time
+_thread_state = threading.local()
+_NOOP = nullcontext()
+
+
+def configure(profile_dir: Optional[str] = None, batches: Optional[bool] = None, trace_spans: Optional[bool] = None):
+    """
+    Overrides the environment settings, e.g. from command-line flags.
+    """
+    global PROFILE_DIR, PROFILE_BATCHES, TRACE_SPANS
+    if profile_dir is not None:
+        PROFILE_DIR = profile_dir
+    if batches is not None:
+        PROFILE_BATCHES = batches
+    if trace_spans is not None:
+        TRACE_SPANS = trace_spans
+
+
+def requests_enabled() -> bool:
+    """
+    True if any request is traced or profiled, i.e. the middleware is needed.
+    """
+    return bool(PROFILE_PATHS or PROFILE_THRESHOLD_MS > 0 or TRACE_SPANS)
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def correlation_id() -> Optional[str]:
+    return _correlation_id.get()
+
+
+def _format_fields(fields) -> str:
+    return "".join(f" {key}={value}" for key, value in fields.items())
+
+
+@contextmanager
+def _timed_span(name: str, fields):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"span {name} {elapsed_ms:.1f}ms cid={_correlation_id.get() or '-'}{_format_fields(fields)}")
+
+
+def span(name: str, **fields):
+    """
+    Context manager logging how long its body took, tagged with the current
+    correlation ID. A shared no-op when TRACE_SPANS is off.
+    """
+    if not TRACE_SPANS:
+        return _NOOP
+    return _timed_span(name, fields)
+
+
+class Profile:
+    """
+    cProfile capture of one request or batch. Calls run through `run` are
+    profiled on whichever thread executes them and merged into one file.
+    """
+
+    def __init__(self, label: str, cid: str):
+        self.label = label
+        self.cid = cid
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        if getattr(_thread_state, "profiling", False):
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler owns this thread
+            return func(*args, **kwargs)
+        _thread_state.profiling = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _thread_state.profiling = False
+            with self._lock:
+                self.profilers.append(profiler)
+
+    def dump(self, elapsed_ms: float) -> Optional[str]:
+        """
+        Writes the merged profile to PROFILE_DIR. Returns the file path, or
+        None if nothing was captured.
+        """
+        with self._lock:
+            profilers = list(self.profilers)
+        if not profilers:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        label = re.sub(r"[^A-Za-z0-9]+", "_", self.label).strip("_") or "root"
+        cid = re.sub(r"[^A-Za-z0-9-]+", "_", self.cid)[:64]
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{label}-{cid}-{elapsed_ms:.0f}ms.prof")
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        logger.info(f"profile {self.label} {elapsed_ms:.1f}ms cid={self.cid} written to {path}")
+        return path
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Returns `func` wrapped to run under the active request or batch profile,
+    or `func` itself when nothing is being profiled.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        return func
+    return lambda *args, **kwargs: profile.run(func, *args, **kwargs)
+
+
+def _select_request(path: str) -> bool:
+    if PROFILE_PATHS:
+        selected = any(path.startswith(prefix) for prefix in PROFILE_PATHS)
+    else:
+        selected = PROFILE_THRESHOLD_MS > 0
+    return selected and (PROFILE_SAMPLE_RATE >= 1 or random.random() < PROFILE_SAMPLE_RATE)
+
+
+@contextmanager
+def batch(label: str, **fields):
+    """
+    Correlation ID and span for a unit of batch work (an ingest batch, a
+    crawl run); with PROFILE_BATCHES, the body is profiled on this thread.
+    """
+    cid_token = _correlation_id.set(f"{label}-{new_correlation_id()}")
+    profile = Profile(label, _correlation_id.get()) if PROFILE_BATCHES else None
+    profile_token = _active_profile.set(profile)
+    profiler = None
+    if profile and not getattr(_thread_state, "profiling", False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        _thread_state.profiling = True
+    start = time.perf_counter()
+    try:
+        with span(label, **fields):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+            _thread_state.profiling = False
+            profile.profilers.append(profiler)
+            profile.dump((time.perf_counter() - start) * 1000)
+        _active_profile.reset(profile_token)
+        _correlation_id.reset(cid_token)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware giving every HTTP request a correlation ID (taken from
+    or echoed in X-Request-ID), a request span, and for selected paths a
+    profile that is kept if the request took at least PROFILE_THRESHOLD_MS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        header = CORRELATION_HEADER.lower().encode("latin-1")
+        cid = next((value.decode("latin-1") for key, value in scope.get("headers", []) if key == header), None)
+        cid = cid or new_correlation_id()
+        path = scope.get("path", "")
+        profile = Profile(f"{scope.get('method', '')} {path}", cid) if _select_request(path) else None
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(header, cid.encode("latin-1"))]
+            await send(message)
+
+        cid_token = _correlation_id.set(cid)
+        profile_token = _active_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with span("request", method=scope.get("method"), path=path):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _active_profile.reset(profile_token)
+            _correlation_id.reset(cid_token)
+            if profile and elapsed_ms >= PROFILE_THRESHOLD_MS:
+                profile.dump(elapsed_ms)
@@ -0,0 +1,90 @@
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# Metadata key prefix for ancestor paths: a chunk of /content/wknd/us/en
+# carries path_1=/content, path_2=/content/wknd, path_3=/content/wknd/us, ...
+ANCESTOR_KEY_PREFIX = "path_"
+
+# Top-level folders under /content that hold per-site subtrees rather than sites
+SITE_CONTAINERS = {"experience-fragments", "dam", "cq:tags", "forms"}
+
+# Locale segments such as "en", "us", "fr_ca", "de-CH" or "language-masters"
+LOCALE_SEGMENT = re.compile(r"^(?:[a-z]{2}(?:[-_][a-zA-Z]{2})?|language-masters)$")
+
+# Segments of the locale run below the site root, ending in the language root:
+# 2 for /content/<site>/<country>/<language> (or language-masters/<language>),
+# 1 for sites organised as /content/<site>/<language>
+LOCALE_DEPTH = int(os.getenv("SCOPE_LOCALE_DEPTH", 2))
+
+
+def normalize_scope(scope: str) -> str:
+    """
+    Normalizes a scope path (strips trailing slashes and the .html extension).
+    Raises ValueError if the scope is not under /content.
+    """
+    normalized = scope.strip().rstrip("/")
+    if normalized.endswith(".html"):
+        normalized = normalized[: -len(".html")]
+
+    if normalized != "/content" and not normalized.startswith("/content/"):
+        raise ValueError(f"Scope must be a path under /content, got '{scope}'")
+    return normalized
+
+
+def ancestor_paths(page_path: str) -> List[str]:
+    """
+    Returns the path itself and all of its ancestors, shallowest first.
+    """
+    segments = [s for s in page_path.split("/") if s]
+    return ["/" + "/".join(segments[:i]) for i in range(1, len(segments) + 1)]
+
+
+def path_metadata(page_path: str) -> Dict[str, Any]:
+    """
+    Builds scope metadata (site, language and ancestor paths) for a page path.
+    Keys with no value are omitted since ChromaDB rejects None metadata.
+    """
+    metadata: Dict[str, Any] = {}
+    for depth, ancestor in enumerate(ancestor_paths(page_path), start=1):
+        metadata[f"{ANCESTOR_KEY_PREFIX}{depth}"] = ancestor
+
+    segments = [s for s in page_path.split("/") if s]
+    if len(segments) < 2 or segments[0] != "content":
+        return metadata
+
+    rest = segments[1:]
+    if rest[0] in SITE_CONTAINERS and len(rest) > 1:
+        rest = rest[1:]
+    metadata["site"] = rest[0]
+
+    # The language root ends the locale run at its fixed depth below the site,
+    # e.g. /content/wknd/us/en -> "en", /content/wknd/language-masters/de -> "de";
+    # two-letter page names further down (/content/wknd/us/en/go) are not locales
+    locale = rest[1:LOCALE_DEPTH + 1]
+    if len(locale) == LOCALE_DEPTH and all(LOCALE_SEGMENT.match(segment) for segment in locale):
+        if locale[-1] != "language-masters":
+            metadata["language"] = locale[-1]
+
+    return metadata
+
+
+def scope_filter(scope: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Translates a scope path into a ChromaDB `where` filter matching the
+    scope page and all of its descendants. Returns None for no scope.
+    """
+    if not scope:
+        return None
+    normalized = normalize_scope(scope)
+    depth = len(ancestor_paths(normalized))
+    return {f"{ANCESTOR_KEY_PREFIX}{depth}": normalized}
+
+
+def subtree_filter(path: str) -> Dict[str, Any]:
+    """
+    Filter matching every chunk of `path` and its descendant pages. Also
+    matches on `source` so chunks indexed before scope metadata are included.
+    """
+    normalized = normalize_scope(path)
+    return {"$or": [{"source": normalized}, scope_filter(normalized)]}
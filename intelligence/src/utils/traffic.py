@@ -0,0 +1,100 @@
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# Ranking of the most requested pages, exported from dispatcher logs
+TRAFFIC_RANKING_FILE = os.getenv("TRAFFIC_RANKING_FILE", "")
+
+# Request extensions that address a page (page.html, page.model.json, page)
+PAGE_EXTENSIONS = {"", "html", "htm", "json"}
+
+# Top-level /content folders that do not hold pages
+NON_PAGE_ROOTS = ("/content/dam/", "/content/cq:tags/", "/content/experience-fragments/")
+
+
+def page_of(request_path: str) -> Optional[str]:
+    """
+    Maps a requested URL path to the page it renders, dropping the query
+    string, selectors, extension and any jcr:content suffix:
+    /content/wknd/us/en/faqs.model.json?x=1 -> /content/wknd/us/en/faqs.
+    Returns None for assets, non-page extensions and paths outside /content.
+    """
+    path = request_path.split("?", 1)[0].split("#", 1)[0]
+    if not path.startswith("/content/") or path.startswith(NON_PAGE_ROOTS):
+        return None
+    path = path.split("/jcr:content", 1)[0]
+    parent, _, name = path.rstrip("/").rpartition("/")
+    name, dot, rest = name.partition(".")
+    extension = rest.rsplit(".", 1)[-1] if dot else ""
+    if extension not in PAGE_EXTENSIONS or not name:
+        return None
+    return f"{parent}/{name}"
+
+
+def rank_pages(path_counts: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """
+    Folds request path counts into per-page hits, most requested first.
+    """
+    pages = Counter()
+    for path, hits in path_counts:
+        page = page_of(path)
+        if page:
+            pages[page] += hits
+    return pages.most_common()
+
+
+def rank_sections(pages: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """
+    Sums page hits per section (the parent page), most requested first.
+    """
+    sections = Counter()
+    for page, hits in pages:
+        parent = page.rsplit("/", 1)[0]
+        if parent.count("/") >= 2:
+            sections[parent] += hits
+    return sections.most_common()
+
+
+def write_ranking(ranking_file: str, pages: List[Tuple[str, int]], top: Optional[int] = None, source: str = ""):
+    """
+    Atomically writes the page and section ranking as JSON.
+    """
+    pages = pages[:top] if top else pages
+    data = {
+        "generated_at": int(time.time()),
+        "source": source,
+        "pages": [{"path": page, "hits": hits} for page, hits in pages],
+        "sections": [{"path": section, "hits": hits} for section, hits in rank_sections(pages)],
+    }
+    os.makedirs(os.path.dirname(ranking_file) or ".", exist_ok=True)
+    tmp_file = f"{ranking_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_file, ranking_file)
+
+
+def read_ranking(ranking_file: str = TRAFFIC_RANKING_FILE) -> Dict[str, Any]:
+    """
+    Reads a ranking written by write_ranking; empty if there is none.
+    """
+    if not ranking_file:
+        return {"pages": [], "sections": []}
+    try:
+        with open(ranking_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"pages": [], "sections": []}
+
+
+def page_hits(ranking: Mapping[str, Any]) -> Dict[str, int]:
+    return {entry["path"]: entry["hits"] for entry in ranking.get("pages", [])}
+
+
+def prioritize(pages: List[str], hits: Mapping[str, int]) -> List[str]:
+    """
+    Orders pages by traffic, most requested first; pages without traffic
+    keep their original relative order at the end.
+    """
+    return sorted(pages, key=lambda page: -hits.get(page, 0))
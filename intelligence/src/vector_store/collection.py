@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from src.vector_store.projection import delete_projection
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+
+# Alias pointer file mapping a logical collection name (e.g. aem_content) to
+# the versioned physical collection currently serving it, plus the version
+# being built. Swapped atomically with os.replace.
+ALIAS_FILE = os.getenv("CHROMA_ALIAS_FILE", os.path.join(CHROMA_DB_PATH, "aliases.json"))
+VERSION_SEPARATOR = "__v"
+
+# HNSW index configuration (unset values fall back to ChromaDB defaults).
+# Build-time parameters only take effect when a collection is created;
+# ef_search can be changed on an existing collection.
+HNSW_SPACE = os.getenv("CHROMA_HNSW_SPACE")  # l2 | cosine | ip
+HNSW_M = os.getenv("CHROMA_HNSW_M")
+HNSW_CONSTRUCTION_EF = os.getenv("CHROMA_HNSW_CONSTRUCTION_EF")
+HNSW_SEARCH_EF = os.getenv("CHROMA_HNSW_SEARCH_EF")
+
+BUILD_PARAMS = ("space", "max_neighbors", "ef_construction")
+
+
+def hnsw_configuration(space: Optional[str] = HNSW_SPACE,
+                       m: Optional[Any] = HNSW_M,
+                       ef_construction: Optional[Any] = HNSW_CONSTRUCTION_EF,
+                       ef_search: Optional[Any] = HNSW_SEARCH_EF) -> Dict[str, Any]:
+    """
+    Builds the ChromaDB `hnsw` configuration block from the given parameters,
+    leaving out anything that is not set.
+    """
+    hnsw: Dict[str, Any] = {}
+    if space:
+        hnsw["space"] = space
+    if m:
+        hnsw["max_neighbors"] = int(m)
+    if ef_construction:
+        hnsw["ef_construction"] = int(ef_construction)
+    if ef_search:
+        hnsw["ef_search"] = int(ef_search)
+    return hnsw
+
+
+def apply_search_ef(collection, ef_search: Optional[Any] = HNSW_SEARCH_EF):
+    """
+    Sets the query-time ef_search of an existing collection if it differs
+    from the configured value. ChromaDB reads it when the index is loaded,
+    so this must run before the first query in the process (e.g. at startup).
+    """
+    if not ef_search:
+        return
+    current = (collection.configuration or {}).get("hnsw") or {}
+    if current.get("ef_search") != int(ef_search):
+        collection.modify(configuration={"hnsw": {"ef_search": int(ef_search)}})
+        logger.info(f"Set ef_search={ef_search} on collection '{collection.name}'")
+
+
+def get_or_create_collection(client, name: str, hnsw: Optional[Dict[str, Any]] = None):
+    """
+    Returns the named collection, creating it with the configured HNSW
+    parameters. For an existing collection, build-time parameters cannot
+    change, so a mismatch is logged and only ef_search is applied.
+    """
+    hnsw = hnsw_configuration() if hnsw is None else hnsw
+    configuration = {"hnsw": hnsw} if hnsw else None
+    collection = client.get_or_create_collection(name=name, configuration=configuration)
+
+    current = (collection.configuration or {}).get("hnsw") or {}
+    mismatched = [p for p in BUILD_PARAMS if p in hnsw and current.get(p) != hnsw[p]]
+    if mismatched:
+        logger.warning(
+            f"Collection '{name}' was built with different HNSW parameters "
+            f"({', '.join(mismatched)}); rebuild it for them to take effect."
+        )
+    apply_search_ef(collection, hnsw.get("ef_search"))
+    return collection
+
+
+def delete_matching(collection, where: Dict[str, Any], batch_size: int = 500) -> int:
+    """
+    Deletes all chunks matching a metadata filter in id batches.
+    Returns the number of chunks deleted.
+    """
+    ids = collection.get(where=where, include=[])["ids"]
+    for i in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[i:i + batch_size])
+    return len(ids)
+
+
+_alias_cache = {"key": None, "data": {}}
+
+
+def read_aliases(alias_file: str = ALIAS_FILE) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads the alias pointer file. The parsed content is cached by mtime so
+    resolving on every request costs a single stat().
+    """
+    try:
+        stat = os.stat(alias_file)
+    except FileNotFoundError:
+        return {}
+    key = (alias_file, stat.st_mtime_ns, stat.st_size)
+    if _alias_cache["key"] != key:
+        with open(alias_file, "r", encoding="utf-8") as f:
+            _alias_cache["data"] = json.load(f)
+        _alias_cache["key"] = key
+    return _alias_cache["data"]
+
+
+def _write_aliases(data: Dict[str, Dict[str, Any]], alias_file: str = ALIAS_FILE):
+    """
+    Atomically replaces the alias pointer file.
+    """
+    os.makedirs(os.path.dirname(alias_file) or ".", exist_ok=True)
+    tmp_file = f"{alias_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, alias_file)
+    _alias_cache["key"] = None
+
+
+def resolve_alias(alias: str, alias_file: str = ALIAS_FILE) -> str:
+    """
+    Returns the physical collection currently serving `alias`. Without an
+    alias entry the name is used as-is (pre blue-green layout).
+    """
+    return read_aliases(alias_file).get(alias, {}).get("current", alias)
+
+
+def building_collection(alias: str, alias_file: str = ALIAS_FILE) -> Optional[str]:
+    """
+    Returns the collection being rebuilt for `alias`, if a rebuild is running.
+    Live updates are written to it as well so the swap loses no changes.
+    """
+    return read_aliases(alias_file).get(alias, {}).get("building")
+
+
+def new_version_name(alias: str) -> str:
+    """
+    Returns a fresh versioned collection name, e.g. aem_content__v20260210140000.
+    """
+    return f"{alias}{VERSION_SEPARATOR}{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def start_build(alias: str, name: str, alias_file: str = ALIAS_FILE):
+    """
+    Records `name` as the collection being built for `alias`.
+    """
+    data = dict(read_aliases(alias_file))
+    entry = dict(data.get(alias, {"current": alias}))
+    entry["building"] = name
+    data[alias] = entry
+    _write_aliases(data, alias_file)
+
+
+def abort_build(alias: str, alias_file: str = ALIAS_FILE):
+    """
+    Clears the building marker after a failed rebuild.
+    """
+    data = dict(read_aliases(alias_file))
+    if alias in data:
+        entry = dict(data[alias])
+        entry.pop("building", None)
+        data[alias] = entry
+        _write_aliases(data, alias_file)
+
+
+def swap_alias(alias: str, name: str, alias_file: str = ALIAS_FILE) -> Optional[str]:
+    """
+    Atomically points `alias` at `name`. Returns the previously served collection.
+    """
+    data = dict(read_aliases(alias_file))
+    entry = dict(data.get(alias, {"current": alias}))
+    previous = entry.get("current")
+    entry["current"] = name
+    entry["previous"] = previous
+    entry.pop("building", None)
+    entry["swapped_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    data[alias] = entry
+    _write_aliases(data, alias_file)
+    logger.info(f"Alias '{alias}' now points to '{name}' (was '{previous}')")
+    return previous
+
+
+def garbage_collect(client, alias: str, keep: int = 1, alias_file: str = ALIAS_FILE) -> List[str]:
+    """
+    Deletes old versions of `alias`, keeping the serving and building
+    collections plus the `keep` most recent others for rollback.
+    Returns the names of the deleted collections.
+    """
+    entry = read_aliases(alias_file).get(alias, {})
+    protected = {entry.get("current", alias), entry.get("building")}
+
+    names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    versions = [n for n in names if n == alias or n.startswith(f"{alias}{VERSION_SEPARATOR}")]
+    # Versioned names sort chronologically; the unversioned original is oldest
+    candidates = sorted((n for n in versions if n not in protected), key=lambda n: (n != alias, n), reverse=True)
+
+    deleted = []
+    for name in candidates[keep:]:
+        client.delete_collection(name=name)
+        delete_projection(name)
+        deleted.append(name)
+        logger.info(f"Deleted old collection version '{name}'")
+    return deleted
@@ -0,0 +1,206 @@
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default prompt budget for the packed context, in estimated tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+# Longest text shared by adjacent chunks that is looked for (the crawler's
+# CHUNK_OVERLAP is 65 characters) and the shortest one that is removed
+CONTEXT_MAX_OVERLAP = int(os.getenv("CONTEXT_MAX_OVERLAP", 200))
+CONTEXT_MIN_OVERLAP = 8
+# A block is cut to fit the remaining budget only if at least this many tokens are left
+MIN_PARTIAL_TOKENS = 50
+# Average characters per token of the generation model's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Separates non-adjacent chunks of the same page within a block
+GAP = "\n...\n"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimates the prompt tokens of a text (about four characters per token
+    for English with Llama-style tokenizers).
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def overlap_length(previous: str, text: str, max_overlap: int = CONTEXT_MAX_OVERLAP) -> int:
+    """
+    Length of the longest prefix of `text` that `previous` ends with, as
+    left by the text splitter's chunk overlap; 0 below CONTEXT_MIN_OVERLAP.
+    """
+    for k in range(min(len(previous), len(text), max_overlap), CONTEXT_MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:k]):
+            return k
+    return 0
+
+
+def merge_chunks(texts: List[str]) -> str:
+    """
+    Joins consecutive chunks of one page, dropping the text each chunk repeats
+    from the end of the previous one.
+    """
+    merged = texts[0]
+    for text in texts[1:]:
+        k = overlap_length(merged, text)
+        merged += text[k:] if k else "\n" + text
+    return merged
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """
+    Cuts a text to about `tokens` tokens at a word boundary.
+    """
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit - 4)
+    return text[:cut if cut > 0 else limit - 4].rstrip() + " ..."
+
+
+def format_block(source: str, content: str) -> str:
+    return f"Source: {source}\nContent: {content}"
+
+
+class PackedContext:
+    """
+    Context ready for a prompt: one "Source: ...\nContent: ..." block per page
+    in retrieval rank order, plus the pages it was built from and its size
+    next to that of the unpacked chunks.
+    """
+
+    def __init__(self, text: str = "", sources: Optional[List[Dict[str, Any]]] = None, tokens: int = 0,
+                 raw_tokens: int = 0, dropped: int = 0, error: Optional[str] = None):
+        self.text = text
+        self.sources = sources or []
+        self.tokens = tokens
+        self.raw_tokens = raw_tokens
+        self.dropped = dropped
+        self.error = error
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "context": self.text,
+            "sources": self.sources,
+            "tokens": self.tokens,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def group_runs(documents: List[str], metadatas: List[dict], distances: List[float]) -> List[Dict[str, Any]]:
+    """
+    Groups retrieved chunks by page in order of each page's best rank and
+    splits each page's chunks into runs of consecutive chunk_ids.
+    """
+    pages: Dict[str, Dict[str, Any]] = {}
+    for rank, doc in enumerate(documents):
+        meta = (metadatas[rank] if rank < len(metadatas) else None) or {}
+        source = meta.get("source", "Unknown")
+        page = pages.setdefault(source, {
+            "source": source,
+            "title": meta.get("title"),
+            "url": meta.get("url"),
+            "distance": distances[rank] if rank < len(distances) else None,
+            "chunks": {},
+        })
+        chunk_id = meta.get("chunk_id")
+        key = chunk_id if isinstance(chunk_id, int) else f"rank-{rank}"
+        page["chunks"].setdefault(key, doc)
+
+    for page in pages.values():
+        numbered = sorted(k for k in page["chunks"] if isinstance(k, int))
+        runs = []
+        for chunk_id in numbered:
+            if runs and runs[-1][-1] == chunk_id - 1:
+                runs[-1].append(chunk_id)
+            else:
+                runs.append([chunk_id])
+        runs.extend([k] for k in page["chunks"] if not isinstance(k, int))
+        page["runs"] = runs
+    return list(pages.values())
+
+
+def assemble_context(documents: List[str], metadatas: Optional[List[dict]] = None,
+                     distances: Optional[List[float]] = None,
+                     token_budget: Optional[int] = None) -> PackedContext:
+    """
+    Packs retrieved chunks (in rank order) into a prompt context: chunks of
+    the same page share one source header, adjacent chunks are merged with
+    their overlap removed, and pages are added best first until the token
+    budget is used up. The last page that does not fit is cut to the
+    remaining budget if enough of it is left.
+    """
+    metadatas = metadatas or []
+    budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    raw_tokens = count_tokens("\n\n".join(
+        format_block(((metadatas[i] if i < len(metadatas) else None) or {}).get("source", "Unknown"), doc)
+        for i, doc in enumerate(documents)
+    ))
+
+    blocks, sources, dropped = [], [], 0
+    for page in group_runs(documents, metadatas, distances or []):
+        content = GAP.join(merge_chunks([page["chunks"][k] for k in run]) for run in page["runs"])
+        block = format_block(page["source"], content)
+        truncated = False
+        if count_tokens("\n\n".join(blocks + [block])) > budget:
+            remaining = budget - count_tokens("\n\n".join(blocks + [format_block(page["source"], "")]))
+            if remaining < MIN_PARTIAL_TOKENS:
+                dropped += 1
+                continue
+            block = format_block(page["source"], truncate_to_tokens(content, remaining))
+            truncated = True
+        blocks.append(block)
+        sources.append({
+            "source": page["source"],
+            "title": page["title"],
+            "url": page["url"],
+            "chunks": [k for run in page["runs"] for k in run if isinstance(k, int)],
+            "distance": page["distance"],
+            "tokens": count_tokens(block),
+            "truncated": truncated,
+        })
+
+    text = "\n\n".join(blocks)
+    return PackedContext(text, sources, count_tokens(text), raw_tokens, dropped)
+
+
+class PackingStats:
+    """
+    Running totals of the prompt tokens served versus those of the unpacked
+    chunks, reported by /api/v1/metrics.
+    """
+
+    def __init__(self):
+        self.contexts = 0
+        self.raw_tokens = 0
+        self.tokens = 0
+        self.truncated = 0
+        self.dropped = 0
+
+    def record(self, packed: PackedContext):
+        self.contexts += 1
+        self.raw_tokens += packed.raw_tokens
+        self.tokens += packed.tokens
+        self.truncated += any(s["truncated"] for s in packed.sources)
+        self.dropped += packed.dropped
+
+    def stats(self) -> Dict[str, Any]:
+        saved = self.raw_tokens - self.tokens
+        return {
+            "contexts": self.contexts,
+            "raw_tokens": self.raw_tokens,
+            "tokens": self.tokens,
+            "tokens_saved": saved,
+            "saved_ratio": saved / self.raw_tokens if self.raw_tokens else 0.0,
+            "truncated": self.truncated,
+            "dropped_sources": self.dropped,
+        }
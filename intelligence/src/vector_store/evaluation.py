@@ -0,0 +1,70 @@
+import numpy as np
+from typing import Dict, List, Sequence
+
+# Number of queries scored against the full corpus at once; bounds the
+# (queries x corpus) distance matrix held in memory.
+QUERY_BLOCK_SIZE = 256
+
+
+def pairwise_distances(queries: np.ndarray, corpus: np.ndarray, space: str = "l2") -> np.ndarray:
+    """
+    Computes distances between queries and corpus vectors using the same
+    definitions as ChromaDB: squared L2, 1 - cosine similarity, or 1 - inner product.
+    """
+    if space == "l2":
+        return (
+            np.sum(queries ** 2, axis=1)[:, None]
+            - 2.0 * queries @ corpus.T
+            + np.sum(corpus ** 2, axis=1)[None, :]
+        )
+    if space == "cosine":
+        q = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        c = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        return 1.0 - q @ c.T
+    if space == "ip":
+        return 1.0 - queries @ corpus.T
+    raise ValueError(f"Unknown distance space '{space}'")
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str = "l2") -> np.ndarray:
+    """
+    Returns the exact (brute-force) top-k corpus indices for each query,
+    nearest first. Used as ground truth for approximate search.
+    """
+    corpus = np.asarray(corpus, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(corpus))
+    result = np.empty((len(queries), k), dtype=np.int64)
+
+    for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+        block = pairwise_distances(queries[start:start + QUERY_BLOCK_SIZE], corpus, space)
+        candidates = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(block, candidates, axis=1).argsort(axis=1)
+        result[start:start + len(block)] = np.take_along_axis(candidates, order, axis=1)
+
+    return result
+
+
+def recall_at_k(retrieved: Sequence[Sequence], truth: Sequence[Sequence], k: int) -> float:
+    """
+    Mean fraction of the true top-k neighbours found in the retrieved top-k.
+    """
+    if not truth:
+        return 0.0
+    total = 0.0
+    for found, expected in zip(retrieved, truth):
+        expected_k = list(expected)[:k]
+        if not expected_k:
+            continue
+        total += len(set(list(found)[:k]) & set(expected_k)) / len(expected_k)
+    return total / len(truth)
+
+
+def latency_percentiles(samples_ms: List[float], percentiles=(50, 95, 99)) -> Dict[str, float]:
+    """
+    Summarizes latency samples (milliseconds) as p50/p95/p99 etc.
+    """
+    if not samples_ms:
+        return {f"p{p}": 0.0 for p in percentiles}
+    values = np.percentile(np.asarray(samples_ms, dtype=np.float64), percentiles)
+    return {f"p{p}": float(v) for p, v in zip(percentiles, values)}
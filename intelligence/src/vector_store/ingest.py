@@ -1,10 +1,26 @@
+import argparse
 import chromadb
 import json
+import logging
 import os
 import sys
+from collections import defaultdict
+import numpy as np
 from dotenv import load_dotenv
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.crawler.crawler import chunk_doc_id
 from src.utils.embeddings import get_embedding_model, compute_embeddings
+from src.utils.scope import path_metadata
+from src.utils import profiling
+from src.utils.profiling import batch, profiled, span
+from src.vector_store.collection import (
+    get_or_create_collection, resolve_alias, new_version_name,
+    start_build, abort_build, swap_alias, garbage_collect
+)
+from src.vector_store.projection import (
+    PROJECTION_DIM, PROJECTION_FIT_SAMPLE, Projection, delete_projection, load_projection,
+    projection_recall, save_projection
+)
 
 load_dotenv()
 
@@ -13,26 +29,171 @@ CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
 COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
 INPUT_FILE = os.getenv("INPUT_FILE", "output.jsonl")
 BATCH_SIZE = 50
+# Sources whose stored chunk IDs are checked per query after a re-ingest
+STALE_BATCH_SIZE = 100
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest crawled AEM content into ChromaDB")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Build into a fresh versioned collection and atomically swap the alias when done")
+    parser.add_argument("--keep", type=int, default=1,
+                        help="Old collection versions to keep for rollback after a rebuild")
+    parser.add_argument("--profile", nargs="?", const=profiling.PROFILE_DIR, metavar="DIR",
+                        help="Write a cProfile file per batch to DIR (default PROFILE_DIR)")
+    parser.add_argument("--trace", action="store_true", help="Log embed/upsert span timings per batch")
+    parser.add_argument("--project-dim", type=int, default=PROJECTION_DIM,
+                        help="Store PCA-reduced vectors of this dimension in a new collection (EMBEDDING_PROJECTION_DIM)")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.profile:
+        profiling.configure(profile_dir=args.profile, batches=True)
+    if args.trace or profiling.TRACE_SPANS:
+        profiling.configure(trace_spans=True)
+        logging.basicConfig(level=logging.INFO)
+
     if not os.path.exists(INPUT_FILE):
         print(f"Error: Input file '{INPUT_FILE}' not found.")
         sys.exit(1)
 
     print(f"Initializing ChromaDB at '{CHROMA_DB_PATH}'...")
     client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
-
     model = get_embedding_model()
 
-    print(f"Reading '{INPUT_FILE}' and ingesting...")
-    
+    if not args.rebuild:
+        collection = get_or_create_collection(client, resolve_alias(COLLECTION_NAME))
+        ingest_file(collection, model, INPUT_FILE, args.project_dim)
+        return
+
+    # Blue-green rebuild: the live collection keeps serving until the swap
+    target = new_version_name(COLLECTION_NAME)
+    print(f"Rebuilding '{COLLECTION_NAME}' into '{target}'...")
+    collection = get_or_create_collection(client, target)
+    try:
+        # Syncs start writing to the new version only once its projection is
+        # saved, or they would store full vectors in a projected collection
+        ingest_file(collection, model, INPUT_FILE, args.project_dim,
+                    ready=lambda: start_build(COLLECTION_NAME, target))
+    except BaseException:
+        abort_build(COLLECTION_NAME)
+        client.delete_collection(name=target)
+        delete_projection(target)
+        raise
+
+    previous = swap_alias(COLLECTION_NAME, target)
+    print(f"Alias '{COLLECTION_NAME}' swapped from '{previous}' to '{target}'")
+    for name in garbage_collect(client, COLLECTION_NAME, keep=args.keep):
+        print(f"Deleted old version '{name}'")
+
+def ingest_file(collection, model, input_file, project_dim=0, ready=None):
+    """
+    Streams a crawler JSONL file into the given collection in batches.
+    Collections with a projection get reduced-dimension vectors. With
+    `project_dim`, an empty collection first gets one: the first
+    PROJECTION_FIT_SAMPLE embeddings are held back, a PCA is fitted on
+    them and saved next to the collection, then everything is written
+    projected.
+    Into a non-empty collection, only chunks whose IDs are not stored yet are
+    embedded (an unchanged component keeps its ID), and chunks stored for an
+    ingested page that the file no longer produces (e.g. of an edited
+    component, whose chunk ID hashes its text) are deleted at the end, as a
+    live sync does.
+    `ready` is called once the collection's projection (if any) is settled,
+    before the first chunk is written.
+    Returns the number of chunks ingested.
+    """
+    print(f"Reading '{input_file}' and ingesting into '{collection.name}'...")
+    projection = load_projection(collection.name)
+    fitting = projection is None and project_dim > 0
+    existing = collection.count()
+    if fitting and existing:
+        raise ValueError(f"Collection '{collection.name}' already stores full vectors; use --rebuild to project")
+    if ready and not fitting:
+        ready()
+    held = []
+    count = 0
+    embedded = 0
+    produced = defaultdict(set)
+    for batch_docs, batch_ids, batch_metadatas in iter_batches(input_file):
+        for doc_id, metadata in zip(batch_ids, batch_metadatas):
+            produced[metadata["source"]].add(doc_id)
+        with batch("ingest", offset=count, chunks=len(batch_docs)):
+            if not fitting:
+                embedded += upsert_batch(collection, model, batch_docs, batch_ids, batch_metadatas,
+                                         projection, diff=bool(existing))
+                count += len(batch_docs)
+            else:
+                held.append((batch_docs, batch_ids, batch_metadatas, embed_batch(model, batch_docs)))
+                if sum(len(h[0]) for h in held) >= PROJECTION_FIT_SAMPLE:
+                    projection = fit_projection(collection, [h[3] for h in held], project_dim)
+                    if ready:
+                        ready()
+                    count += write_held(collection, held, projection)
+                    held, fitting = [], False
+        print(f"Ingested {count} chunks...")
+
+    # Corpus smaller than the fit sample
+    if held:
+        projection = fit_projection(collection, [h[3] for h in held], project_dim)
+        if ready:
+            ready()
+        count += write_held(collection, held, projection)
+        print(f"Ingested {count} chunks...")
+
+    if existing:
+        removed = delete_stale(collection, produced)
+        print(f"Embedded {embedded} new or changed chunks, removed {removed} stale chunks of re-ingested pages")
+    print(f"Ingestion complete. Total chunks: {count}")
+    return count
+
+def delete_stale(collection, produced, batch_size=STALE_BATCH_SIZE):
+    """
+    Deletes the stored chunks of each source in `produced` whose IDs it does
+    not list. Returns the number of chunks deleted.
+    """
+    sources = sorted(produced)
+    removed = 0
+    for i in range(0, len(sources), batch_size):
+        found = collection.get(where={"source": {"$in": sources[i:i + batch_size]}}, include=["metadatas"])
+        stale_ids = [
+            doc_id for doc_id, meta in zip(found["ids"], found["metadatas"])
+            if doc_id not in produced[(meta or {}).get("source")]
+        ]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+            removed += len(stale_ids)
+    return removed
+
+def fit_projection(collection, embeddings, dim):
+    """
+    Fits and saves a PCA projection for `collection`, reporting the
+    variance it keeps and the recall@10 it costs on the fitted sample.
+    """
+    space = ((collection.configuration or {}).get("hnsw") or {}).get("space", "l2")
+    sample = np.concatenate([np.asarray(e, dtype=np.float32) for e in embeddings])
+    projection = Projection.fit(sample, dim, space)
+    recall = projection_recall(sample, projection, k=10, space=space)
+    save_projection(collection.name, projection)
+    print(f"Fitted {projection.source_dim}->{projection.dim} projection on {len(sample)} chunks: "
+          f"{projection.retained_variance:.1%} variance retained, recall@10 {recall:.3f} vs full vectors")
+    return projection
+
+def write_held(collection, held, projection):
+    for docs, ids, metadatas, embeddings in held:
+        write_batch(collection, docs, ids, metadatas, embeddings, projection)
+    return sum(len(h[0]) for h in held)
+
+def iter_batches(input_file, batch_size=BATCH_SIZE):
+    """
+    Reads a crawler JSONL file and yields (documents, ids, metadatas)
+    batches of up to `batch_size` chunks, ready to embed and upsert.
+    """
     batch_docs = []
     batch_ids = []
     batch_metadatas = []
-    count = 0
 
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
+    with open(input_file, 'r', encoding='utf-8') as f:
         for line in f:
             if not line.strip():
                 continue
@@ -44,12 +205,14 @@ def main():
                 chunk_id = item.get('chunk_id', 0)
                 metadata = item.get('metadata', {}).copy()
                 
-                # Enhance metadata with source/chunk info
+                # Enhance metadata with source/chunk info and scope ancestors
+                # (older crawl outputs predate the scope metadata)
+                metadata.update(path_metadata(source))
                 metadata['source'] = source
                 metadata['chunk_id'] = chunk_id
                 
-                # ID construction
-                doc_id = f"{source}_{chunk_id}"
+                # ID construction: stable per component and text (positional for older crawls)
+                doc_id = chunk_doc_id(item)
 
                 if text:
                     batch_docs.append(text)
@@ -60,30 +223,51 @@ def main():
                 print(f"Skipping invalid JSON line: {line[:50]}...")
                 continue
 
-            if len(batch_docs) >= BATCH_SIZE:
-                upsert_batch(collection, model, batch_docs, batch_ids, batch_metadatas)
-                count += len(batch_docs)
-                print(f"Ingested {count} chunks...")
+            if len(batch_docs) >= batch_size:
+                yield batch_docs, batch_ids, batch_metadatas
                 batch_docs = []
                 batch_ids = []
                 batch_metadatas = []
 
-        # Process remaining
-        if batch_docs:
-            upsert_batch(collection, model, batch_docs, batch_ids, batch_metadatas)
-            count += len(batch_docs)
-            print(f"Ingested {count} chunks...")
+    # Process remaining
+    if batch_docs:
+        yield batch_docs, batch_ids, batch_metadatas
 
-    print(f"Ingestion complete. Total chunks: {count}")
+def upsert_batch(collection, model, docs, ids, metadatas, projection=None, diff=False):
+    """
+    Embeds and writes a batch. With `diff`, chunks whose IDs are already
+    stored keep their embedding and only get their metadata updated if it
+    changed, as in a live sync. Returns the number of chunks embedded.
+    """
+    if not diff:
+        write_batch(collection, docs, ids, metadatas, embed_batch(model, docs), projection)
+        return len(docs)
+    found = collection.get(ids=ids, include=["metadatas"])
+    stored = dict(zip(found["ids"], found.get("metadatas") or [None] * len(found["ids"])))
+    missing = [i for i, doc_id in enumerate(ids) if doc_id not in stored]
+    moved = [i for i, doc_id in enumerate(ids) if doc_id in stored and stored[doc_id] != metadatas[i]]
+    if missing:
+        docs_missing = [docs[i] for i in missing]
+        write_batch(collection, docs_missing, [ids[i] for i in missing], [metadatas[i] for i in missing],
+                    embed_batch(model, docs_missing), projection)
+    if moved:
+        profiled(collection.update)(ids=[ids[i] for i in moved], metadatas=[metadatas[i] for i in moved])
+    return len(missing)
+
+def embed_batch(model, docs):
+    with span("embed", chunks=len(docs)):
+        return profiled(compute_embeddings)(model, docs)
 
-def upsert_batch(collection, model, docs, ids, metadatas):
-    embeddings = compute_embeddings(model, docs)
-    collection.upsert(
-        ids=ids,
-        documents=docs,
-        embeddings=embeddings,
-        metadatas=metadatas
-    )
+def write_batch(collection, docs, ids, metadatas, embeddings, projection=None):
+    if projection is not None:
+        embeddings = projection.apply(embeddings).tolist()
+    with span("upsert", chunks=len(docs)):
+        profiled(collection.upsert)(
+            ids=ids,
+            documents=docs,
+            embeddings=embeddings,
+            metadatas=metadatas
+        )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+import logging
+import os
+import tempfile
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.vector_store.evaluation import exact_top_k, recall_at_k
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+
+# Fitted projections, one file per physical collection (<name>.npz)
+PROJECTION_DIR = os.getenv("CHROMA_PROJECTION_DIR", os.path.join(CHROMA_DB_PATH, "projections"))
+# Target dimension for new collections built by ingest (0 = store full vectors)
+PROJECTION_DIM = int(os.getenv("EMBEDDING_PROJECTION_DIM", 0))
+# Embeddings the PCA is fitted on before ingest starts writing
+PROJECTION_FIT_SAMPLE = int(os.getenv("EMBEDDING_PROJECTION_FIT_SAMPLE", 20000))
+
+
+class Projection:
+    """
+    Linear projection of embeddings onto their top principal components:
+    x -> (x - mean) @ components.T. Squared L2 distances in the projected
+    space approximate those between the full vectors, so l2 rankings are
+    preserved as far as the dropped variance allows. Cosine collections
+    compare the centred, unnormalised projections, which can rank differently
+    from the full vectors; projection_recall measures what a projection loses
+    in the collection's own space. For inner-product collections the mean is
+    not removed, since centering would shift each document's score differently.
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance_ratio: np.ndarray):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio = np.asarray(explained_variance_ratio, dtype=np.float32)
+
+    @property
+    def source_dim(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def retained_variance(self) -> float:
+        return float(self.explained_variance_ratio.sum())
+
+    @classmethod
+    def fit(cls, embeddings, dim: int, space: str = "l2") -> "Projection":
+        """
+        Fits a PCA on the given embeddings through the eigendecomposition
+        of their (dims x dims) covariance, which stays cheap for any corpus size.
+        """
+        x = np.asarray(embeddings, dtype=np.float64)
+        if not 0 < dim <= x.shape[1]:
+            raise ValueError(f"projection dimension must be between 1 and {x.shape[1]}, got {dim}")
+        mean = np.zeros(x.shape[1]) if space == "ip" else x.mean(axis=0)
+        centered = x - mean
+        covariance = centered.T @ centered / max(len(x) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1]
+        eigenvalues, eigenvectors = np.clip(eigenvalues[order], 0, None), eigenvectors[:, order]
+        total = eigenvalues.sum() or 1.0
+        return cls(mean, eigenvectors[:, :dim].T, eigenvalues[:dim] / total)
+
+    def apply(self, vectors) -> np.ndarray:
+        """
+        Projects a (n, source_dim) array or a single vector.
+        """
+        x = np.asarray(vectors, dtype=np.float32)
+        return (x - self.mean) @ self.components.T
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components,
+                     explained_variance_ratio=self.explained_variance_ratio)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], data["explained_variance_ratio"])
+
+
+def projection_path(collection_name: str, projection_dir: Optional[str] = None) -> str:
+    return os.path.join(projection_dir or PROJECTION_DIR, f"{collection_name}.npz")
+
+
+_projection_cache: Dict[str, tuple] = {}
+
+
+def load_projection(collection_name: str, projection_dir: Optional[str] = None) -> Optional[Projection]:
+    """
+    Returns the projection of a physical collection, or None if it stores
+    full vectors. Cached by mtime, so a lookup per query costs one stat().
+    """
+    path = projection_path(collection_name, projection_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _projection_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, Projection.load(path))
+        _projection_cache[path] = cached
+    return cached[1]
+
+
+def save_projection(collection_name: str, projection: Projection, projection_dir: Optional[str] = None) -> str:
+    path = projection_path(collection_name, projection_dir)
+    projection.save(path)
+    logger.info(f"Saved {projection.source_dim}->{projection.dim} projection for '{collection_name}' to {path}")
+    return path
+
+
+def delete_projection(collection_name: str, projection_dir: Optional[str] = None):
+    """
+    Removes a collection's projection, e.g. when the collection is deleted.
+    """
+    path = projection_path(collection_name, projection_dir)
+    _projection_cache.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def project(collection_name: str, embeddings: Sequence) -> list:
+    """
+    Maps embeddings into the vector space of a collection: projected if
+    the collection has a projection, unchanged otherwise.
+    """
+    projection = load_projection(collection_name)
+    if projection is None:
+        return embeddings
+    return projection.apply(embeddings).tolist()
+
+
+def projection_recall(embeddings, projection: Projection, k: int = 10, queries: int = 500,
+                      space: str = "l2", seed: int = 42) -> float:
+    """
+    Recall@k of exact search in the projected space against exact search
+    over the full vectors, with sampled corpus vectors as queries. Isolates
+    what the projection loses from any approximate-index error.
+    """
+    corpus = np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(corpus), size=min(queries, len(corpus)), replace=False)
+    truth = exact_top_k(corpus, corpus[sample], k, space)
+    projected = projection.apply(corpus)
+    found = exact_top_k(projected, projected[sample], k, space)
+    return recall_at_k(found.tolist(), truth.tolist(), k)
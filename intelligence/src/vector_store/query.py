@@ -1,10 +1,17 @@
 import chromadb
 import sys
 import os
+from typing import List, Optional
 from dotenv import load_dotenv
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-from src.utils.embeddings import get_embedding_model, compute_query_embedding
+from src.utils.embeddings import get_embedding_model, compute_embeddings, compute_query_embedding
+from src.utils.scope import scope_filter
+from src.utils.admission import Deadline
+from src.utils.profiling import span
+from src.vector_store.collection import resolve_alias
+from src.vector_store.context import PackedContext, assemble_context
+from src.vector_store.projection import load_projection, project
 
 load_dotenv()
 
@@ -12,47 +19,117 @@ load_dotenv()
 CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
 COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
 
-def get_relevant_context(query_text: str, n_results: int = 3, chroma_path: str = CHROMA_DB_PATH, collection_name: str = COLLECTION_NAME) -> str:
+def get_relevant_context(query_text: str, n_results: int = 3, chroma_path: str = CHROMA_DB_PATH, collection_name: str = COLLECTION_NAME, scope: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
     """
     Retrieves relevant context from ChromaDB for a given query.
-    Returns a single string tailored for RAG prompts.
+    Returns a single string tailored for RAG prompts (see retrieve_context).
+    """
+    return retrieve_context(query_text, n_results, chroma_path, collection_name, scope, deadline).text
+
+def retrieve_context(query_text: str, n_results: int = 3, chroma_path: str = CHROMA_DB_PATH, collection_name: str = COLLECTION_NAME, scope: Optional[str] = None, deadline: Optional[Deadline] = None, token_budget: Optional[int] = None) -> PackedContext:
+    """
+    Retrieves relevant chunks from ChromaDB for a given query and packs them
+    into a token-budgeted context with its sources.
+    An optional scope path (e.g. /content/wknd/us/en) restricts the search
+    to that subtree via a metadata filter.
+    If a deadline is given, it is checked before embedding and before the
+    vector search so expired requests stop early.
     """
     try:
         client = chromadb.PersistentClient(path=chroma_path)
-        collection = client.get_collection(name=collection_name)
+        collection = client.get_collection(name=resolve_alias(collection_name))
     except Exception as e:
-        return f"Error accessing vector store: {str(e)}"
+        message = f"Error accessing vector store: {str(e)}"
+        return PackedContext(message, error=message)
 
+    if deadline:
+        deadline.check("embedding")
     model = get_embedding_model()
-    query_embedding = compute_query_embedding(model, query_text)
+    with span("query embedding"):
+        query_embedding = compute_query_embedding(model, query_text, load_projection(collection.name))
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=n_results
-    )
+    if deadline:
+        deadline.check("vector search")
+    with span("vector search", n_results=n_results, scope=scope):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=scope_filter(scope)
+        )
 
-    if not results['documents'] or not results['documents'][0]:
-        return ""
+    return pack_results(results, 0, token_budget)
+
+def pack_results(results: dict, i: int, token_budget: Optional[int] = None) -> PackedContext:
+    """
+    Packs the chunks ChromaDB returned for the i-th query embedding.
+    """
+    documents = results.get('documents') or []
+    if i >= len(documents) or not documents[i]:
+        return PackedContext()
+    metadatas = results.get('metadatas') or []
+    distances = results.get('distances') or []
+    with span("context packing", chunks=len(documents[i])):
+        return assemble_context(
+            documents[i],
+            metadatas[i] if i < len(metadatas) else [],
+            distances[i] if i < len(distances) else [],
+            token_budget
+        )
 
-    formatted_context = []
-    for i, doc in enumerate(results['documents'][0]):
-        meta = results['metadatas'][0][i]
-        source = meta.get('source', 'Unknown')
-        formatted_context.append(f"Source: {source}\nContent: {doc}")
+def get_relevant_contexts(queries: List[str], n_results: int = 3, chroma_path: str = CHROMA_DB_PATH, collection_name: str = COLLECTION_NAME, scope: Optional[str] = None, deadline: Optional[Deadline] = None) -> List[str]:
+    """
+    Batched variant of get_relevant_context.
+    Returns one context string per query, in input order.
+    """
+    return [packed.text for packed in retrieve_contexts(queries, n_results, chroma_path, collection_name, scope, deadline)]
 
-    return "\n\n".join(formatted_context)
+def retrieve_contexts(queries: List[str], n_results: int = 3, chroma_path: str = CHROMA_DB_PATH, collection_name: str = COLLECTION_NAME, scope: Optional[str] = None, deadline: Optional[Deadline] = None, token_budget: Optional[int] = None) -> List[PackedContext]:
+    """
+    Batched variant of retrieve_context: embeds all queries in one model
+    call and runs a single multi-vector ChromaDB query.
+    Returns one packed context per query, in input order.
+    """
+    if not queries:
+        return []
+
+    try:
+        client = chromadb.PersistentClient(path=chroma_path)
+        collection = client.get_collection(name=resolve_alias(collection_name))
+    except Exception as e:
+        message = f"Error accessing vector store: {str(e)}"
+        return [PackedContext(message, error=message) for _ in queries]
+
+    if deadline:
+        deadline.check("embedding")
+    model = get_embedding_model()
+    with span("query embedding", queries=len(queries)):
+        query_embeddings = project(collection.name, compute_embeddings(model, queries))
+
+    if deadline:
+        deadline.check("vector search")
+    with span("vector search", queries=len(queries), n_results=n_results, scope=scope):
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=scope_filter(scope)
+        )
+
+    return [pack_results(results, i, token_budget) for i in range(len(queries))]
 
 def main():
     query = "WKND"
+    scope = os.getenv("QUERY_SCOPE")
     if len(sys.argv) > 1:
         query = " ".join(sys.argv[1:])
 
-    print(f"Querying ChromaDB at '{CHROMA_DB_PATH}' for: '{query}'")
-    context = get_relevant_context(query)
-    
-    if context:
+    print(f"Querying ChromaDB at '{CHROMA_DB_PATH}' for: '{query}'" + (f" (scope: {scope})" if scope else ""))
+    packed = retrieve_context(query, scope=scope)
+
+    if packed.text:
         print("\nRetrieved Context:")
-        print(context)
+        print(packed.text)
+        if packed.sources:
+            print(f"\n{packed.tokens} tokens from {len(packed.sources)} pages ({packed.tokens_saved} saved by packing)")
     else:
         print("\nNo relevant context found.")
 
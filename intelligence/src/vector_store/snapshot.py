@@ -0,0 +1,364 @@
+"""
+Portable index snapshots: export a collection into one versioned artifact
+and load it on another node, instead of copying a live ChromaDB directory or
+re-crawling and re-embedding everything.
+
+A snapshot is an uncompressed tar holding:
+  - manifest.json       format version, collection, row count, dimension,
+                        HNSW build parameters, embedding model, checksums
+  - embeddings.npy      float32 (rows x dimension), contiguous
+  - records.jsonl.gz    one {"id", "document", "metadata"} line per row,
+                        in the same order as the embeddings
+  - projection.npz      the collection's PCA projection, if it has one
+
+Because the tar is not compressed, embeddings.npy is memory-mapped in
+place on import and handed to ChromaDB in bulk batches; no part of the
+artifact is extracted to disk.
+
+Usage:
+    python src/vector_store/snapshot.py export --output aem_content.snapshot.tar
+    python src/vector_store/snapshot.py import aem_content.snapshot.tar --activate
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import chromadb
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.utils.embeddings import EMBEDDING_PROVIDER, LOCAL_MODEL_NAME, OPENAI_MODEL_NAME
+from src.vector_store.collection import (
+    ALIAS_FILE, BUILD_PARAMS, garbage_collect, get_or_create_collection, hnsw_configuration,
+    new_version_name, resolve_alias, swap_alias,
+)
+from src.vector_store.projection import Projection, delete_projection, load_projection, save_projection
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "aem_content")
+# Snapshot loaded at service startup when the collection is missing or empty
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
+
+SNAPSHOT_FORMAT = "aem-index-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.npy"
+RECORDS = "records.jsonl.gz"
+PROJECTION = "projection.npz"
+EXPORT_PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+
+
+class SnapshotError(Exception):
+    """
+    Raised for unreadable, incompatible or corrupted snapshots.
+    """
+
+
+def embedding_model_name() -> str:
+    """
+    The embedding model queries are encoded with; the ONNX provider runs an
+    export of the local model, so both report the local model's name.
+    """
+    return OPENAI_MODEL_NAME if EMBEDDING_PROVIDER == "openai" else LOCAL_MODEL_NAME
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file, read in 1 MB blocks.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def iter_collection(collection, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Reads ids, embeddings, documents and metadata of a collection in pages.
+    """
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def export_snapshot(collection, output_file: str, alias: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Writes `collection` to a snapshot file (atomically). Returns the manifest.
+    """
+    count = collection.count()
+    if not count:
+        raise SnapshotError(f"Collection '{collection.name}' is empty")
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    workdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        embeddings_file = os.path.join(workdir, EMBEDDINGS)
+        records_file = os.path.join(workdir, RECORDS)
+        embeddings, rows = None, 0
+        with gzip.open(records_file, "wt", encoding="utf-8", compresslevel=6) as records:
+            for page in iter_collection(collection):
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                if embeddings is None:
+                    embeddings = np.lib.format.open_memmap(
+                        embeddings_file, mode="w+", dtype=np.float32, shape=(count, vectors.shape[1])
+                    )
+                if rows + len(vectors) > count:
+                    raise SnapshotError(f"Collection '{collection.name}' grew during export")
+                embeddings[rows:rows + len(vectors)] = vectors
+                for doc_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    records.write(json.dumps({"id": doc_id, "document": document, "metadata": metadata}) + "\n")
+                rows += len(vectors)
+        if rows != count:
+            raise SnapshotError(f"Collection '{collection.name}' changed during export ({rows} of {count} rows read)")
+        dimension = embeddings.shape[1]
+        embeddings.flush()
+        del embeddings
+
+        files = [EMBEDDINGS, RECORDS]
+        projection = load_projection(collection.name)
+        if projection is not None:
+            projection.save(os.path.join(workdir, PROJECTION))
+            files.append(PROJECTION)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "alias": alias,
+            "collection": collection.name,
+            "count": rows,
+            "dimension": int(dimension),
+            "dtype": "float32",
+            "hnsw": {p: hnsw[p] for p in (*BUILD_PARAMS, "ef_search") if p in hnsw},
+            "embedding_model": embedding_model_name(),
+            "projection": projection is not None,
+            "files": {
+                name: {"bytes": os.path.getsize(os.path.join(workdir, name)),
+                       "sha256": file_digest(os.path.join(workdir, name))}
+                for name in files
+            },
+        }
+        manifest_file = os.path.join(workdir, MANIFEST)
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        tmp_file = os.path.join(workdir, "snapshot.tar")
+        with tarfile.open(tmp_file, "w", format=tarfile.PAX_FORMAT) as tar:
+            for name in [MANIFEST, *files]:
+                tar.add(os.path.join(workdir, name), arcname=name)
+        os.replace(tmp_file, output_file)
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    logger.info(f"Exported {rows} rows of '{collection.name}' to {output_file}")
+    return manifest
+
+
+def open_snapshot(snapshot_file: str) -> tarfile.TarFile:
+    """
+    Opens a snapshot file for reading (it must be an uncompressed tar).
+    """
+    try:
+        return tarfile.open(snapshot_file, "r:")
+    except (OSError, tarfile.TarError) as e:
+        raise SnapshotError(f"Not a snapshot ({snapshot_file} is not an uncompressed tar): {e}")
+
+
+def read_manifest(tar: tarfile.TarFile) -> Dict[str, Any]:
+    """
+    Reads and checks the format and version of a snapshot's manifest.
+    """
+    try:
+        manifest = json.load(tar.extractfile(MANIFEST))
+    except (KeyError, ValueError) as e:
+        raise SnapshotError(f"Not a snapshot ({MANIFEST} missing or unreadable): {e}")
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unknown snapshot format '{manifest.get('format')}'")
+    if manifest.get("version", 0) > SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {manifest['version']} is newer than supported ({SNAPSHOT_VERSION})")
+    return manifest
+
+
+def verify_snapshot(tar: tarfile.TarFile, manifest: Dict[str, Any]):
+    """
+    Checks the size and SHA-256 of every file listed in the manifest.
+    """
+    for name, expected in manifest["files"].items():
+        member = tar.getmember(name)
+        sha = hashlib.sha256()
+        f = tar.extractfile(member)
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+        if member.size != expected["bytes"] or sha.hexdigest() != expected["sha256"]:
+            raise SnapshotError(f"Snapshot file {name} is corrupted (checksum mismatch)")
+
+
+def map_embeddings(snapshot_file: str, tar: tarfile.TarFile) -> np.ndarray:
+    """
+    Memory-maps embeddings.npy where it lies inside the (uncompressed) tar.
+    """
+    member = tar.getmember(EMBEDDINGS)
+    with open(snapshot_file, "rb") as f:
+        f.seek(member.offset_data)
+        major, _ = np.lib.format.read_magic(f)
+        shape, fortran_order, dtype = (np.lib.format.read_array_header_1_0 if major == 1
+                                       else np.lib.format.read_array_header_2_0)(f)
+        header_size = f.tell() - member.offset_data
+    if fortran_order:
+        raise SnapshotError(f"{EMBEDDINGS} must be C-contiguous")
+    return np.memmap(snapshot_file, dtype=dtype, mode="r", offset=member.offset_data + header_size, shape=shape)
+
+
+def rows_of(embeddings: np.memmap, start: int, n: int) -> np.ndarray:
+    """
+    A batch of mapped rows as a plain ndarray view (no copy); ChromaDB reads
+    np.memmap slices element by element through Python, ~20% of load time.
+    """
+    return np.asarray(embeddings[start:start + n]).view(np.ndarray)
+
+
+def load_snapshot(client, snapshot_file: str, name: str, verify: bool = True,
+                  batch_size: int = IMPORT_BATCH_SIZE) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Bulk-loads a snapshot into a new collection `name`, created with the
+    snapshot's HNSW build parameters, and restores its projection.
+    Returns the collection and the manifest.
+    """
+    with open_snapshot(snapshot_file) as tar:
+        manifest = read_manifest(tar)
+        if manifest.get("embedding_model") != embedding_model_name():
+            logger.warning(f"Snapshot embedded with '{manifest.get('embedding_model')}' but queries use "
+                           f"'{embedding_model_name()}'; retrieval will be degraded")
+        if verify:
+            verify_snapshot(tar, manifest)
+        embeddings = map_embeddings(snapshot_file, tar)
+        if embeddings.shape != (manifest["count"], manifest["dimension"]):
+            raise SnapshotError(f"{EMBEDDINGS} has shape {embeddings.shape}, manifest says "
+                                f"({manifest['count']}, {manifest['dimension']})")
+
+        # Build parameters come from the snapshot; this node's ef_search, if set, wins
+        hnsw = {**manifest.get("hnsw", {}), **hnsw_configuration(space=None, m=None, ef_construction=None)}
+        collection = get_or_create_collection(client, name, hnsw)
+        if collection.count():
+            raise SnapshotError(f"Collection '{name}' is not empty")
+        batch_size = min(batch_size, client.get_max_batch_size())
+        try:
+            # Before the first row, so syncs writing to the collection meanwhile project their vectors
+            if manifest.get("projection"):
+                save_projection(name, Projection.load(io.BytesIO(tar.extractfile(PROJECTION).read())))
+            rows = 0
+            ids, documents, metadatas = [], [], []
+            with gzip.open(tar.extractfile(RECORDS), "rt", encoding="utf-8") as records:
+                for line in records:
+                    record = json.loads(line)
+                    ids.append(record["id"])
+                    documents.append(record["document"])
+                    metadatas.append(record["metadata"])
+                    if len(ids) == batch_size:
+                        collection.add(ids=ids, embeddings=rows_of(embeddings, rows, len(ids)),
+                                       documents=documents, metadatas=metadatas)
+                        rows += len(ids)
+                        ids, documents, metadatas = [], [], []
+            if ids:
+                collection.add(ids=ids, embeddings=rows_of(embeddings, rows, len(ids)),
+                               documents=documents, metadatas=metadatas)
+                rows += len(ids)
+            if rows != manifest["count"]:
+                raise SnapshotError(f"{RECORDS} has {rows} rows, manifest says {manifest['count']}")
+        except BaseException:
+            client.delete_collection(name=name)
+            delete_projection(name)
+            raise
+    logger.info(f"Loaded {rows} rows from {snapshot_file} into '{name}'")
+    return collection, manifest
+
+
+def import_snapshot(client, snapshot_file: str, alias: str = COLLECTION_NAME, activate: bool = True,
+                    keep: int = 1, verify: bool = True,
+                    alias_file: str = ALIAS_FILE) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Loads a snapshot into a fresh versioned collection for `alias` and, with
+    activate, swaps the alias to it (as ingest.py --rebuild does).
+    The collection is not marked as building while it loads, so live syncs
+    are not mirrored into it: they would collide with the snapshot's rows.
+    Pages changed meanwhile are newer than the snapshot anyway and are
+    picked up by catch-up.
+    """
+    name = new_version_name(alias)
+    collection, manifest = load_snapshot(client, snapshot_file, name, verify)
+    if activate:
+        swap_alias(alias, name, alias_file)
+        garbage_collect(client, alias, keep=keep, alias_file=alias_file)
+    return collection, manifest
+
+
+def needs_snapshot(client, alias: str = COLLECTION_NAME, alias_file: str = ALIAS_FILE) -> bool:
+    """
+    True when the collection serving `alias` is missing or empty, e.g. on a
+    freshly provisioned node.
+    """
+    try:
+        return client.get_collection(name=resolve_alias(alias, alias_file)).count() == 0
+    except Exception:
+        return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export or import a portable index snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write the serving collection to a snapshot file")
+    export.add_argument("--collection", default=COLLECTION_NAME, help="Collection or alias to export")
+    export.add_argument("--output", help="Snapshot file (default <collection>-<timestamp>.snapshot.tar)")
+    load = commands.add_parser("import", help="Load a snapshot into a new collection version")
+    load.add_argument("snapshot", help="Snapshot file")
+    load.add_argument("--collection", default=COLLECTION_NAME, help="Alias to load the snapshot for")
+    load.add_argument("--activate", action="store_true", help="Swap the alias to the loaded collection")
+    load.add_argument("--keep", type=int, default=1, help="Old collection versions to keep after --activate")
+    load.add_argument("--no-verify", action="store_true", help="Skip checksum verification")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            collection = client.get_collection(name=resolve_alias(args.collection))
+            output = args.output or f"{args.collection}-{time.strftime('%Y%m%d%H%M%S')}.snapshot.tar"
+            manifest = export_snapshot(collection, output, alias=args.collection)
+            print(f"Exported {manifest['count']} chunks x {manifest['dimension']} dims to {output} "
+                  f"({os.path.getsize(output) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+        else:
+            collection, manifest = import_snapshot(client, args.snapshot, args.collection, args.activate,
+                                                   args.keep, verify=not args.no_verify)
+            print(f"Imported {manifest['count']} chunks into '{collection.name}' in {time.perf_counter() - start:.1f}s"
+                  + (f"; alias '{args.collection}' swapped" if args.activate else ""))
+    except SnapshotError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
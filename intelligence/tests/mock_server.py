@@ -1,11 +1,24 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
 import json
 import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 load_dotenv()
 PORT = int(os.getenv("LISTENER_PORT", 8000))
 
+# Vocabulary the synthetic page text is drawn from
+SYNTHETIC_WORDS = (
+    "adventure hiking surfing camping climbing skiing travel guide gear trail ocean mountain city "
+    "festival food coffee music culture museum magazine article team contact support faq booking "
+    "membership newsletter weather season summer winter family kids beginner expert tour map"
+).split()
+
 class SimpleHandler(BaseHTTPRequestHandler):
     def do_POST(self):
         content_length = int(self.headers['Content-Length'])
@@ -20,10 +33,256 @@ class SimpleHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(b"Mock Enrichment Server is Running. Waiting for POST updates...")
 
+class SyntheticSite:
+    """
+    Deterministic stand-in for an AEM site: `pages` pages in a tree under
+    `root` (`fanout` children per page), each with `components` text
+    components nested `depth` containers deep, `text_size` characters each.
+    """
+
+    def __init__(self, pages=100, depth=3, components=5, text_size=800, fanout=10,
+                 root="/content/synthetic", seed=42):
+        self.depth = depth
+        self.components = components
+        self.text_size = text_size
+        self.root = root
+        self.seed = seed
+        self.page_paths = [f"{root}/en"]
+        for i in range(1, pages):
+            parent = self.page_paths[(i - 1) // fanout]
+            self.page_paths.append(f"{parent}/page-{i}")
+        self._pages = set(self.page_paths)
+        # cq:lastModified per page (default `created`) and edit count per component
+        self.created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.modified = {}
+        self.versions = {}
+
+    def last_modified(self, path):
+        return self.modified.get(path, self.created)
+
+    def edit(self, path, component=0, when=None):
+        """
+        Rewrites one text component of a page and bumps its cq:lastModified
+        (by default to a minute after the latest modification). Returns the date.
+        """
+        self.versions[(path, component)] = self.versions.get((path, component), 0) + 1
+        self.modified[path] = when or max([self.created, *self.modified.values()]) + timedelta(minutes=1)
+        return self.modified[path]
+
+    def add_page(self, path):
+        """
+        Adds a page that keeps an old cq:lastModified, as moved or copied pages do.
+        """
+        self.page_paths.append(path)
+        self._pages.add(path)
+
+    def delete(self, path):
+        """
+        Deletes a page and its descendants. Returns the deleted paths.
+        """
+        deleted = [page for page in self.page_paths if page == path or page.startswith(path + "/")]
+        self.page_paths = [page for page in self.page_paths if page not in deleted]
+        self._pages.difference_update(deleted)
+        return deleted
+
+    def title(self, path):
+        rng = random.Random(f"{self.seed}:{path}:title")
+        return " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(3)).title()
+
+    def text(self, path, index):
+        version = self.versions.get((path, index), 0)
+        rng = random.Random(f"{self.seed}:{path}:{index}" + (f":v{version}" if version else ""))
+        words, size = [], 0
+        while size < self.text_size:
+            word = rng.choice(SYNTHETIC_WORDS)
+            words.append(word)
+            size += len(word) + 1
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        return f"<p>{' '.join(sentences)}</p>"
+
+    def model_json(self, path):
+        """
+        The page's .model.json, or None for unknown paths.
+        """
+        if path not in self._pages:
+            return None
+        items = {
+            f"text_{i}": {"text": self.text(path, i), ":type": "wknd/components/text"}
+            for i in range(self.components)
+        }
+        for level in range(self.depth):
+            items = {f"container_{level}": {":type": "wknd/components/container", ":items": items}}
+        return {
+            "jcr:content": {
+                "jcr:title": self.title(path),
+                "jcr:description": f"Synthetic page {path}",
+                "root": {":type": "wknd/components/container", ":items": items},
+            }
+        }
+
+    def query_hits(self, path, modified_since=None, dates=False):
+        """
+        Query Builder hits for `type=cq:Page` below `path`, optionally only
+        those modified at or after `modified_since` and with their
+        cq:lastModified (in the ECMAScript format AEM writes dates in).
+        """
+        prefix = path.rstrip("/") + "/"
+        hits = []
+        for page in self.page_paths:
+            if page != path and not page.startswith(prefix):
+                continue
+            if modified_since and self.last_modified(page) < modified_since:
+                continue
+            hit = {"jcr:path": page}
+            if dates:
+                hit["jcr:content/cq:lastModified"] = self.last_modified(page).strftime("%a %b %d %Y %H:%M:%S GMT%z")
+            hits.append(hit)
+        return hits
+
+    def sample_queries(self, n):
+        """
+        `n` query strings made of words that occur in the site's text.
+        """
+        rng = random.Random(f"{self.seed}:queries")
+        return [" ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(rng.randint(2, 5))) for _ in range(n)]
+
+def make_site_handler(site, quiet=True, delay=0.0):
+    """
+    Request handler serving `site` through the two AEM endpoints the crawler
+    uses: /bin/querybuilder.json (with daterange predicates on
+    cq:lastModified) and <page>.model.json, which takes `delay` seconds.
+    """
+    class SiteHandler(SimpleHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/bin/querybuilder.json":
+                params = parse_qs(url.query)
+                # daterange predicates of an OR group: the earliest lower bound wins
+                bounds = [datetime.fromisoformat(v[0]) for k, v in params.items() if k.endswith("daterange.lowerBound")]
+                hits = site.query_hits(params.get("path", ["/content"])[0], min(bounds) if bounds else None,
+                                       dates="cq:lastModified" in params.get("p.properties", [""])[0])
+                body = {"success": True, "results": len(hits), "total": len(hits), "hits": hits}
+            elif url.path.endswith(".model.json"):
+                time.sleep(delay)
+                body = site.model_json(url.path[:-len(".model.json")])
+            else:
+                body = None
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+    return SiteHandler
+
+def serve_site(site, host="127.0.0.1", port=0, delay=0.0):
+    """
+    Serves `site` from a background thread. Returns the running server;
+    its port is server.server_address[1], stop it with server.shutdown().
+    """
+    return serve_in_background(make_site_handler(site, delay=delay), host, port)
+
+class OllamaStub:
+    """
+    Stand-in for Ollama's /api/generate. Answers each prompt with
+    `answer(prompt)` (by default, echoing the question) after `delay`
+    seconds, streamed word by word as NDJSON when asked, and records the
+    prompts it received.
+    """
+
+    def __init__(self, answer=None, delay=0.0):
+        self.answer = answer or (lambda prompt: f"Answer to: {prompt.rsplit('Question: ', 1)[-1]}")
+        self.delay = delay
+        self.prompts = []
+
+    def messages(self, model, prompt, stream):
+        self.prompts.append(prompt)
+        time.sleep(self.delay)
+        answer = self.answer(prompt)
+        done = {"model": model, "response": "", "done": True, "eval_count": len(answer.split())}
+        if not stream:
+            return [{**done, "response": answer}]
+        words = answer.split(" ")
+        parts = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+        return [{"model": model, "response": part, "done": False} for part in parts] + [done]
+
+def make_ollama_handler(stub, quiet=True):
+    """
+    Request handler serving `stub` as POST /api/generate.
+    """
+    class OllamaHandler(SimpleHandler):
+        def do_POST(self):
+            if urlparse(self.path).path != "/api/generate":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            stream = body.get("stream", True)
+            messages = stub.messages(body.get("model", ""), body.get("prompt", ""), stream)
+            payload = "".join(json.dumps(m) + "\n" for m in messages) if stream else json.dumps(messages[0])
+            payload = payload.encode("utf-8")
+            self.send_response(200)
+            self.send_header('Content-type', 'application/x-ndjson' if stream else 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"Ollama is running")
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+    return OllamaHandler
+
+def serve_ollama(stub, host="127.0.0.1", port=0):
+    """
+    Serves `stub` from a background thread, like serve_site.
+    """
+    return serve_in_background(make_ollama_handler(stub), host, port)
+
+def serve_in_background(handler, host, port):
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock enrichment server, or a synthetic AEM site")
+    parser.add_argument("--synthetic-pages", type=int, default=0, help="Serve a synthetic AEM site with N pages instead")
+    parser.add_argument("--ollama", action="store_true", help="Serve a stand-in Ollama /api/generate instead")
+    parser.add_argument("--ollama-delay", type=float, default=1.0, help="Seconds the stand-in Ollama takes per answer")
+    parser.add_argument("--depth", type=int, default=3, help="Container nesting depth per page")
+    parser.add_argument("--components", type=int, default=5, help="Text components per page")
+    parser.add_argument("--text-size", type=int, default=800, help="Characters per text component")
+    parser.add_argument("--port", type=int, default=PORT)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    print(f"Starting mock enrichment server on port {PORT}...")
+    args = parse_args()
+    if args.ollama:
+        print(f"Serving a stand-in Ollama on port {args.port} ({args.ollama_delay}s per answer)...")
+        httpd = ThreadingHTTPServer(('localhost', args.port), make_ollama_handler(OllamaStub(delay=args.ollama_delay), quiet=False))
+    elif args.synthetic_pages:
+        site = SyntheticSite(args.synthetic_pages, args.depth, args.components, args.text_size)
+        print(f"Serving a synthetic AEM site of {args.synthetic_pages} pages under {site.root} on port {args.port}...")
+        httpd = ThreadingHTTPServer(('localhost', args.port), make_site_handler(site, quiet=False))
+    else:
+        print(f"Starting mock enrichment server on port {args.port}...")
+        httpd = HTTPServer(('localhost', args.port), SimpleHandler)
     print("Press Ctrl+C to stop.")
-    httpd = HTTPServer(('localhost', PORT), SimpleHandler)
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
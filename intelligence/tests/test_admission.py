@@ -0,0 +1,98 @@
+import unittest
+import asyncio
+import time
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.admission import AdmissionController, Deadline, DeadlineExceeded, Overloaded, parse_timeout_ms
+
+async def wait_until(predicate):
+    for _ in range(100):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+
+class TestAdmission(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sheds_when_queue_full(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit(Deadline(5)):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await wait_until(lambda: controller.active == 1)
+        queued = asyncio.create_task(hold())
+        await wait_until(lambda: controller.waiting == 1)
+
+        with self.assertRaises(Overloaded):
+            async with controller.admit(Deadline(5)):
+                pass
+
+        release.set()
+        await asyncio.gather(holder, queued)
+        stats = controller.stats()
+        self.assertEqual(stats["shed_queue_full"], 1)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["active"], 0)
+
+    async def test_queued_request_shed_at_deadline(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit(Deadline(5)):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await wait_until(lambda: controller.active == 1)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded) as ctx:
+            async with controller.admit(Deadline(0.05)):
+                pass
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(ctx.exception.stage, "admission")
+        self.assertEqual(controller.stats()["shed_deadline"], 1)
+
+        release.set()
+        await holder
+
+    async def test_deadline_run_times_out(self):
+        deadline = Deadline(0.05)
+        with self.assertRaises(DeadlineExceeded) as ctx:
+            await deadline.run("embedding", time.sleep, 0.5)
+        self.assertEqual(ctx.exception.stage, "embedding")
+
+    async def test_slot_held_until_abandoned_worker_finishes(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        deadline = Deadline(0.05)
+
+        with self.assertRaises(DeadlineExceeded):
+            async with controller.admit(deadline):
+                await deadline.run("search", time.sleep, 0.3)
+
+        self.assertEqual(controller.stats()["lingering"], 1)
+        with self.assertRaises(DeadlineExceeded):
+            async with controller.admit(Deadline(0.05)):
+                pass
+        await wait_until(lambda: controller.stats()["lingering"] == 0)
+        async with controller.admit(Deadline(1)):
+            self.assertEqual(controller.active, 1)
+
+    async def test_deadline_run_returns_result(self):
+        self.assertEqual(await Deadline(1).run("search", lambda x: x * 2, 21), 42)
+
+    def test_parse_timeout_ms(self):
+        self.assertEqual(parse_timeout_ms(None, 10000), 10.0)
+        self.assertEqual(parse_timeout_ms("250", 10000), 0.25)
+        self.assertEqual(parse_timeout_ms("60000", 10000), 10.0)
+        self.assertEqual(parse_timeout_ms("abc", 10000), 10.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import tempfile
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vector_store.collection import (
+    resolve_alias, building_collection, start_build, abort_build, swap_alias, garbage_collect
+)
+
+class TestCollectionAlias(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.alias_file = os.path.join(self.tmp.name, "aliases.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unaliased_name_resolves_to_itself(self):
+        self.assertEqual(resolve_alias("aem_content", self.alias_file), "aem_content")
+        self.assertIsNone(building_collection("aem_content", self.alias_file))
+
+    def test_build_and_swap(self):
+        start_build("aem_content", "aem_content__v1", self.alias_file)
+        # Still serving the original while the new version builds
+        self.assertEqual(resolve_alias("aem_content", self.alias_file), "aem_content")
+        self.assertEqual(building_collection("aem_content", self.alias_file), "aem_content__v1")
+
+        previous = swap_alias("aem_content", "aem_content__v1", self.alias_file)
+        self.assertEqual(previous, "aem_content")
+        self.assertEqual(resolve_alias("aem_content", self.alias_file), "aem_content__v1")
+        self.assertIsNone(building_collection("aem_content", self.alias_file))
+
+    def test_abort_build(self):
+        start_build("aem_content", "aem_content__v1", self.alias_file)
+        abort_build("aem_content", self.alias_file)
+        self.assertIsNone(building_collection("aem_content", self.alias_file))
+        self.assertEqual(resolve_alias("aem_content", self.alias_file), "aem_content")
+
+    def test_garbage_collect_keeps_current_and_rollback(self):
+        swap_alias("aem_content", "aem_content__v3", self.alias_file)
+        client = MagicMock()
+        client.list_collections.return_value = [
+            "aem_content", "aem_content__v1", "aem_content__v2", "aem_content__v3", "other"
+        ]
+
+        deleted = garbage_collect(client, "aem_content", keep=1, alias_file=self.alias_file)
+
+        self.assertEqual(deleted, ["aem_content__v1", "aem_content"])
+        client.delete_collection.assert_any_call(name="aem_content__v1")
+        client.delete_collection.assert_any_call(name="aem_content")
+
+if __name__ == '__main__':
+    unittest.main()
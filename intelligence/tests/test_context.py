@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.crawler.crawler import splitter
+from src.vector_store.context import PackingStats, assemble_context, count_tokens, merge_chunks
+from tests.mock_server import SyntheticSite
+
+
+def page_chunks():
+    site = SyntheticSite(pages=1, text_size=2000)
+    text = site.text(site.page_paths[0], 0)
+    return text, splitter.split_text(text)
+
+
+def test_merge_chunks_removes_splitter_overlap():
+    text, chunks = page_chunks()
+    assert len(chunks) > 2
+    assert sum(len(c) for c in chunks) > len(text)
+    assert merge_chunks(chunks) == text
+
+
+def test_adjacent_chunks_share_one_block():
+    _, chunks = page_chunks()
+    documents = [chunks[2], chunks[0], "Opening hours are 9 to 5.", chunks[1]]
+    metadatas = [
+        {"source": "/content/a", "chunk_id": 2, "title": "A"},
+        {"source": "/content/a", "chunk_id": 0, "title": "A"},
+        {"source": "/content/b", "chunk_id": 4},
+        {"source": "/content/a", "chunk_id": 1, "title": "A"},
+    ]
+
+    packed = assemble_context(documents, metadatas, [0.1, 0.2, 0.3, 0.4], token_budget=10000)
+
+    assert packed.text == (f"Source: /content/a\nContent: {merge_chunks(chunks[:3])}"
+                           "\n\nSource: /content/b\nContent: Opening hours are 9 to 5.")
+    assert [(s["source"], s["chunks"], s["distance"]) for s in packed.sources] == [
+        ("/content/a", [0, 1, 2], 0.1), ("/content/b", [4], 0.3)
+    ]
+    assert packed.tokens == count_tokens(packed.text)
+    assert packed.tokens_saved > 0
+
+
+def test_non_adjacent_chunks_are_kept_apart():
+    packed = assemble_context(
+        ["first part", "later part"],
+        [{"source": "/content/a", "chunk_id": 5}, {"source": "/content/a", "chunk_id": 1}],
+        token_budget=10000
+    )
+    assert packed.text == "Source: /content/a\nContent: later part\n...\nfirst part"
+
+
+def test_budget_truncates_then_drops_pages():
+    documents = ["word " * 400, "other " * 400, "third " * 400]
+    metadatas = [{"source": f"/content/{i}", "chunk_id": 0} for i in range(3)]
+
+    packed = assemble_context(documents, metadatas, token_budget=700)
+
+    assert packed.tokens <= 700
+    assert [s["truncated"] for s in packed.sources] == [False, True]
+    assert packed.dropped == 1
+    assert packed.text.endswith(" ...")
+
+    stats = PackingStats()
+    stats.record(packed)
+    assert stats.stats()["truncated"] == 1 and stats.stats()["dropped_sources"] == 1
+    assert stats.stats()["tokens_saved"] == packed.raw_tokens - packed.tokens
+
+
+def test_chunks_without_ids_are_not_merged():
+    packed = assemble_context(["alpha", "alpha", "beta"], [{"source": "/content/a"}] * 3)
+    assert packed.text == "Source: /content/a\nContent: alpha\n...\nalpha\n...\nbeta"
+    assert packed.sources[0]["chunks"] == []
@@ -1,11 +1,19 @@
+import asyncio
 import unittest
 import sys
 import os
+from unittest.mock import patch
+
+import httpx
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from src.crawler.crawler import splitter, CHUNK_SIZE, CHUNK_OVERLAP
+from src.crawler.crawler import (
+    splitter, CHUNK_SIZE, FetchError, chunk_doc_id, crawl_pages, extract_components, page_records,
+    process_page, search_pages
+)
+from tests.mock_server import SyntheticSite, serve_site
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 class TestCrawlerSplitting(unittest.TestCase):
@@ -36,5 +44,100 @@ class TestCrawlerSplitting(unittest.TestCase):
         for chunk in chunks:
             self.assertTrue(len(chunk) <= 650)
 
+def model(texts):
+    return {"jcr:content": {"jcr:title": "Page", "root": {":items": {
+        name: {":type": "wknd/components/text", "text": text} for name, text in texts.items()
+    }}}}
+
+class TestComponentChunks(unittest.TestCase):
+
+    def test_component_paths_follow_model_tree(self):
+        components = extract_components({"jcr:title": "T", "root": {":items": {
+            "teaser": {"jcr:title": "Teaser", "jcr:description": "More"},
+            "list": {"items": [{"value": "First"}]},
+        }}})
+        self.assertEqual(components, [
+            ("jcr:content", ["T"]),
+            ("jcr:content/root/teaser", ["Teaser", "More"]),
+            ("jcr:content/root/list/items/0", ["First"]),
+        ])
+
+    def test_small_components_share_chunks_and_long_ones_split_alone(self):
+        records = page_records("/content/a", model({"intro": "Short intro.", "body": "Body text. " * 100,
+                                                    "outro": "Short outro."}))
+        components = [r["metadata"]["component"] for r in records]
+
+        self.assertEqual(components[0], "jcr:content")
+        self.assertTrue(records[0]["text"].startswith("Page\n\nShort intro."))
+        self.assertEqual(components[1:-1], ["jcr:content/root/body"] * (len(records) - 2))
+        self.assertEqual(records[-1]["text"], "Short outro.")
+        self.assertEqual([r["chunk_id"] for r in records], list(range(len(records))))
+        self.assertTrue(all(len(r["text"]) <= CHUNK_SIZE for r in records))
+
+    def test_edit_changes_only_the_edited_components_chunks(self):
+        texts = {f"text_{i}": f"Paragraph {i}. " + "Some words here. " * (10 + 20 * (i % 3)) for i in range(6)}
+        before = page_records("/content/a", model(texts))
+        texts["text_1"] = texts["text_1"].replace("Some", "Several", 1)
+        after = page_records("/content/a", model(texts))
+
+        changed = {chunk_doc_id(r) for r in after} - {chunk_doc_id(r) for r in before}
+        self.assertTrue(changed)
+        self.assertEqual({r["metadata"]["component"] for r in after if chunk_doc_id(r) in changed},
+                         {"jcr:content/root/text_1"})
+        self.assertEqual(chunk_doc_id(after[0]), f"/content/a/{after[0]['chunk_key']}")
+        self.assertEqual(chunk_doc_id({"source": "/content/a", "chunk_id": 3}), "/content/a_3")
+
+    def test_length_change_keeps_other_components_chunks(self):
+        sizes = [300] * 12, [40, 300, 90, 120, 700, 60, 250, 30, 30, 400, 150, 300]
+        for lengths in sizes:
+            texts = {f"text_{i}": (f"Component {i} " + "words " * 200)[:n] for i, n in enumerate(lengths)}
+            before = page_records("/content/a", model(texts))
+            texts["text_0"] += " Another sentence added to the first component." * 2
+            after = page_records("/content/a", model(texts))
+
+            kept = [chunk_doc_id(r) for r in before if not r["text"].startswith(("Page", "Component 0 "))]
+            self.assertTrue(set(kept) <= {chunk_doc_id(r) for r in after}, lengths)
+
+class TestSyntheticSiteCrawl(unittest.TestCase):
+
+    def test_crawl_synthetic_site(self):
+        site = SyntheticSite(pages=12, depth=2, components=3, text_size=700, fanout=3)
+        server = serve_site(site)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        async def crawl():
+            async with httpx.AsyncClient() as client:
+                pages = await search_pages(client, site.root)
+                return pages, await crawl_pages(client, pages, concurrency=4)
+
+        try:
+            with patch("src.crawler.crawler.AEM_BASE_URL", base_url), \
+                 patch("src.crawler.crawler.QUERY_BUILDER_URL", f"{base_url}/bin/querybuilder.json"):
+                pages, results = asyncio.run(crawl())
+        finally:
+            server.shutdown()
+
+        self.assertEqual(pages, site.page_paths)
+        self.assertEqual(pages[4], "/content/synthetic/en/page-1/page-4")
+        for page, records in zip(pages, results):
+            # 3 components of 700 chars cannot fit in fewer than 4 chunks
+            self.assertGreaterEqual(len(records), 4)
+            self.assertEqual(records[0]["source"], page)
+            self.assertEqual(records[0]["metadata"]["title"], site.title(page))
+
+    def test_fetch_errors_are_distinct_from_missing_pages(self):
+        statuses = {"/content/missing.model.json": 404, "/content/broken.model.json": 503}
+        transport = httpx.MockTransport(lambda request: httpx.Response(statuses[request.url.path]))
+
+        async def fetch(page, raise_errors):
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await process_page(client, page, raise_errors=raise_errors)
+
+        with patch("src.crawler.crawler.AEM_BASE_URL", "http://aem"):
+            self.assertEqual(asyncio.run(fetch("/content/missing", True)), [])
+            self.assertEqual(asyncio.run(fetch("/content/broken", False)), [])
+            with self.assertRaises(FetchError):
+                asyncio.run(fetch("/content/broken", True))
+
 if __name__ == '__main__':
     unittest.main()
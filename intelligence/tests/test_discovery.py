@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import chromadb
+import httpx
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.crawler.discovery import hit_dates, parse_date, plan_catch_up, read_mark, save_mark
+from tests.mock_server import SyntheticSite, serve_site
+
+
+def test_parse_date_formats():
+    expected = datetime(2024, 1, 23, 9, 0, tzinfo=timezone.utc)
+    assert parse_date("2024-01-23T10:00:00.000+01:00") == expected
+    assert parse_date("2024-01-23T09:00:00Z") == expected
+    assert parse_date("Tue Jan 23 2024 10:00:00 GMT+0100") == expected
+    assert parse_date("2024-01-23T09:00:00") == expected
+    assert parse_date("yesterday") is None and parse_date(None) is None
+
+    assert hit_dates({"jcr:content/cq:lastModified": "2024-01-23T09:00:00Z"}) == [expected]
+    assert hit_dates({"jcr:content": {"cq:lastReplicated": "2024-01-23T09:00:00Z"}}) == [expected]
+
+
+def test_marks_are_kept_per_root(tmp_path):
+    state_file = str(tmp_path / "state" / "discovery.json")
+    assert read_mark("/content", state_file) is None
+
+    save_mark("/content", datetime(2024, 5, 1, tzinfo=timezone.utc), state_file)
+    save_mark("/content/dam", datetime(2024, 6, 1, tzinfo=timezone.utc), state_file)
+
+    assert read_mark("/content", state_file) == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert read_mark("/content/dam", state_file) == datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def site():
+    site = SyntheticSite(pages=12, fanout=3, components=2, text_size=100)
+    server = serve_site(site)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    with patch("src.crawler.crawler.QUERY_BUILDER_URL", f"{base_url}/bin/querybuilder.json"):
+        yield site
+    server.shutdown()
+
+
+def indexed_collection(pages):
+    collection = chromadb.EphemeralClient().create_collection(f"discovery-{uuid.uuid4().hex}")
+    collection.add(ids=pages, embeddings=[[1.0, 0.0]] * len(pages), metadatas=[{"source": p} for p in pages])
+    return collection
+
+
+def run_plan(collection, root, since):
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await plan_catch_up(client, collection, root, since, overlap_seconds=0)
+    return asyncio.run(run())
+
+
+def test_plan_finds_modified_added_and_deleted_pages(site):
+    collection = indexed_collection(site.page_paths)
+    root = site.root
+
+    first = run_plan(collection, root, None)
+    assert first["modified"] == site.page_paths and first["mark"] is not None
+
+    since = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert run_plan(collection, root, since) == {"since": since, "mark": since, "modified": [], "added": [],
+                                                 "deleted": []}
+
+    edited = [site.page_paths[7], site.page_paths[10]]
+    last = [site.edit(page, when=datetime(2024, 6, 2, hour, tzinfo=timezone.utc)) for hour, page in enumerate(edited)][-1]
+    deleted = site.delete(site.page_paths[1])
+    site.add_page(f"{root}/en/moved")
+
+    plan = run_plan(collection, root, since)
+
+    assert plan["modified"] == edited
+    assert plan["added"] == [f"{root}/en/moved"]
+    assert plan["deleted"] == sorted(deleted) and len(deleted) > 1
+    assert plan["mark"] == last
+
+
+def test_plan_skips_deletions_when_nothing_is_listed(site):
+    plan = run_plan(indexed_collection(site.page_paths), "/content/elsewhere", None)
+    assert plan == {"since": None, "mark": None, "modified": [], "added": [], "deleted": []}
@@ -1,14 +1,56 @@
+import importlib.util
+import json
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import os
 
+import numpy as np
+
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 # Mock env vars before importing logic that might use them at module level (though our logic puts them in functions)
 with patch.dict(os.environ, {"OPENAI_API_KEY": "dummy-key"}):
     from src.utils.embeddings import get_embedding_model, compute_embeddings, compute_query_embedding
+from src.utils.embeddings import ONNX_CONFIG_FILE, ONNX_MODEL_DIR, OnnxEmbeddingModel
+
+HAS_ONNX_EXPORT = all(importlib.util.find_spec(name) for name in ("onnx", "onnxruntime"))
+HAS_EXPORTED_MODEL = os.path.exists(os.path.join(ONNX_MODEL_DIR, ONNX_CONFIG_FILE))
+
+PARITY_TEXTS = [
+    "What is WKND?",
+    "hiking the mountain trail in winter",
+    "The festival of music and culture in the city is a guide to food and coffee. " * 8,
+    "",
+]
+
+def cosine_similarities(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return (a * b).sum(axis=1) / np.linalg.norm(a, axis=1) / np.linalg.norm(b, axis=1)
+
+def build_tiny_sentence_transformer(path):
+    """
+    Saves a small randomly initialised BERT sentence-transformer (no download).
+    """
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+
+    words = "what is wknd hiking the mountain trail in winter festival of music and culture city a guide to food coffee".split()
+    letters = list("abcdefghijklmnopqrstuvwxyz")
+    hf_path = os.path.join(path, "hf")
+    os.makedirs(hf_path)
+    with open(os.path.join(hf_path, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", ".", "?"] + words + letters + [f"##{c}" for c in letters]))
+    tokenizer = BertTokenizerFast(vocab_file=os.path.join(hf_path, "vocab.txt"))
+    config = BertConfig(vocab_size=tokenizer.vocab_size, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(hf_path)
+    tokenizer.save_pretrained(hf_path)
+    modules = [models.Transformer(hf_path, max_seq_length=64), models.Pooling(32, "mean"), models.Normalize()]
+    SentenceTransformer(modules=modules, device="cpu").save(os.path.join(path, "st"))
+    return os.path.join(path, "st")
 
 class TestEmbeddings(unittest.TestCase):
 
@@ -44,5 +86,37 @@ class TestEmbeddings(unittest.TestCase):
             mock_model.embed_documents.assert_called_with(["text"])
             self.assertEqual(result, [[0.1, 0.2]])
 
+class TestOnnxEmbeddings(unittest.TestCase):
+
+    @unittest.skipUnless(HAS_ONNX_EXPORT, "onnx and onnxruntime are required for export")
+    def test_exported_model_matches_torch(self):
+        from sentence_transformers import SentenceTransformer
+        from src.utils.onnx_export import export_model
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = build_tiny_sentence_transformer(tmp)
+            output_dir = os.path.join(tmp, "onnx")
+            export_model(model_path, output_dir)
+            reference = SentenceTransformer(model_path, device="cpu").encode(PARITY_TEXTS)
+
+            with open(os.path.join(output_dir, ONNX_CONFIG_FILE)) as f:
+                self.assertEqual(json.load(f)["pooling"], "mean")
+            fp32 = OnnxEmbeddingModel(output_dir, "model.onnx").encode(PARITY_TEXTS, batch_size=2)
+            int8 = OnnxEmbeddingModel(output_dir).encode(PARITY_TEXTS)
+
+        self.assertEqual(fp32.shape, reference.shape)
+        self.assertGreater(cosine_similarities(fp32, reference).min(), 0.9999)
+        self.assertGreater(cosine_similarities(int8, reference).min(), 0.99)
+
+    @unittest.skipUnless(HAS_EXPORTED_MODEL, f"no exported model in {ONNX_MODEL_DIR}")
+    def test_exported_local_model_parity(self):
+        from sentence_transformers import SentenceTransformer
+
+        with open(os.path.join(ONNX_MODEL_DIR, ONNX_CONFIG_FILE)) as f:
+            source_model = json.load(f)["source_model"]
+        reference = SentenceTransformer(source_model, device="cpu").encode(PARITY_TEXTS)
+        onnx = OnnxEmbeddingModel(ONNX_MODEL_DIR).encode(PARITY_TEXTS)
+        self.assertGreater(cosine_similarities(onnx, reference).min(), 0.99)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.cache import SemanticCache
+from src.utils.generation import GenerationError, build_prompt, generate, sources_fingerprint, stream_generate
+from tests.mock_server import OllamaStub, serve_ollama
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_semantic_cache_matches_similar_embeddings_with_same_key():
+    cache = SemanticCache(8, 60, threshold=0.9)
+    cache.put([1.0, 0.0], "sources-a", ["/content/a"], "answer a")
+
+    assert cache.get([0.99, 0.05], "sources-a")[0] == "answer a"
+    assert cache.get([0.99, 0.05], "sources-b") is None
+    assert cache.get([0.5, 0.5], "sources-a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_semantic_cache_invalidates_by_source_and_expires():
+    clock = FakeClock()
+    cache = SemanticCache(2, 60, threshold=0.9, clock=clock)
+    cache.put([1.0, 0.0], "k", ["/content/site/a", "/content/site/b"], "ab")
+    cache.put([0.0, 1.0], "k", ["/content/other"], "other")
+
+    assert cache.invalidate("/content/site/b") == 1
+    assert cache.get([1.0, 0.0], "k") is None
+    assert cache.invalidate("/content/site", subtree=True) == 0
+    assert cache.invalidate("/content", subtree=True) == 1
+    assert len(cache) == 0
+
+    cache.put([1.0, 0.0], "k", [], "fresh")
+    clock.now = 61
+    assert cache.get([1.0, 0.0], "k") is None
+
+    for i in range(3):
+        cache.put([1.0, float(i)], f"k{i}", [], i)
+    assert len(cache) == 2 and cache.get([1.0, 0.0], "k0") is None
+
+
+def test_sources_fingerprint_and_prompt():
+    sources = [{"source": "/content/a", "chunks": [0, 1]}]
+    assert sources_fingerprint(sources) == sources_fingerprint([dict(s) for s in sources])
+    assert sources_fingerprint(sources) != sources_fingerprint([{"source": "/content/a", "chunks": [0]}])
+    assert "Question: why?" in build_prompt("why?", "Source: /content/a")
+    assert build_prompt("why?", "") == "why?"
+
+
+@pytest.fixture
+def ollama():
+    stub = OllamaStub()
+    server = serve_ollama(stub)
+    yield stub, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_generate_against_stand_in_ollama(ollama):
+    stub, url = ollama
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            body = await generate(client, build_prompt("what is wknd", "ctx"), "llama3.1", url=url)
+            streamed = [m async for m in stream_generate(client, "plain question", "llama3.1", url=url)]
+        return body, streamed
+
+    body, streamed = asyncio.run(run())
+    assert body["response"] == "Answer to: what is wknd"
+    assert "".join(m["response"] for m in streamed) == "Answer to: plain question"
+    assert streamed[-1]["done"] and not streamed[0]["done"]
+    assert len(stub.prompts) == 2
+
+
+def test_generate_raises_when_ollama_is_down():
+    async def run():
+        async with httpx.AsyncClient() as client:
+            await generate(client, "q", url="http://127.0.0.1:9")
+
+    with pytest.raises(GenerationError):
+        asyncio.run(run())
@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vector_store.collection import hnsw_configuration, get_or_create_collection
+from src.vector_store.evaluation import exact_top_k, recall_at_k, latency_percentiles
+
+class TestHnswConfiguration(unittest.TestCase):
+
+    def test_only_set_parameters_are_included(self):
+        self.assertEqual(hnsw_configuration(None, None, None, None), {})
+        self.assertEqual(
+            hnsw_configuration("cosine", "32", "200", "64"),
+            {"space": "cosine", "max_neighbors": 32, "ef_construction": 200, "ef_search": 64}
+        )
+
+    def test_existing_collection_gets_search_ef(self):
+        client = MagicMock()
+        collection = client.get_or_create_collection.return_value
+        collection.configuration = {"hnsw": {"space": "l2", "ef_search": 100}}
+
+        get_or_create_collection(client, "aem_content", hnsw={"ef_search": 50})
+
+        client.get_or_create_collection.assert_called_with(name="aem_content", configuration={"hnsw": {"ef_search": 50}})
+        collection.modify.assert_called_with(configuration={"hnsw": {"ef_search": 50}})
+
+    def test_defaults_leave_configuration_unset(self):
+        client = MagicMock()
+        client.get_or_create_collection.return_value.configuration = {}
+
+        get_or_create_collection(client, "aem_content", hnsw={})
+
+        client.get_or_create_collection.assert_called_with(name="aem_content", configuration=None)
+
+class TestEvaluation(unittest.TestCase):
+
+    def test_exact_top_k_l2(self):
+        corpus = np.array([[0.0, 0.0], [1.0, 0.0], [5.0, 5.0]])
+        queries = np.array([[0.9, 0.0], [4.0, 4.0]])
+        result = exact_top_k(corpus, queries, 2)
+        self.assertEqual(result.tolist(), [[1, 0], [2, 1]])
+
+    def test_exact_top_k_cosine(self):
+        corpus = np.array([[1.0, 0.0], [0.0, 10.0], [1.0, 1.0]])
+        result = exact_top_k(corpus, np.array([[0.0, 1.0]]), 1, space="cosine")
+        self.assertEqual(result.tolist(), [[1]])
+
+    def test_recall_at_k(self):
+        self.assertEqual(recall_at_k([["a", "b"]], [["a", "b"]], 2), 1.0)
+        self.assertEqual(recall_at_k([["a", "x"], ["y", "z"]], [["a", "b"], ["c", "d"]], 2), 0.25)
+
+    def test_latency_percentiles(self):
+        stats = latency_percentiles(list(range(1, 101)), (50, 99))
+        self.assertAlmostEqual(stats["p50"], 50.5)
+        self.assertGreater(stats["p99"], 99)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import uuid
+
+import chromadb
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.crawler.crawler import page_records
+from src.vector_store.ingest import ingest_file
+
+
+class ConstantModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def write_crawl(path, texts):
+    pages = {
+        "/content/site/a": {"jcr:content": {"jcr:title": "A", "root": {":items": {
+            name: {"text": text} for name, text in texts.items()
+        }}}},
+        "/content/site/b": {"jcr:content": {"jcr:title": "B", "root": {":items": {"text": {"text": "Page b."}}}}},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        for page, data in pages.items():
+            for record in page_records(page, data):
+                f.write(json.dumps(record) + "\n")
+
+
+def test_reingest_removes_chunks_of_edited_components(tmp_path):
+    input_file = str(tmp_path / "output.jsonl")
+    collection = chromadb.EphemeralClient().create_collection(f"ingest_{uuid.uuid4().hex[:8]}")
+    texts = {f"text_{i}": f"Paragraph {i}. " + "Some words here. " * 40 for i in range(3)}
+    write_crawl(input_file, texts)
+    ingest_file(collection, ConstantModel(), input_file)
+    before = collection.count()
+
+    texts["text_1"] = "Rewritten paragraph."
+    write_crawl(input_file, texts)
+    ingest_file(collection, ConstantModel(), input_file)
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        expected = sorted(json.loads(line)["text"] for line in f)
+    assert sorted(collection.get(include=["documents"])["documents"]) == expected
+    assert collection.count() < before
+
+
+def test_reingest_embeds_only_changed_components(tmp_path):
+    input_file = str(tmp_path / "output.jsonl")
+    collection = chromadb.EphemeralClient().create_collection(f"ingest_{uuid.uuid4().hex[:8]}")
+    texts = {f"text_{i}": f"Paragraph {i}. " + "Some words here. " * 40 for i in range(3)}
+    write_crawl(input_file, texts)
+    ingest_file(collection, ConstantModel(), input_file)
+
+    texts["text_1"] = "Rewritten paragraph. " + "Other words here. " * 40
+    write_crawl(input_file, texts)
+    model = ConstantModel()
+    ingest_file(collection, model, input_file)
+
+    # Only the two chunks of the rewritten component are new
+    assert len(model.encoded) == 2 and all("Other words here." in text for text in model.encoded)
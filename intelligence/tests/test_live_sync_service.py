@@ -4,20 +4,40 @@ from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch, AsyncMock
 import sys
 import os
+import json
+import httpx
+import uuid
+from datetime import datetime, timezone
+
+import chromadb
+import numpy as np
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from src.crawler.live_sync_service import app, AppState
+from src.crawler.crawler import FetchError, page_records
+from src.crawler.discovery import CATCH_UP_ROOT, read_mark
+from src.crawler.live_sync_service import app, AppState, COLLECTION_NAME, active_collection, index_changed
+from src.crawler.reconcile import SourceIndex
+from src.analysis.sketches import SpaceSaving
+from src.utils.admission import DeadlineExceeded
+from src.utils.cache import SemanticCache, TTLCache
+from src.vector_store.context import PackedContext
+from src.vector_store.query import pack_results
+from tests.mock_server import OllamaStub, serve_ollama
 
 client = TestClient(app)
 
 @pytest.fixture
 def mock_dependencies():
-    with patch("src.crawler.live_sync_service.state") as mock_state:
+    with patch("src.crawler.live_sync_service.state") as mock_state, \
+         patch("src.crawler.live_sync_service.retrieval_cache", TTLCache(16, 60)), \
+         patch("src.crawler.live_sync_service.query_stats", SpaceSaving(16)), \
+         patch("src.crawler.live_sync_service.source_index", SourceIndex()):
         # Mock ChromaDB
         mock_state.chroma_client = MagicMock()
         mock_state.collection = MagicMock()
+        mock_state.collection_name = COLLECTION_NAME
         
         # Mock SentenceTransformer
         mock_state.model = MagicMock()
@@ -74,6 +94,17 @@ def test_sync_endpoint_no_content(mock_process_page, mock_dependencies):
     assert data["status"] == "success"
     assert data["chunks_processed"] == 0
 
+@patch("src.crawler.live_sync_service.process_page")
+def test_sync_page_without_content_removes_its_chunks(mock_process_page, mock_dependencies):
+    mock_process_page.return_value = []
+    mock_dependencies.collection.get.return_value = {"ids": ["/content/test_0", "/content/test_1"]}
+
+    data = client.post("/api/v1/sync", json={"path": "/content/test"}).json()
+
+    assert data["message"] == "no content extracted" and data["chunks_removed"] == 2
+    mock_dependencies.collection.delete.assert_called_once_with(ids=["/content/test_0", "/content/test_1"])
+    mock_dependencies.model.encode.assert_not_called()
+
 def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
@@ -87,3 +118,438 @@ def test_invalid_path():
     
     assert response.status_code == 200
     assert response.json()["status"] == "ignored"
+
+def test_chat_scope_pushdown(mock_dependencies):
+    mock_dependencies.collection.query.return_value = {
+        "documents": [["Scoped Content"]],
+        "metadatas": [[{"source": "/content/wknd/us/en"}]]
+    }
+
+    response = client.post(
+        "/api/v1/chat",
+        json={"message": "hello", "scope": "/content/wknd/us/en"}
+    )
+
+    assert response.status_code == 200
+    assert "Scoped Content" in response.json()["content"]
+    _, kwargs = mock_dependencies.collection.query.call_args
+    assert kwargs["where"] == {"path_4": "/content/wknd/us/en"}
+
+def test_chat_invalid_scope(mock_dependencies):
+    response = client.post(
+        "/api/v1/chat",
+        json={"message": "hello", "scope": "/apps/wknd"}
+    )
+
+    assert response.status_code == 400
+
+@patch("src.crawler.live_sync_service.retrieve_contexts")
+def test_batch_context_endpoint(mock_contexts, mock_dependencies):
+    mock_contexts.return_value = [PackedContext("ctx 1"), PackedContext("ctx 2")]
+
+    response = client.post(
+        "/api/v1/context/batch",
+        json={"queries": ["first", "second"]}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"contexts": ["ctx 1", "ctx 2"], "sources": [[], []]}
+    args, kwargs = mock_contexts.call_args
+    assert args == (["first", "second"],)
+    assert kwargs["scope"] is None
+
+def test_batch_context_rejects_empty(mock_dependencies):
+    response = client.post("/api/v1/context/batch", json={"queries": []})
+    assert response.status_code == 400
+
+def test_metrics_exposes_admission_counters():
+    response = client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    admission = response.json()["admission"]
+    assert "shed_queue_full" in admission
+    assert "shed_deadline" in admission
+    assert "hit_rate" in response.json()["retrieval_cache"]
+
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_context_deadline_exceeded(mock_context, mock_dependencies):
+    import time
+    mock_context.side_effect = lambda *args, **kwargs: time.sleep(0.5)
+
+    response = client.post(
+        "/api/v1/context",
+        json={"query": "slow"},
+        headers={"X-Request-Timeout-Ms": "50"}
+    )
+
+    assert response.status_code == 504
+
+def test_sync_removed_event_deletes_subtree(mock_dependencies):
+    mock_dependencies.collection.get.return_value = {"ids": ["/content/test_0", "/content/test/child_0"]}
+
+    response = client.post(
+        "/api/v1/sync",
+        json={"path": "/content/test", "type": "REMOVED"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["chunks_deleted"] == 2
+    _, kwargs = mock_dependencies.collection.get.call_args
+    assert kwargs["where"] == {"$or": [{"source": "/content/test"}, {"path_2": "/content/test"}]}
+    mock_dependencies.collection.delete.assert_called_once_with(ids=["/content/test_0", "/content/test/child_0"])
+
+@patch("src.crawler.live_sync_service.process_page")
+def test_sync_removed_component_resyncs_page(mock_process_page, mock_dependencies):
+    mock_process_page.return_value = []
+
+    response = client.post(
+        "/api/v1/sync",
+        json={"path": "/content/test/jcr:content/root/text", "event": "REMOVED"}
+    )
+
+    assert response.status_code == 200
+    mock_process_page.assert_called_once_with(mock_dependencies.http_client, "/content/test", raise_errors=True)
+    mock_dependencies.collection.delete.assert_not_called()
+
+@patch("src.crawler.live_sync_service.process_page")
+def test_sync_removes_stale_chunks(mock_process_page, mock_dependencies):
+    mock_process_page.return_value = [
+        {"text": "Only chunk", "source": "/content/test", "chunk_id": 0, "metadata": {}}
+    ]
+    mock_dependencies.collection.get.return_value = {"ids": ["/content/test_0", "/content/test_1"]}
+
+    response = client.post("/api/v1/sync", json={"path": "/content/test"})
+
+    assert response.status_code == 200
+    mock_dependencies.collection.delete.assert_called_once_with(ids=["/content/test_1"])
+
+@patch("src.crawler.live_sync_service.process_page")
+def test_sync_embeds_only_chunks_of_edited_components(mock_process_page, mock_dependencies):
+    texts = {f"text_{i}": f"Paragraph {i}. " + "Some words here. " * 40 for i in range(4)}
+
+    def page():
+        return page_records("/content/test", {"jcr:content": {"jcr:title": "Test", "root": {":items": {
+            name: {"text": text} for name, text in texts.items()
+        }}}})
+
+    embedded = []
+    mock_dependencies.model.encode.side_effect = lambda docs: embedded.extend(docs) or np.ones((len(docs), 3))
+    mock_dependencies.collection = chromadb.EphemeralClient().create_collection(f"sync-{uuid.uuid4().hex}")
+
+    before = page()
+    mock_process_page.return_value = before
+    first = client.post("/api/v1/sync", json={"path": "/content/test"}).json()
+    texts["text_2"] = texts["text_2"].replace("Some", "Other", 1)
+    mock_process_page.return_value = page()
+    second = client.post("/api/v1/sync", json={"path": "/content/test/jcr:content/root/text_2"}).json()
+    unchanged = client.post("/api/v1/sync", json={"path": "/content/test"}).json()
+
+    edited = [r for r in page() if r["text"] not in {b["text"] for b in before}]
+    assert first["chunks_upserted"] == len(before)
+    assert (second["chunks_upserted"], second["chunks_removed"]) == (len(edited), len(edited))
+    assert embedded[len(before):] == [r["text"] for r in edited]
+    assert {r["metadata"]["component"] for r in edited} == {"jcr:content/root/text_2"}
+    assert unchanged["chunks_upserted"] == 0 and unchanged["chunks_unchanged"] == len(page())
+    stored = mock_dependencies.collection.get(include=["documents"])
+    assert sorted(stored["documents"]) == sorted(r["text"] for r in page())
+
+@patch("src.crawler.live_sync_service.process_page")
+@patch("src.crawler.live_sync_service.plan_catch_up")
+def test_catch_up_syncs_changes_and_moves_the_mark(mock_plan, mock_process_page, mock_dependencies, tmp_path):
+    mark = datetime(2024, 6, 2, tzinfo=timezone.utc)
+    mock_plan.return_value = {"since": None, "mark": mark, "modified": ["/content/site/a"],
+                              "added": ["/content/site/b"], "deleted": ["/content/site/gone"]}
+    mock_process_page.side_effect = lambda client, path, raise_errors: [{"text": path, "source": path, "chunk_id": 0, "metadata": {}}]
+    mock_dependencies.collection.get.return_value = {"ids": []}
+
+    with patch("src.crawler.discovery.DISCOVERY_STATE_FILE", str(tmp_path / "discovery.json")):
+        dry_run = client.post("/api/v1/catch-up", params={"dry_run": True}).json()
+        assert read_mark(CATCH_UP_ROOT) is None and mock_process_page.call_count == 0
+        result = client.post("/api/v1/catch-up").json()
+        saved = read_mark(CATCH_UP_ROOT)
+
+    assert (dry_run["status"], dry_run["modified"], dry_run["added"], dry_run["deleted"]) == ("dry_run", 1, 1, 1)
+    assert result["status"] == "success" and result["chunks_upserted"] == 2
+    assert [c.args[1] for c in mock_process_page.call_args_list] == ["/content/site/a", "/content/site/b"]
+    mock_dependencies.collection.get.assert_any_call(where={"source": "/content/site/gone"}, include=[])
+    assert saved == mark
+
+@patch("src.crawler.live_sync_service.process_page")
+@patch("src.crawler.live_sync_service.plan_catch_up")
+def test_catch_up_keeps_the_mark_when_a_page_fails(mock_plan, mock_process_page, mock_dependencies, tmp_path):
+    mock_plan.return_value = {"since": None, "mark": datetime(2024, 6, 2, tzinfo=timezone.utc),
+                              "modified": ["/content/site/a"], "added": [], "deleted": []}
+    # A 5xx or timeout is a failed page, not an empty one
+    mock_process_page.side_effect = FetchError("AEM down")
+    mock_dependencies.collection.get.return_value = {"ids": [], "metadatas": []}
+
+    with patch("src.crawler.discovery.DISCOVERY_STATE_FILE", str(tmp_path / "discovery.json")):
+        result = client.post("/api/v1/catch-up").json()
+        assert read_mark(CATCH_UP_ROOT) is None
+
+    assert result["status"] == "partial" and result["failed"] == ["/content/site/a"]
+    mock_dependencies.collection.upsert.assert_not_called()
+
+@patch("src.crawler.discovery.search_modified_pages", new_callable=AsyncMock)
+@patch("src.crawler.discovery.search_pages", new_callable=AsyncMock)
+@patch("src.crawler.live_sync_service.process_page")
+def test_catch_up_does_not_refetch_empty_pages(mock_process_page, mock_search, mock_modified, mock_dependencies, tmp_path):
+    mock_search.return_value = ["/content/site/empty"]
+    mock_modified.return_value = []
+    mock_process_page.return_value = []
+    mock_dependencies.collection.get.return_value = {"ids": [], "metadatas": []}
+
+    with patch("src.crawler.discovery.DISCOVERY_STATE_FILE", str(tmp_path / "discovery.json")):
+        first = client.post("/api/v1/catch-up").json()
+        second = client.post("/api/v1/catch-up").json()
+
+    assert (first["modified"], second["modified"], second["added"]) == (1, 0, 0)
+    mock_process_page.assert_called_once()
+
+def test_alias_to_missing_collection_keeps_serving_the_previous_one(mock_dependencies):
+    chroma = chromadb.EphemeralClient()
+    current = f"{COLLECTION_NAME}__v{uuid.uuid4().hex[:8]}"
+    missing = f"{COLLECTION_NAME}__v{uuid.uuid4().hex[:8]}"
+    chroma.create_collection(current)
+    mock_dependencies.chroma_client = chroma
+    mock_dependencies.collection, mock_dependencies.collection_name = None, None
+
+    with patch("src.crawler.live_sync_service.resolve_alias", return_value=current):
+        assert active_collection().name == current
+    with patch("src.crawler.live_sync_service.resolve_alias", return_value=missing):
+        assert active_collection().name == current
+
+    assert missing not in [c.name for c in chroma.list_collections()]
+
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_context_served_from_cache(mock_context, mock_dependencies):
+    mock_context.return_value = PackedContext("Source: /content/test\nContent: cached")
+
+    first = client.post("/api/v1/context", json={"query": "what is  wknd"})
+    second = client.post("/api/v1/context", json={"query": "what is wknd"})
+
+    assert first.json() == second.json()
+    assert first.json()["context"] == "Source: /content/test\nContent: cached"
+    mock_context.assert_called_once()
+
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_context_not_cached_when_index_changes_during_retrieval(mock_context, mock_dependencies):
+    def retrieve_during_sync(*args, **kwargs):
+        index_changed("/content/test")
+        return PackedContext("Source: /content/test\nContent: deleted meanwhile")
+
+    mock_context.side_effect = retrieve_during_sync
+    client.post("/api/v1/context", json={"query": "what is wknd"})
+    client.post("/api/v1/context", json={"query": "what is wknd"})
+
+    assert mock_context.call_count == 2
+
+def test_chat_does_not_cache_failed_retrievals(mock_dependencies):
+    with patch("src.crawler.live_sync_service.pack_results",
+               side_effect=[PackedContext("", error="boom"), PackedContext("Source: /content/test\nContent: fresh")]):
+        client.post("/api/v1/chat", json={"message": "what is wknd"})
+        second = client.post("/api/v1/chat", json={"message": "what is wknd"})
+
+    assert "fresh" in second.json()["content"]
+    assert mock_dependencies.collection.query.call_count == 2
+
+def test_chat_cache_hit_skips_admission(mock_dependencies):
+    mock_dependencies.collection.query.return_value = {
+        "documents": [["cached"]], "metadatas": [[{"source": "/content/test"}]], "distances": [[0.1]]
+    }
+    first = client.post("/api/v1/chat", json={"message": "what is wknd"})
+
+    with patch("src.crawler.live_sync_service.admitted", side_effect=AssertionError("admission on a cache hit")):
+        second = client.post("/api/v1/chat", json={"message": "what is  wknd"})
+
+    assert second.status_code == 200 and second.json() == first.json()
+    mock_dependencies.collection.query.assert_called_once()
+
+@patch("src.crawler.live_sync_service.process_page")
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_sync_invalidates_retrieval_cache(mock_context, mock_process_page, mock_dependencies):
+    mock_context.return_value = PackedContext("old")
+    mock_process_page.return_value = [{"text": "new", "source": "/content/test", "chunk_id": 0, "metadata": {}}]
+    mock_dependencies.collection.get.return_value = {"ids": ["/content/test_0"]}
+
+    client.post("/api/v1/context", json={"query": "q"})
+    client.post("/api/v1/sync", json={"path": "/content/test"})
+    mock_context.return_value = PackedContext("new")
+    response = client.post("/api/v1/context", json={"query": "q"})
+
+    assert response.json()["context"] == "new"
+    assert mock_context.call_count == 2
+
+@patch("src.crawler.live_sync_service.process_page")
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_prewarm_syncs_missing_pages_and_warms_queries(mock_context, mock_process_page, mock_dependencies):
+    mock_context.return_value = PackedContext("context")
+    mock_process_page.return_value = [{"text": "b", "source": "/content/site/b", "chunk_id": 0, "metadata": {}}]
+    mock_dependencies.collection.get.side_effect = [
+        {"metadatas": [{"source": "/content/site/a"}]},  # prewarm lookup
+        {"ids": []},                                     # stale chunk lookup during sync
+    ]
+
+    response = client.post("/api/v1/prewarm", json={
+        "pages": ["/content/site/a", "/content/site/b"],
+        "sections": ["/content/site"],
+        "queries": ["opening hours"],
+        "sync_missing": True,
+    })
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["pages"] == {"requested": 2, "indexed": 1, "missing": ["/content/site/b"], "synced": 1, "failed": 0}
+    assert data["queries_warmed"] == 2 and data["queries_failed"] == 0
+    mock_process_page.assert_called_once_with(mock_dependencies.http_client, "/content/site/b", raise_errors=True)
+    scopes = [call.kwargs["scope"] for call in mock_context.call_args_list]
+    assert scopes == [None, "/content/site"]
+
+    client.post("/api/v1/context", json={"query": "opening hours", "scope": "/content/site"})
+    assert mock_context.call_count == 2
+
+@patch("src.crawler.live_sync_service.process_page")
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_prewarm_counts_failures_and_carries_on(mock_context, mock_process_page, mock_dependencies):
+    mock_context.side_effect = [DeadlineExceeded("context retrieval"), PackedContext("context")]
+    mock_process_page.side_effect = [FetchError("AEM down"),
+                                     [{"text": "c", "source": "/content/site/c", "chunk_id": 0, "metadata": {}}]]
+    mock_dependencies.collection.get.side_effect = [{"metadatas": []}, {"ids": []}]
+
+    response = client.post("/api/v1/prewarm", json={
+        "pages": ["/content/site/b", "/content/site/c"],
+        "sections": ["/content/site"],
+        "queries": ["opening hours"],
+        "sync_missing": True,
+    })
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["pages"]["synced"], data["pages"]["failed"]) == (1, 1)
+    assert (data["queries_warmed"], data["queries_failed"]) == (1, 1)
+
+@patch("src.crawler.live_sync_service.retrieve_context")
+def test_prewarm_defaults_to_recorded_queries(mock_context, mock_dependencies):
+    mock_context.return_value = PackedContext("context")
+    mock_dependencies.collection.get.return_value = {"metadatas": []}
+    client.post("/api/v1/context", json={"query": "popular", "scope": "/content/site"})
+    mock_context.reset_mock()
+
+    with patch("src.crawler.live_sync_service.retrieval_cache", TTLCache(16, 60)):
+        response = client.post("/api/v1/prewarm", json={"pages": [], "sections": []})
+
+    assert response.json()["queries_warmed"] == 1
+    mock_context.assert_called_once()
+    assert mock_context.call_args.kwargs["scope"] == "/content/site"
+
+def test_context_returns_packed_sources(mock_dependencies):
+    overlap = "shared overlap text"
+    mock_dependencies.collection.query.return_value = {
+        "documents": [[f"second chunk {overlap}", f"{overlap} third chunk", "other page"]],
+        "metadatas": [[
+            {"source": "/content/a", "chunk_id": 1, "title": "A", "url": "http://aem/content/a.html"},
+            {"source": "/content/a", "chunk_id": 2, "title": "A", "url": "http://aem/content/a.html"},
+            {"source": "/content/b", "chunk_id": 0},
+        ]],
+        "distances": [[0.1, 0.2, 0.3]],
+    }
+
+    with patch("src.crawler.live_sync_service.retrieve_context") as mock_retrieve:
+        mock_retrieve.side_effect = lambda *args, **kwargs: pack_results(
+            mock_dependencies.collection.query.return_value, 0, kwargs.get("token_budget"))
+        response = client.post("/api/v1/context", json={"query": "q", "token_budget": 500})
+
+    data = response.json()
+    assert data["context"] == (f"Source: /content/a\nContent: second chunk {overlap} third chunk"
+                               "\n\nSource: /content/b\nContent: other page")
+    assert [s["source"] for s in data["sources"]] == ["/content/a", "/content/b"]
+    assert data["sources"][0]["chunks"] == [1, 2] and data["sources"][0]["title"] == "A"
+    assert data["tokens_saved"] > 0
+    assert mock_retrieve.call_args.kwargs["token_budget"] == 500
+    assert client.get("/api/v1/metrics").json()["context_packing"]["contexts"] >= 1
+
+def test_context_rejects_invalid_budget(mock_dependencies):
+    response = client.post("/api/v1/context", json={"query": "q", "token_budget": 0})
+    assert response.status_code == 422
+
+@pytest.fixture
+def ollama(mock_dependencies):
+    """
+    Stand-in Ollama, a one-page index and an embedder that maps questions
+    about opening hours to the same vector.
+    """
+    stub = OllamaStub()
+    server = serve_ollama(stub)
+    mock_dependencies.http_client = httpx.AsyncClient()
+    mock_dependencies.model.encode.side_effect = lambda texts: np.array(
+        [[1.0, 0.0, 0.0] if "hours" in t else [0.0, 1.0, 0.0] for t in texts]
+    )
+    mock_dependencies.collection.query.return_value = {
+        "documents": [["Open 9 to 5."]],
+        "metadatas": [[{"source": "/content/site/a", "chunk_id": 0}]],
+        "distances": [[0.2]],
+    }
+    with patch("src.utils.generation.OLLAMA_API_URL", f"http://127.0.0.1:{server.server_address[1]}"), \
+         patch("src.crawler.live_sync_service.answer_cache", SemanticCache(16, 60, 0.95)):
+        yield stub
+    server.shutdown()
+
+def test_generate_reuses_answers_for_similar_questions(ollama):
+    first = client.post("/api/v1/generate", json={"message": "opening hours?"}).json()
+    second = client.post("/api/v1/generate", json={"message": "what are the opening hours"}).json()
+    other = client.post("/api/v1/generate", json={"message": "surf lessons"}).json()
+
+    assert first["cached"] is False and first["response"] == "Answer to: opening hours?"
+    assert "Open 9 to 5." in ollama.prompts[0]
+    assert first["sources"][0]["source"] == "/content/site/a"
+    assert second["cached"] is True and second["response"] == first["response"]
+    assert second["similarity"] == 1.0
+    assert other["cached"] is False
+    assert len(ollama.prompts) == 2
+    assert client.get("/api/v1/metrics").json()["answer_cache"]["hits"] == 1
+
+@patch("src.crawler.live_sync_service.process_page")
+def test_generate_cache_invalidated_when_source_resyncs(mock_process_page, ollama, mock_dependencies):
+    mock_process_page.return_value = [{"text": "Open 10 to 6.", "source": "/content/site/b", "chunk_id": 0, "metadata": {}}]
+    mock_dependencies.collection.get.return_value = {"ids": []}
+    client.post("/api/v1/generate", json={"message": "opening hours?"})
+
+    # An unrelated page changing keeps the answer
+    client.post("/api/v1/sync", json={"path": "/content/site/b"})
+    assert client.post("/api/v1/generate", json={"message": "opening hours?"}).json()["cached"] is True
+
+    mock_process_page.return_value = [{"text": "Open 10 to 6.", "source": "/content/site/a", "chunk_id": 0, "metadata": {}}]
+    client.post("/api/v1/sync", json={"path": "/content/site/a"})
+    assert client.post("/api/v1/generate", json={"message": "opening hours?"}).json()["cached"] is False
+    assert len(ollama.prompts) == 2
+
+def test_generate_does_not_cache_answers_when_a_sync_lands_during_retrieval(ollama, mock_dependencies):
+    results = mock_dependencies.collection.query.return_value
+
+    def query_during_sync(**kwargs):
+        index_changed("/content/site/a")
+        return results
+
+    mock_dependencies.collection.query.side_effect = query_during_sync
+    client.post("/api/v1/generate", json={"message": "opening hours?"})
+    mock_dependencies.collection.query.side_effect = None
+
+    assert client.post("/api/v1/generate", json={"message": "opening hours?"}).json()["cached"] is False
+    assert len(ollama.prompts) == 2
+
+def test_generate_streams_ndjson(ollama):
+    response = client.post("/api/v1/generate", json={"message": "opening hours?", "stream": True})
+    messages = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "".join(m["response"] for m in messages) == "Answer to: opening hours?"
+    assert messages[-1]["done"] and messages[-1]["sources"][0]["source"] == "/content/site/a"
+
+    cached = client.post("/api/v1/generate", json={"message": "opening hours?", "stream": True})
+    messages = [json.loads(line) for line in cached.text.splitlines()]
+    assert len(messages) == 1 and messages[0]["cached"] and messages[0]["response"] == "Answer to: opening hours?"
+
+def test_generate_reports_unavailable_ollama(ollama):
+    with patch("src.utils.generation.OLLAMA_API_URL", "http://127.0.0.1:9"):
+        response = client.post("/api/v1/generate", json={"message": "opening hours?"})
+    assert response.status_code == 502
@@ -1,7 +1,9 @@
 import unittest
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 import sys
 import os
+import tempfile
+import gzip
 import pandas as pd
 from io import StringIO
 
@@ -9,6 +11,38 @@ from io import StringIO
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from src.analysis.log_analyzer import parse_log_line, main
+from src.analysis.log_aggregates import LogAggregates
+from src.analysis.log_sources import shard_ranges, iter_range_lines, expand_log_paths
+from src.analysis.log_vectorized import parse_text
+from src.analysis.log_cache import METRIC_COLUMNS, cache_path, iter_cached_batches
+
+SAMPLE_LOG = """127.0.0.1 - - [10/Feb/2026:14:00:00 +0530] "GET /content/page1.html HTTP/1.1" 200 100
+127.0.0.1 - - [10/Feb/2026:14:01:00 +0530] "GET /content/page2.html HTTP/1.1" 404 100
+127.0.0.1 - - [10/Feb/2026:14:02:00 +0530] "GET /content/page2.html HTTP/1.1" 404 100
+127.0.0.1 - - [10/Feb/2026:14:03:00 +0530] "POST /bin/submit HTTP/1.1" 500 100
+127.0.0.1 - - [10/Feb/2026:14:04:00 +0530] "GET /content/page3.html HTTP/1.1" 404 100
+127.0.0.1 - - [10/Feb/2026:14:05:00 +0530] "GET /content/page1.html HTTP/1.1" 200 -
+not a log line"""
+
+def run_main(*argv, log_content=SAMPLE_LOG):
+    """
+    Runs main() with the given CLI arguments against the log content, written
+    to a temporary dummy.log, and returns the printed output.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        logfile = os.path.join(tmp, "dummy.log")
+        with open(logfile, "w") as f:
+            f.write(log_content)
+        return run_main_on_file(logfile, *argv).replace(logfile, "dummy.log")
+
+def run_main_on_file(logfile, *argv):
+    """
+    Runs main() with the given CLI arguments against a real file.
+    """
+    with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+        with patch('sys.argv', ['log_analyzer.py', logfile, *argv]):
+            main()
+    return mock_stdout.getvalue()
 
 class TestLogAnalyzer(unittest.TestCase):
 
@@ -27,22 +61,13 @@ class TestLogAnalyzer(unittest.TestCase):
         parsed = parse_log_line(line)
         self.assertIsNone(parsed)
 
-    @patch('sys.stdout', new_callable=StringIO)
-    def test_main_analysis(self, mock_stdout):
-        # Mock file content
+    def test_main_analysis(self):
         log_content = """127.0.0.1 - - [10/Feb/2026:14:00:00 +0530] "GET /content/page1.html HTTP/1.1" 200 100
 127.0.0.1 - - [10/Feb/2026:14:01:00 +0530] "GET /content/page2.html HTTP/1.1" 404 100
 127.0.0.1 - - [10/Feb/2026:14:02:00 +0530] "GET /content/page2.html HTTP/1.1" 404 100
 127.0.0.1 - - [10/Feb/2026:14:03:00 +0530] "POST /bin/submit HTTP/1.1" 500 100"""
-        
-        with patch('builtins.open', mock_open(read_data=log_content)):
-            with patch('argparse.ArgumentParser.parse_args') as mock_args:
-                mock_args.return_value.logfile = 'dummy.log'
-                mock_args.return_value.metrics = 'all'
-                
-                main()
-                
-        output = mock_stdout.getvalue()
+
+        output = run_main('--metrics', 'all', log_content=log_content)
         
         # Verify output contains analysis
         self.assertIn("Total Errors: 3", output) # 2 404s + 1 500
@@ -50,5 +75,199 @@ class TestLogAnalyzer(unittest.TestCase):
         self.assertIn("Top 404 Paths", output)
         self.assertIn("Top 500 Paths", output)
 
+    def test_stream_matches_dataframe_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            with open(logfile, "w") as f:
+                f.write(SAMPLE_LOG)
+
+            for metrics in ["errors", "traffic", "all"]:
+                self.assertEqual(
+                    run_main_on_file(logfile, "--metrics", metrics, "--stream"),
+                    run_main("--metrics", metrics).replace("dummy.log", logfile)
+                )
+
+    def test_rotated_and_compressed_logs_match_concatenated_log(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rotated = os.path.join(tmp, "rotated")
+            os.makedirs(rotated)
+            lines = SAMPLE_LOG.splitlines()
+            with gzip.open(os.path.join(rotated, "dispatcher.log.2.gz"), "wt") as f:
+                f.write("\n".join(lines[:2] * 20) + "\n")
+            with gzip.open(os.path.join(rotated, "dispatcher.log.1.gz"), "wt") as f:
+                f.write("\n".join(lines[2:4] * 20) + "\n")
+            with open(os.path.join(rotated, "dispatcher.log"), "w") as f:
+                f.write("\n".join(lines[4:] * 20) + "\n")
+            combined = os.path.join(tmp, "combined.log")
+            with open(combined, "w") as f:
+                f.write("\n".join(lines[:2] * 20 + lines[2:4] * 20 + lines[4:] * 20) + "\n")
+
+            expected = run_main_on_file(combined).split("\n", 1)[1]
+            pattern = os.path.join(rotated, "dispatcher.log*")
+            for source in [rotated, pattern]:
+                for extra in [(), ("--stream",), ("--workers", "2", "--chunk-size", "256"), ("--engine", "vectorized")]:
+                    self.assertEqual(run_main_on_file(source, *extra).split("\n", 1)[1], expected)
+
+    def test_expand_log_paths_orders_rotations_oldest_first(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ["dispatcher.log", "dispatcher.log.1.gz", "dispatcher.log.10.gz", "dispatcher.log.2.gz"]:
+                open(os.path.join(tmp, name), "w").close()
+
+            paths = expand_log_paths([tmp])
+
+            self.assertEqual(
+                [os.path.basename(p) for p in paths],
+                ["dispatcher.log.10.gz", "dispatcher.log.2.gz", "dispatcher.log.1.gz", "dispatcher.log"]
+            )
+            with self.assertRaises(FileNotFoundError):
+                expand_log_paths([os.path.join(tmp, "*.missing")])
+
+    def test_range_blocks_keep_lines_longer_than_chunk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            with open(logfile, "w") as f:
+                f.write(SAMPLE_LOG + "\n")
+
+            lines = [line for chunk in iter_range_lines(logfile, 0, None, 16) for line in chunk]
+
+            self.assertEqual(lines, SAMPLE_LOG.splitlines())
+
+    def test_parallel_matches_dataframe_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            with open(logfile, "w") as f:
+                f.write((SAMPLE_LOG + "\n") * 50)
+
+            expected = run_main_on_file(logfile)
+            self.assertEqual(run_main_on_file(logfile, "--workers", "3", "--chunk-size", "512"), expected)
+
+    def test_vectorized_engine_matches_python_engine(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            with open(logfile, "w") as f:
+                f.write((SAMPLE_LOG + "\n") * 50)
+
+            expected = run_main_on_file(logfile)
+            for extra in [(), ("--stream", "--chunk-size", "700"), ("--workers", "2", "--chunk-size", "512")]:
+                self.assertEqual(run_main_on_file(logfile, "--engine", "vectorized", *extra), expected)
+
+    def test_parse_text_types_columns(self):
+        frame = parse_text(SAMPLE_LOG)
+
+        self.assertEqual(len(frame), 6)
+        self.assertEqual(str(frame["status"].dtype), "int16")
+        self.assertEqual(frame["status"].tolist(), [200, 404, 404, 500, 404, 200])
+        self.assertTrue(pd.isna(frame["size"].iloc[5]))
+        self.assertEqual(frame["size"].iloc[0], 100)
+        self.assertEqual(frame["method"].iloc[3], "POST")
+
+    def test_pandas_fallback_matches_arrow(self):
+        expected = parse_text(SAMPLE_LOG)
+        with patch('src.analysis.log_vectorized.pa', None):
+            fallback = parse_text(SAMPLE_LOG)
+        pd.testing.assert_frame_equal(fallback, expected)
+
+    def test_sketch_mode_is_exact_within_capacity(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            with open(logfile, "w") as f:
+                f.write((SAMPLE_LOG + "\n") * 50)
+
+            expected = run_main_on_file(logfile)
+            for extra in [(), ("--workers", "2", "--chunk-size", "512"), ("--engine", "vectorized")]:
+                output = run_main_on_file(logfile, "--sketch-size", "100", *extra)
+                self.assertIn("counts overestimate by at most 0", output)
+                without_bounds = "\n".join(line for line in output.splitlines() if not line.startswith("(approximate"))
+                self.assertEqual(without_bounds + "\n", expected)
+
+    def test_saved_sketches_merge_across_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = os.path.join(tmp, "first.log"), os.path.join(tmp, "second.log")
+            lines = SAMPLE_LOG.splitlines()
+            with open(first, "w") as f:
+                f.write("\n".join(lines[:3]) + "\n")
+            with open(second, "w") as f:
+                f.write("\n".join(lines[3:]) + "\n")
+            sketch_file = os.path.join(tmp, "first.json")
+
+            run_main_on_file(first, "--sketch-size", "100", "--save-sketch", sketch_file)
+            merged = run_main_on_file(second, "--merge-sketch", sketch_file)
+
+            combined = run_main_on_file(first, second, "--sketch-size", "100")
+            self.assertEqual(merged.split("\n", 1)[1], combined.split("\n", 1)[1])
+            self.assertIn("Total Errors: 4", merged)
+
+    def test_cached_analysis_matches_and_skips_parsing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            cache_dir = os.path.join(tmp, "cache")
+            with open(logfile, "w") as f:
+                f.write((SAMPLE_LOG + "\n") * 20)
+
+            expected = {metrics: run_main_on_file(logfile, "--metrics", metrics) for metrics in ["errors", "traffic", "all"]}
+            self.assertEqual(run_main_on_file(logfile, "--cache", "--cache-dir", cache_dir), expected["all"])
+            self.assertTrue(os.path.exists(cache_path(logfile, cache_dir)))
+
+            with patch('src.analysis.log_cache.parse_table', side_effect=AssertionError("re-parsed")):
+                for metrics, output in expected.items():
+                    self.assertEqual(run_main_on_file(logfile, "--cache", "--cache-dir", cache_dir, "--metrics", metrics), output)
+                self.assertEqual(run_main_on_file(logfile, "--cache", "--cache-dir", cache_dir, "--stream"), expected["all"])
+                with patch('src.analysis.log_cache.iter_cached_batches', wraps=iter_cached_batches) as batches:
+                    for metrics, output in expected.items():
+                        self.assertEqual(
+                            run_main_on_file(logfile, "--cache", "--cache-dir", cache_dir, "--stream", "--metrics", metrics),
+                            output
+                        )
+                        self.assertEqual(batches.call_args.args[1], METRIC_COLUMNS[metrics])
+
+    def test_save_sketch_requires_sketches(self):
+        with patch('sys.stderr', new_callable=StringIO), self.assertRaises(SystemExit):
+            run_main("--save-sketch", "sketch.json")
+
+    def test_cache_rejects_workers(self):
+        with self.assertRaises(SystemExit):
+            run_main("--cache", "--workers", "4")
+
+    def test_cache_is_rebuilt_when_log_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            cache_dir = os.path.join(tmp, "cache")
+            with open(logfile, "w") as f:
+                f.write(SAMPLE_LOG + "\n")
+            run_main_on_file(logfile, "--cache", "--cache-dir", cache_dir)
+
+            with open(logfile, "a") as f:
+                f.write(SAMPLE_LOG.splitlines()[1] + "\n")
+            output = run_main_on_file(logfile, "--cache", "--cache-dir", cache_dir)
+
+            self.assertIn("Total Errors: 5", output)
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(cache_path(logfile, cache_dir))])
+
+    def test_shard_ranges_align_to_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logfile = os.path.join(tmp, "dispatcher.log")
+            with open(logfile, "w") as f:
+                f.write((SAMPLE_LOG + "\n") * 10)
+
+            ranges = shard_ranges(logfile, 7)
+            lines = [line for start, end in ranges for chunk in iter_range_lines(logfile, start, end, 100) for line in chunk]
+
+            with open(logfile) as f:
+                self.assertEqual(lines, f.read().splitlines())
+
+    def test_aggregates_merge(self):
+        first, second = LogAggregates(), LogAggregates()
+        first.add_request("/content/a.html", "GET", 404)
+        second.add_request("/content/a.html", "GET", 404)
+        second.add_request("/content/b.html", "POST", 500)
+
+        merged = first.merge(second)
+
+        self.assertEqual(merged.total, 3)
+        self.assertEqual(merged.errors, 3)
+        self.assertEqual(merged.not_found["/content/a.html"], 2)
+        self.assertEqual(merged.server_errors["/content/b.html"], 1)
+        self.assertEqual(merged.methods["GET"], 2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+from io import StringIO
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.analysis.log_follow import LogFollower, MinuteBuckets, read_checkpoint, follow
+from src.analysis.log_parsing import minute_of, parse_timestamp
+
+def log_line(minute, path="/content/page1.html", status=200, method="GET"):
+    return f'127.0.0.1 - - [10/Feb/2026:14:{minute:02d}:30 +0530] "{method} {path} HTTP/1.1" {status} 100\n'
+
+class TestLogFollow(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logfile = os.path.join(self.tmp.name, "dispatcher.log")
+        self.checkpoint = os.path.join(self.tmp.name, "dispatcher.log.checkpoint.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def append(self, text):
+        with open(self.logfile, "a") as f:
+            f.write(text)
+
+    def test_minute_of_matches_parsed_timestamp(self):
+        timestamp = "10/Feb/2026:14:05:59 +0530"
+        self.assertEqual(minute_of(timestamp), int(parse_timestamp(timestamp).timestamp()) // 60)
+        self.assertEqual(minute_of("10/Feb/2026:08:35:00 +0000"), minute_of(timestamp))
+        self.assertIsNone(minute_of("99/Foo/2026:14:05:59 +0530"))
+
+    def test_follow_returns_only_new_complete_lines(self):
+        self.append(log_line(0))
+        follower = LogFollower(self.logfile, self.checkpoint)
+
+        self.assertEqual(follower.poll(), [])  # starts at the end, like tail -f
+        self.append(log_line(1) + log_line(2)[:20])
+        self.assertEqual(follower.poll(), [log_line(1).strip()])
+        self.append(log_line(2)[20:])
+        self.assertEqual(follower.poll(), [log_line(2).strip()])
+        follower.close()
+
+    def test_restart_resumes_from_checkpoint(self):
+        self.append(log_line(0))
+        follower = LogFollower(self.logfile, self.checkpoint, from_start=True)
+        self.assertEqual(len(follower.poll()), 1)
+        follower.close()
+
+        self.append(log_line(1))
+        restarted = LogFollower(self.logfile, self.checkpoint, from_start=True)
+        self.assertEqual(restarted.poll(), [log_line(1).strip()])
+        restarted.close()
+
+        self.assertEqual(read_checkpoint(self.checkpoint)["offset"], os.path.getsize(self.logfile))
+
+    def test_rotation_drains_old_file_then_reads_new_one(self):
+        self.append(log_line(0))
+        follower = LogFollower(self.logfile, self.checkpoint, from_start=True)
+        follower.poll()
+
+        self.append(log_line(1))
+        os.rename(self.logfile, self.logfile + ".1")
+        self.append(log_line(2))
+
+        self.assertEqual(follower.poll(), [log_line(1).strip(), log_line(2).strip()])
+        self.assertEqual(read_checkpoint(self.checkpoint)["inode"], os.stat(self.logfile).st_ino)
+        follower.close()
+
+    def test_rotation_survives_file_vanishing_before_reopen(self):
+        self.append(log_line(0))
+        follower = LogFollower(self.logfile, self.checkpoint, from_start=True)
+        follower.poll()
+
+        # logrotate moves the new file away between the stat and the open
+        os.rename(self.logfile, self.logfile + ".1")
+        self.append(log_line(1))
+        new_stat = os.stat(self.logfile)
+        os.rename(self.logfile, self.logfile + ".2")
+        with patch("src.analysis.log_follow.os.stat", return_value=new_stat):
+            self.assertEqual(follower.poll(), [])
+
+        self.assertEqual(follower.poll(), [])
+        self.append(log_line(2))
+        self.assertEqual(follower.poll(), [log_line(2).strip()])
+        follower.close()
+
+    def test_truncation_restarts_from_beginning(self):
+        self.append(log_line(0) + log_line(1))
+        follower = LogFollower(self.logfile, self.checkpoint, from_start=True)
+        follower.poll()
+
+        with open(self.logfile, "w") as f:
+            f.write(log_line(3))
+
+        self.assertEqual(follower.poll(), [log_line(3).strip()])
+        follower.close()
+
+    def test_minute_buckets_roll_and_count(self):
+        buckets = MinuteBuckets(window_minutes=3)
+        buckets.add_lines([
+            log_line(0).strip(),
+            log_line(1, "/content/missing.html", 404).strip(),
+            log_line(1, "/content/missing.html", 404).strip(),
+            log_line(2, "/bin/submit", 500, "POST").strip(),
+            "not a log line",
+        ])
+        self.assertEqual(len(buckets.buckets), 3)
+
+        buckets.add_lines([log_line(3).strip(), log_line(0).strip()])  # minute 0 left the window
+
+        totals = buckets.totals()
+        self.assertEqual(len(buckets.buckets), 3)
+        self.assertEqual(totals.total, 4)
+        self.assertEqual(totals.not_found.estimate("/content/missing.html"), (2, 0))
+        self.assertEqual(totals.server_errors.estimate("/bin/submit"), (1, 0))
+        self.assertEqual(buckets.per_minute()["requests"].tolist(), [2, 1, 1])
+        self.assertEqual(buckets.per_minute().index[0], "2026-02-10 08:31")
+
+    def test_minute_buckets_stay_bounded_for_many_paths(self):
+        buckets = MinuteBuckets(window_minutes=2, capacity=10)
+        buckets.add_lines([log_line(0, f"/content/page{i}.html").strip() for i in range(1000)])
+
+        bucket = buckets.buckets[next(iter(buckets.buckets))]
+        self.assertLessEqual(len(bucket.paths), 10)
+        self.assertEqual(buckets.totals().total, 1000)
+
+    def test_follow_prints_window_report(self):
+        self.append(log_line(0) + log_line(1, "/content/missing.html", 404))
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            follow(self.logfile, self.checkpoint, interval=0, from_start=True, iterations=1)
+
+        output = mock_stdout.getvalue()
+        self.assertIn("Live Window", output)
+        self.assertIn("Error rate: 50.0%", output)
+        self.assertIn("/content/missing.html", output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import logging
+import os
+import pstats
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils import profiling
+from src.utils.admission import Deadline
+from src.utils.profiling import ProfilingMiddleware, batch, profiled, span
+
+
+def busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        return {"total": await Deadline(5).run("work", busy_work, 20000)}
+
+    @app.get("/fast")
+    async def fast():
+        return {"total": await Deadline(5).run("work", busy_work, 10)}
+
+    app.add_middleware(ProfilingMiddleware)
+    return app
+
+
+def test_disabled_hooks_are_no_ops(monkeypatch):
+    monkeypatch.setattr(profiling, "TRACE_SPANS", False)
+    assert span("a") is span("b", x=1)
+    assert profiled(busy_work) is busy_work
+
+
+def test_spans_log_correlation_id(monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "TRACE_SPANS", True)
+    with caplog.at_level(logging.INFO, logger="src.utils.profiling"):
+        with batch("ingest", chunks=3):
+            cid = profiling.correlation_id()
+            with span("embed", chunks=3):
+                busy_work(10)
+
+    assert cid.startswith("ingest-")
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(m.startswith("span embed ") and f"cid={cid} chunks=3" in m for m in messages)
+    assert any(m.startswith("span ingest ") and f"cid={cid}" in m for m in messages)
+    assert profiling.correlation_id() is None
+
+
+def test_request_profile_for_selected_path(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_PATHS", ["/slow"])
+    client = TestClient(make_app())
+
+    response = client.get("/slow", headers={"X-Request-ID": "req-42"})
+    client.get("/fast")
+
+    assert response.headers["X-Request-ID"] == "req-42"
+    files = os.listdir(profile_dir)
+    assert len(files) == 1 and "GET_slow-req-42-" in files[0]
+    stats = pstats.Stats(str(profile_dir / files[0]))
+    assert any(func[2] == "busy_work" for func in stats.stats)
+
+
+def test_latency_threshold_keeps_only_slow_requests(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_THRESHOLD_MS", 60000)
+    client = TestClient(make_app())
+
+    response = client.get("/slow")
+
+    assert len(response.headers["X-Request-ID"]) == 12
+    assert os.listdir(profile_dir) == []
+
+
+def test_batch_profile(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_BATCHES", True)
+    with batch("ingest"):
+        profiled(busy_work)(1000)
+
+    files = os.listdir(profile_dir)
+    assert len(files) == 1 and files[0].split("-")[1] == "ingest"
+    stats = pstats.Stats(str(profile_dir / files[0]))
+    assert any(func[2] == "busy_work" for func in stats.stats)
@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import uuid
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.embeddings import compute_query_embedding
+from src.vector_store import ingest, projection as projection_module
+from src.vector_store.projection import Projection, delete_projection, load_projection, projection_recall, save_projection
+
+
+class LowRankModel:
+    """
+    Embeds texts into 32 dims that only span an 8-dim subspace.
+    """
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.basis = np.linalg.qr(rng.standard_normal((32, 8)))[0].T
+
+    def encode(self, texts):
+        weights = np.array([np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(8) for t in texts])
+        return (weights @ self.basis).astype(np.float32)
+
+
+@pytest.fixture
+def projection_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(projection_module, "PROJECTION_DIR", str(tmp_path / "projections"))
+    return tmp_path / "projections"
+
+
+def test_fit_keeps_low_rank_structure():
+    vectors = LowRankModel().encode([f"text {i}" for i in range(300)])
+    projection = Projection.fit(vectors, 8)
+
+    assert (projection.source_dim, projection.dim) == (32, 8)
+    assert projection.retained_variance == pytest.approx(1.0, abs=1e-4)
+    assert projection.apply(vectors[0]).shape == (8,)
+    assert projection_recall(vectors, projection, k=5, queries=50) == pytest.approx(1.0)
+    assert projection_recall(vectors, Projection.fit(vectors, 2), k=5, queries=50) < 1.0
+
+
+def test_inner_product_projection_is_not_centered():
+    vectors = LowRankModel().encode([f"text {i}" for i in range(50)]) + 1.0
+    assert Projection.fit(vectors, 4).mean.any()
+    assert not Projection.fit(vectors, 4, space="ip").mean.any()
+    with pytest.raises(ValueError):
+        Projection.fit(vectors, 64)
+
+
+def test_save_load_and_delete(projection_dir):
+    projection = Projection.fit(LowRankModel().encode(["a", "b", "c", "d"]), 2)
+    save_projection("aem_content__v1", projection)
+
+    loaded = load_projection("aem_content__v1")
+    np.testing.assert_allclose(loaded.components, projection.components)
+    assert load_projection("aem_content") is None
+
+    delete_projection("aem_content__v1")
+    assert load_projection("aem_content__v1") is None
+
+
+def write_chunks(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"source": f"/content/site/page-{i}", "chunk_id": 0, "text": f"chunk text {i}"}) + "\n")
+
+
+def test_ingest_fits_projection_and_projects_queries(tmp_path, projection_dir, monkeypatch):
+    monkeypatch.setattr(ingest, "PROJECTION_FIT_SAMPLE", 60)
+    input_file = tmp_path / "output.jsonl"
+    write_chunks(input_file, 130)
+    collection = chromadb.EphemeralClient().create_collection(f"proj_{uuid.uuid4().hex[:8]}")
+    model = LowRankModel()
+    # A rebuild publishes the collection to syncs only once the projection is saved
+    ready = []
+
+    assert ingest.ingest_file(collection, model, str(input_file), project_dim=8,
+                              ready=lambda: ready.append((load_projection(collection.name), collection.count()))) == 130
+    assert len(ready) == 1 and ready[0][0] is not None and ready[0][1] == 0
+
+    projection = load_projection(collection.name)
+    assert projection.dim == 8
+    stored = collection.get(include=["embeddings"])
+    assert len(stored["ids"]) == 130 and len(stored["embeddings"][0]) == 8
+
+    query = compute_query_embedding(model, "chunk text 7", projection)
+    result = collection.query(query_embeddings=[query], n_results=1)
+    assert result["ids"][0] == ["/content/site/page-7_0"]
+
+    # Later ingests into the projected collection reuse its projection
+    write_chunks(input_file, 5)
+    ingest.ingest_file(collection, model, str(input_file))
+    assert len(collection.get(ids=["/content/site/page-4_0"], include=["embeddings"])["embeddings"][0]) == 8
+
+
+def test_ingest_refuses_to_project_full_collection(tmp_path, projection_dir):
+    input_file = tmp_path / "output.jsonl"
+    write_chunks(input_file, 3)
+    collection = chromadb.EphemeralClient().create_collection(f"full_{uuid.uuid4().hex[:8]}")
+    ingest.ingest_file(collection, LowRankModel(), str(input_file))
+
+    with pytest.raises(ValueError):
+        ingest.ingest_file(collection, LowRankModel(), str(input_file), project_dim=8)
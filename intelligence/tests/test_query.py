@@ -0,0 +1,43 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vector_store.query import get_relevant_contexts
+
+class TestQuery(unittest.TestCase):
+
+    @patch('src.vector_store.query.compute_embeddings')
+    @patch('src.vector_store.query.get_embedding_model')
+    @patch('src.vector_store.query.chromadb.PersistentClient')
+    def test_get_relevant_contexts_single_batch(self, mock_client, mock_model, mock_compute):
+        mock_compute.return_value = [[0.1], [0.2], [0.3]]
+        collection = mock_client.return_value.get_collection.return_value
+        collection.query.return_value = {
+            "documents": [["first"], [], ["third"]],
+            "metadatas": [[{"source": "/content/1"}], [], [{"source": "/content/3"}]]
+        }
+
+        contexts = get_relevant_contexts(["q1", "q2", "q3"], scope="/content/wknd")
+
+        # One embedding call and one vector query for the whole batch
+        mock_compute.assert_called_once_with(mock_model.return_value, ["q1", "q2", "q3"])
+        collection.query.assert_called_once_with(
+            query_embeddings=[[0.1], [0.2], [0.3]],
+            n_results=3,
+            where={"path_2": "/content/wknd"}
+        )
+        self.assertEqual(contexts, [
+            "Source: /content/1\nContent: first",
+            "",
+            "Source: /content/3\nContent: third"
+        ])
+
+    def test_get_relevant_contexts_empty(self):
+        self.assertEqual(get_relevant_contexts([]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.crawler.reconcile import SourceIndex, reconcile, list_indexed_sources
+
+def paged_collection(metadatas):
+    collection = MagicMock()
+    collection.name = "aem_content"
+
+    def get(limit, offset, include):
+        page = metadatas[offset:offset + limit]
+        return {"ids": [str(i) for i in range(offset, offset + len(page))], "metadatas": page}
+
+    collection.get.side_effect = get
+    return collection
+
+class TestReconcile(unittest.IsolatedAsyncioTestCase):
+
+    def test_list_indexed_sources_pages_through_collection(self):
+        collection = paged_collection([{"source": "/content/a"}, {"source": "/content/a"}, {"source": "/content/b"}])
+        self.assertEqual(list_indexed_sources(collection, page_size=2), {"/content/a", "/content/b"})
+
+    def test_list_indexed_sources_stops_when_offset_is_ignored(self):
+        collection = MagicMock()
+        collection.get.return_value = {"ids": ["1", "2"], "metadatas": [{"source": "/content/a"}, {"source": "/content/b"}]}
+        self.assertEqual(list_indexed_sources(collection, page_size=2), {"/content/a", "/content/b"})
+        self.assertEqual(collection.get.call_count, 2)
+
+    def test_source_index_lists_once_and_tracks_writes(self):
+        collection = paged_collection([{"source": "/content/a"}, {"source": "/content/a/b"}, {"source": "/content/c"}])
+        index = SourceIndex()
+
+        self.assertEqual(index.sources(collection), {"/content/a", "/content/a/b", "/content/c"})
+        index.update("aem_content", "/content/d", True)
+        index.update("aem_content", "/content/c", False)
+        index.discard_subtree("aem_content", "/content/a")
+        self.assertEqual(index.sources(collection), {"/content/d"})
+        self.assertEqual(collection.get.call_count, 2)
+
+        index.invalidate()
+        self.assertEqual(len(index.sources(collection)), 3)
+
+    @patch("src.crawler.reconcile.search_pages", new_callable=AsyncMock)
+    async def test_purges_orphans_in_batches(self, mock_search):
+        mock_search.return_value = ["/content/a"]
+        collection = paged_collection([{"source": "/content/a"}, {"source": "/content/b"}, {"source": "/content/c"}])
+
+        result = await reconcile(MagicMock(), collection, batch_size=1)
+
+        self.assertEqual(result["orphans"], 2)
+        collection.delete.assert_any_call(where={"source": {"$in": ["/content/b"]}})
+        collection.delete.assert_any_call(where={"source": {"$in": ["/content/c"]}})
+
+    @patch("src.crawler.reconcile.search_pages", new_callable=AsyncMock)
+    async def test_empty_listing_skips_purge(self, mock_search):
+        mock_search.return_value = []
+        collection = paged_collection([{"source": "/content/a"}])
+
+        result = await reconcile(MagicMock(), collection)
+
+        self.assertEqual(result["status"], "skipped")
+        collection.delete.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.scope import path_metadata, scope_filter, normalize_scope
+
+class TestScope(unittest.TestCase):
+
+    def test_path_metadata_site_and_language(self):
+        meta = path_metadata("/content/wknd/us/en/adventures")
+        self.assertEqual(meta["site"], "wknd")
+        self.assertEqual(meta["language"], "en")
+        self.assertEqual(meta["path_1"], "/content")
+        self.assertEqual(meta["path_3"], "/content/wknd/us")
+        self.assertEqual(meta["path_5"], "/content/wknd/us/en/adventures")
+        self.assertNotIn("path_6", meta)
+
+    def test_path_metadata_experience_fragment(self):
+        meta = path_metadata("/content/experience-fragments/wknd/us/en/site/footer/master")
+        self.assertEqual(meta["site"], "wknd")
+        self.assertEqual(meta["language"], "en")
+
+    def test_path_metadata_two_letter_page_is_not_a_language(self):
+        self.assertEqual(path_metadata("/content/wknd/us/en/go")["language"], "en")
+        self.assertEqual(path_metadata("/content/wknd/us/en/go/faqs")["language"], "en")
+        self.assertNotIn("language", path_metadata("/content/wknd/us"))
+
+    def test_path_metadata_without_language(self):
+        meta = path_metadata("/content/aemsamplessite")
+        self.assertEqual(meta["site"], "aemsamplessite")
+        self.assertNotIn("language", meta)
+        self.assertTrue(all(v is not None for v in meta.values()))
+
+    def test_scope_filter(self):
+        self.assertIsNone(scope_filter(None))
+        self.assertEqual(scope_filter("/content/wknd/us/en"), {"path_4": "/content/wknd/us/en"})
+        self.assertEqual(scope_filter("/content/wknd/us/en.html"), {"path_4": "/content/wknd/us/en"})
+        self.assertEqual(scope_filter("/content/wknd/"), {"path_2": "/content/wknd"})
+
+    def test_scope_matches_page_metadata(self):
+        # A scope filter must select the scope page itself and its descendants
+        where = scope_filter("/content/wknd/us/en")
+        key, value = next(iter(where.items()))
+        self.assertEqual(path_metadata("/content/wknd/us/en")[key], value)
+        self.assertEqual(path_metadata("/content/wknd/us/en/faqs")[key], value)
+        self.assertNotEqual(path_metadata("/content/wknd/us/de/faqs")[key], value)
+
+    def test_invalid_scope(self):
+        with self.assertRaises(ValueError):
+            normalize_scope("/apps/wknd")
+
+if __name__ == '__main__':
+    unittest.main()
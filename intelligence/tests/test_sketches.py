@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import random
+from collections import Counter
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.analysis.sketches import SpaceSaving
+
+def skewed_stream(n, seed=3):
+    rng = random.Random(seed)
+    items = [f"/content/hot-{int(rng.paretovariate(1.2))}.html" for _ in range(n)]
+    items += [f"/content/unique-{i}.html" for i in range(n // 2)]
+    rng.shuffle(items)
+    return items
+
+class TestSpaceSaving(unittest.TestCase):
+
+    def test_exact_below_capacity(self):
+        sketch = SpaceSaving(capacity=10)
+        sketch.update({"/a": 3, "/b": 1})
+        sketch.add("/b", 4)
+
+        self.assertEqual(sketch.most_common(), [("/b", 5), ("/a", 3)])
+        self.assertEqual(sketch.error_bound(), 0)
+        self.assertEqual(sketch.estimate("/missing"), (0, 0))
+
+    def test_memory_is_bounded_and_counts_are_bounded(self):
+        items = skewed_stream(50000)
+        exact = Counter(items)
+        sketch = SpaceSaving(capacity=200)
+        for item in items:
+            sketch.add(item)
+            self.assertLessEqual(len(sketch._pending), 200)
+
+        self.assertEqual(len(sketch), 200)
+        self.assertLessEqual(sketch.error_bound(), sketch.total // sketch.capacity)
+        for item, count in sketch.counts.items():
+            self.assertLessEqual(count - sketch.errors[item], exact[item])
+            self.assertGreaterEqual(count, exact[item])
+        # Every item above total / capacity must be tracked
+        for item, count in exact.items():
+            if count > sketch.total / sketch.capacity:
+                self.assertIn(item, sketch.counts)
+        self.assertEqual([item for item, _ in sketch.most_common(3)], [item for item, _ in exact.most_common(3)])
+
+    def test_merged_shards_keep_guarantees(self):
+        items = skewed_stream(40000, seed=5)
+        exact = Counter(items)
+        shards = [SpaceSaving(capacity=150) for _ in range(4)]
+        for i, item in enumerate(items):
+            shards[i % 4].add(item)
+
+        merged = SpaceSaving(capacity=150)
+        for shard in shards:
+            merged.update(shard)
+
+        self.assertEqual(merged.total, len(items))
+        for item, count in merged.counts.items():
+            self.assertLessEqual(count - merged.errors[item], exact[item])
+            self.assertGreaterEqual(count, exact[item])
+        self.assertEqual(merged.most_common(1)[0][0], exact.most_common(1)[0][0])
+
+    def test_serialization_round_trip(self):
+        sketch = SpaceSaving(capacity=50)
+        for item in skewed_stream(2000):
+            sketch.add(item)
+
+        restored = SpaceSaving.from_dict(sketch.to_dict())
+
+        self.assertEqual(restored.most_common(), sketch.most_common())
+        self.assertEqual(restored.error_bound(), sketch.error_bound())
+        self.assertEqual(restored.total, sketch.total)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import tarfile
+
+import chromadb
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vector_store import projection as projection_module, snapshot
+from src.vector_store.collection import building_collection, get_or_create_collection, resolve_alias
+from src.vector_store.projection import Projection, load_projection, save_projection
+from src.vector_store.snapshot import (
+    SnapshotError, export_snapshot, import_snapshot, load_snapshot, needs_snapshot,
+)
+
+
+@pytest.fixture
+def projection_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(projection_module, "PROJECTION_DIR", str(tmp_path / "projections"))
+    return tmp_path / "projections"
+
+
+def source_collection(path, rows=120, dim=16):
+    rng = np.random.default_rng(0)
+    collection = get_or_create_collection(chromadb.PersistentClient(path=str(path)), "aem_content",
+                                          {"space": "cosine", "ef_construction": 64})
+    collection.add(
+        ids=[f"/content/page-{i}#{i % 3}" for i in range(rows)],
+        embeddings=rng.standard_normal((rows, dim)).astype(np.float32),
+        documents=[f"Document {i}" for i in range(rows)],
+        metadatas=[{"source": f"/content/page-{i}", "chunk_id": i % 3} for i in range(rows)],
+    )
+    return collection
+
+
+def test_round_trip_keeps_rows_and_hnsw_params(tmp_path, projection_dir):
+    source = source_collection(tmp_path / "source")
+    snapshot_file = str(tmp_path / "index.snapshot.tar")
+    manifest = export_snapshot(source, snapshot_file, alias="aem_content")
+
+    assert (manifest["count"], manifest["dimension"]) == (120, 16)
+    assert manifest["hnsw"]["space"] == "cosine" and not manifest["projection"]
+
+    collection, _ = load_snapshot(chromadb.PersistentClient(path=str(tmp_path / "target")), snapshot_file,
+                                  "aem_content__v1", batch_size=50)
+    expected = source.get(include=["embeddings", "documents", "metadatas"])
+    loaded = collection.get(ids=expected["ids"], include=["embeddings", "documents", "metadatas"])
+
+    assert collection.count() == 120
+    assert collection.configuration["hnsw"]["space"] == "cosine"
+    assert loaded["documents"] == expected["documents"] and loaded["metadatas"] == expected["metadatas"]
+    assert np.allclose(loaded["embeddings"], expected["embeddings"])
+
+    query = np.asarray(expected["embeddings"][:5])
+    assert (collection.query(query_embeddings=query, n_results=5)["ids"]
+            == source.query(query_embeddings=query, n_results=5)["ids"])
+
+
+def test_projection_travels_with_the_snapshot(tmp_path, projection_dir, monkeypatch):
+    source = source_collection(tmp_path / "source")
+    save_projection("aem_content", Projection.fit(np.random.default_rng(1).standard_normal((50, 32)), 16))
+    snapshot_file = str(tmp_path / "index.snapshot.tar")
+    assert export_snapshot(source, snapshot_file)["projection"]
+    # Syncs during the import must already find the projection
+    projected = []
+    rows_of = snapshot.rows_of
+    monkeypatch.setattr(snapshot, "rows_of", lambda *args: projected.append(
+        load_projection("aem_content__v2") is not None) or rows_of(*args))
+
+    load_snapshot(chromadb.PersistentClient(path=str(tmp_path / "target")), snapshot_file, "aem_content__v2")
+
+    assert projected and all(projected)
+    restored = load_projection("aem_content__v2")
+    assert restored is not None and (restored.source_dim, restored.dim) == (32, 16)
+
+
+def test_corrupted_or_foreign_files_are_rejected(tmp_path, projection_dir):
+    snapshot_file = str(tmp_path / "index.snapshot.tar")
+    export_snapshot(source_collection(tmp_path / "source"), snapshot_file)
+    with tarfile.open(snapshot_file) as tar:
+        offset = tar.getmember("embeddings.npy").offset_data + 200
+    with open(snapshot_file, "r+b") as f:
+        f.seek(offset)
+        f.write(b"\xff\xff\xff\xff")
+
+    client = chromadb.PersistentClient(path=str(tmp_path / "target"))
+    with pytest.raises(SnapshotError, match="checksum"):
+        load_snapshot(client, snapshot_file, "aem_content__v1")
+    with pytest.raises(SnapshotError, match="Not a snapshot"):
+        load_snapshot(client, str(tmp_path / "source" / "chroma.sqlite3"), "aem_content__v1")
+    assert client.list_collections() == []
+
+
+def test_import_activates_alias_and_fills_an_empty_node(tmp_path, projection_dir):
+    snapshot_file = str(tmp_path / "index.snapshot.tar")
+    export_snapshot(source_collection(tmp_path / "source"), snapshot_file, alias="aem_content")
+    client = chromadb.PersistentClient(path=str(tmp_path / "target"))
+    alias_file = str(tmp_path / "aliases.json")
+
+    assert needs_snapshot(client, "aem_content", alias_file)
+    collection, manifest = import_snapshot(client, snapshot_file, "aem_content", alias_file=alias_file)
+
+    assert resolve_alias("aem_content", alias_file) == collection.name != "aem_content"
+    assert manifest["alias"] == "aem_content"
+    assert not needs_snapshot(client, "aem_content", alias_file)
+
+
+def test_syncs_are_not_mirrored_into_a_loading_snapshot(tmp_path, projection_dir, monkeypatch):
+    snapshot_file = str(tmp_path / "index.snapshot.tar")
+    export_snapshot(source_collection(tmp_path / "source"), snapshot_file, alias="aem_content")
+    client = chromadb.PersistentClient(path=str(tmp_path / "target"))
+    alias_file = str(tmp_path / "aliases.json")
+    load = snapshot.load_snapshot
+    building = []
+
+    def load_and_check(*args, **kwargs):
+        building.append(building_collection("aem_content", alias_file))
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(snapshot, "load_snapshot", load_and_check)
+    import_snapshot(client, snapshot_file, "aem_content", alias_file=alias_file)
+
+    assert building == [None]
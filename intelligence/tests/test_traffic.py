@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.analysis.log_aggregates import LogAggregates
+from src.analysis.traffic_export import successful_path_counts
+from src.utils.cache import TTLCache
+from src.utils.traffic import page_hits, page_of, prioritize, rank_pages, rank_sections, read_ranking, write_ranking
+
+
+def test_page_of_normalizes_requests():
+    assert page_of("/content/wknd/us/en/faqs.html?utm=1") == "/content/wknd/us/en/faqs"
+    assert page_of("/content/wknd/us/en/faqs.model.json") == "/content/wknd/us/en/faqs"
+    assert page_of("/content/wknd/us/en/faqs/jcr:content/root/text.html") == "/content/wknd/us/en/faqs"
+    assert page_of("/content/wknd/us/en/") == "/content/wknd/us/en"
+    assert page_of("/content/dam/wknd/hero.jpg") is None
+    assert page_of("/content/wknd/us/en/logo.png") is None
+    assert page_of("/etc.clientlibs/site.css") is None
+
+
+def test_rank_pages_and_sections():
+    pages = rank_pages([
+        ("/content/site/en/a.html", 5),
+        ("/content/site/en/a.model.json", 2),
+        ("/content/site/en/b.html", 3),
+        ("/content/site/de/c.html", 4),
+        ("/content/dam/site/x.pdf", 50),
+    ])
+    assert pages == [("/content/site/en/a", 7), ("/content/site/de/c", 4), ("/content/site/en/b", 3)]
+    assert rank_sections(pages) == [("/content/site/en", 10), ("/content/site/de", 4)]
+
+
+def test_ranking_round_trip_and_prioritize(tmp_path):
+    ranking_file = str(tmp_path / "traffic.json")
+    write_ranking(ranking_file, [("/content/site/a", 9), ("/content/site/b", 4), ("/content/site/c", 1)], top=2)
+
+    ranking = read_ranking(ranking_file)
+    assert [entry["path"] for entry in ranking["pages"]] == ["/content/site/a", "/content/site/b"]
+    assert ranking["sections"] == [{"path": "/content/site", "hits": 13}]
+    assert read_ranking(str(tmp_path / "missing.json"))["pages"] == []
+
+    pages = ["/content/site/x", "/content/site/b", "/content/site/y", "/content/site/a"]
+    assert prioritize(pages, page_hits(ranking)) == [
+        "/content/site/a", "/content/site/b", "/content/site/x", "/content/site/y"
+    ]
+
+
+def test_successful_path_counts_drop_errors():
+    aggregates = LogAggregates()
+    for path, status in [("/content/a.html", 200), ("/content/a.html", 200), ("/content/a.html", 500),
+                         ("/content/gone.html", 404)]:
+        aggregates.add_request(path, "GET", status)
+    assert successful_path_counts(aggregates) == [("/content/a.html", 2)]
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+    cache.put("d", 4)
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1